@@ -0,0 +1,183 @@
+"""
+Batch mode shared by extract_from_url.py and extract_from_image.py.
+
+Jobs run on a thread pool that shares one Bedrock client. Each result is appended to an
+NDJSON file as soon as it finishes. Running the same command again resumes: jobs already
+recorded as ok are skipped, and extracted recipes whose upload failed are uploaded
+without calling Bedrock again.
+
+Uploads are optional:
+    --upload api        POST /recipes with an Idempotency-Key derived from the job id
+                        (needs MBM_API_BASE and MBM_API_TOKEN, an ID token from the site)
+    --upload dynamodb   one BatchWriteItem pass into --table after extraction, with
+                        recipe ids derived from the job id so re-runs overwrite. Items
+                        are built by the Lambda's recipe_items module, so they carry the
+                        same parsedIngredients, syncBucket and timestamps as POST /recipes;
+                        duplicate buckets and the list snapshot follow from the table stream
+"""
+
+import hashlib
+import json
+import os
+import sys
+import time
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from decimal import Decimal
+
+
+class ExtractionError(Exception):
+    """A recipe could not be extracted; the message is meant for the user."""
+
+
+def make_client(concurrency: int = 1):
+    """One bedrock-runtime client for all workers (boto3 clients are thread-safe)."""
+    try:
+        import boto3
+        from botocore.config import Config
+    except ImportError:
+        raise ExtractionError("boto3 not found — install it first:\n  pip install boto3")
+
+    region = os.environ.get("AWS_DEFAULT_REGION", "us-east-1")
+    config = Config(
+        max_pool_connections=max(10, concurrency),
+        # Adaptive mode slows every worker down together when Bedrock throttles
+        retries={"mode": "adaptive", "max_attempts": 8},
+        read_timeout=120,
+    )
+    return boto3.client("bedrock-runtime", region_name=region, config=config)
+
+
+def add_arguments(parser, source_help: str) -> None:
+    group = parser.add_argument_group("batch mode")
+    group.add_argument("--batch", metavar="PATH", help=source_help)
+    group.add_argument("--out", default="results.ndjson", help="NDJSON results file, appended to and used to resume (default: %(default)s)")
+    group.add_argument("--concurrency", type=int, default=4, help="Parallel extractions (default: %(default)s)")
+    group.add_argument("--upload", choices=["api", "dynamodb"], help="Also save each extracted recipe")
+    group.add_argument("--table", default="mbm-recipes", help="Table for --upload dynamodb (default: %(default)s)")
+
+
+def load_results(path: str) -> dict:
+    """Latest record per job id from an existing results file."""
+    results = {}
+    if not os.path.exists(path):
+        return results
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # a line cut short by an interrupted run
+            results[record["id"]] = record
+    return results
+
+
+def api_uploader(base_url: str, token: str):
+    def upload(job_id: str, recipe: dict) -> str:
+        req = urllib.request.Request(
+            f"{base_url.rstrip('/')}/recipes",
+            data=json.dumps(recipe).encode("utf-8"),
+            method="POST",
+            headers={
+                "Content-Type": "application/json",
+                "Authorization": f"Bearer {token}",
+                # Same job, same key: a re-run gets the first recipe back instead of a duplicate
+                "Idempotency-Key": hashlib.sha256(f"batch:{job_id}".encode("utf-8")).hexdigest(),
+            },
+        )
+        with urllib.request.urlopen(req, timeout=30) as resp:
+            return json.loads(resp.read())["id"]
+    return upload
+
+
+def batch_recipe_id(job_id: str) -> str:
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"mbm-batch:{job_id}"))
+
+
+def write_to_dynamodb(records: list[dict], table_name: str) -> None:
+    """Store each record's recipe with BatchWriteItem and set record["recipeId"]."""
+    import boto3
+    import recipe_items  # the extract_from_* scripts put the recipes Lambda directory on sys.path
+
+    region = os.environ.get("AWS_DEFAULT_REGION", "us-east-1")
+    table = boto3.resource("dynamodb", region_name=region).Table(table_name)
+    now = int(time.time())
+    # batch_writer groups puts into 25-item BatchWriteItem calls and resends unprocessed items
+    with table.batch_writer(overwrite_by_pkeys=["recipeId"]) as writer:
+        for record in records:
+            recipe = json.loads(json.dumps(record["recipe"]), parse_float=Decimal)
+            record["recipeId"] = batch_recipe_id(record["id"])
+            writer.put_item(Item=recipe_items.new_item(record["recipeId"], recipe, {"name": "batch import"}, now))
+
+
+def run_batch(jobs: list[tuple[str, object]], extract, out_path: str, concurrency: int = 4,
+              upload: str | None = None, table: str = "mbm-recipes") -> dict:
+    """Run extract(source) for each (job_id, source) and append results to out_path.
+
+    Returns counts of ok, failed and skipped jobs.
+    """
+    previous = load_results(out_path)
+
+    def finished(job_id):
+        record = previous.get(job_id, {})
+        return record.get("ok") and (not upload or record.get("recipeId"))
+
+    pending = [(job_id, source) for job_id, source in jobs if not finished(job_id)]
+    skipped = len(jobs) - len(pending)
+    if skipped:
+        print(f"[info] Resuming: {skipped} of {len(jobs)} already done in {out_path}", file=sys.stderr)
+
+    upload_one = None
+    if upload == "api":
+        base, token = os.environ.get("MBM_API_BASE"), os.environ.get("MBM_API_TOKEN")
+        if not base or not token:
+            raise ExtractionError("--upload api needs MBM_API_BASE and MBM_API_TOKEN")
+        upload_one = api_uploader(base, token)
+
+    def work(job_id, source):
+        start = time.perf_counter()
+        record = {"id": job_id, "source": source, "ok": False}
+        try:
+            # Reuse a recipe extracted by an earlier run whose upload failed
+            recipe = previous.get(job_id, {}).get("recipe")
+            if recipe is None:
+                recipe = extract(source)
+                if "error" in recipe:
+                    raise ExtractionError(recipe["error"])
+            record["recipe"] = recipe
+            if upload_one:
+                record["recipeId"] = upload_one(job_id, recipe)
+            record["ok"] = True
+        except Exception as e:
+            record["error"] = str(e)
+        record["elapsedMs"] = round((time.perf_counter() - start) * 1000)
+        return record
+
+    done = []
+    with open(out_path, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(work, job_id, source) for job_id, source in pending]
+        for n, future in enumerate(as_completed(futures), 1):
+            record = future.result()
+            done.append(record)
+            # Written straight away so an interrupted run loses nothing; for --upload dynamodb the
+            # record is written again below with its recipeId
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            status = "ok" if record["ok"] else f"FAILED: {record['error']}"
+            print(f"[{n}/{len(pending)}] {record['id']} {status} ({record['elapsedMs'] / 1000:.1f}s)", file=sys.stderr)
+
+        if upload == "dynamodb":
+            extracted = [r for r in done if r["ok"]]
+            try:
+                write_to_dynamodb(extracted, table)
+            except Exception as e:
+                for record in extracted:
+                    record.update(ok=False, error=f"DynamoDB write failed: {e}")
+                    record.pop("recipeId", None)
+            for record in extracted:
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+
+    ok = sum(1 for r in done if r["ok"])
+    return {"ok": ok, "failed": len(done) - ok, "skipped": skipped}
@@ -11,6 +11,7 @@ Setup:
 
 Usage:
     python extract_from_image.py <image1> [image2 ...] [--model MODEL_ID]
+    python extract_from_image.py --batch cookbook/ [--out results.ndjson] [--concurrency 4] [--upload api|dynamodb]
 
 Output: JSON matching the mbm-ui Recipe schema (ready to POST to /recipes).
 """
@@ -20,32 +21,15 @@ import json
 import sys
 from pathlib import Path
 
+# The prompt lives with the Lambda so local runs and the app send the same thing
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "terraform" / "app_account" / "lambda" / "recipes"))
+import prompts  # noqa: E402
+from batch import ExtractionError, add_arguments, make_client, run_batch  # noqa: E402
+
 # Claude Sonnet 4.6 gives excellent recipe extraction quality at ~$0.01-0.02/call.
 # For a ~10x cost reduction with slightly lower quality, switch to: us.anthropic.claude-haiku-4-5
 DEFAULT_MODEL = "us.anthropic.claude-sonnet-4-6"
 
-SYSTEM_PROMPT = """You are a recipe extraction assistant. Given one or more images of a recipe card, handwritten note,
-cookbook page, or plated dish, extract as much recipe information as you can and return ONLY a JSON object.
-If multiple images are provided they may show different sides or sections of the same recipe — combine them into one complete result.
-
-Return a JSON object with these fields (omit any you cannot determine):
-{
-  "title": "string (required)",
-  "description": "short summary string",
-  "tags": ["category", "strings"],
-  "ingredients": [{"name": "string", "amount": "string"}],
-  "servings": "string e.g. '4' or '4-6'",
-  "cookTime": "string e.g. '30 minutes'",
-  "instructions": ["step 1", "step 2"]
-}
-
-Rules:
-- Return ONLY valid JSON. No markdown fences, no explanation.
-- ingredients[].amount is quantity+unit as a string (e.g. "1 cup", "200g"), omit if unknown.
-- instructions are ordered plain strings with no numbering prefix.
-- tags are concise descriptors like ["italian", "pasta", "vegetarian"].
-- If no recipe is visible, return {"error": "no recipe found"}."""
-
 
 SUPPORTED_FORMATS = {"jpg": "jpeg", "jpeg": "jpeg", "png": "png", "gif": "gif", "webp": "webp"}
 
@@ -58,7 +42,7 @@ def get_image_format(path: Path) -> str:
     ext = path.suffix.lstrip(".").lower()
     fmt = SUPPORTED_FORMATS.get(ext)
     if not fmt:
-        sys.exit(f"Unsupported image format: {ext!r}. Supported: {', '.join(SUPPORTED_FORMATS)}")
+        raise ExtractionError(f"Unsupported image format: {ext!r}. Supported: {', '.join(SUPPORTED_FORMATS)}")
     return fmt
 
 
@@ -67,7 +51,7 @@ def prepare_image(path: Path) -> tuple[bytes, str]:
     try:
         from PIL import Image
     except ImportError:
-        sys.exit("Pillow not found — install it first:\n  pip install Pillow")
+        raise ExtractionError("Pillow not found — install it first:\n  pip install Pillow")
 
     with Image.open(path) as img:
         # Convert palette/transparency modes so JPEG save works
@@ -88,23 +72,18 @@ def prepare_image(path: Path) -> tuple[bytes, str]:
             if len(data) <= MAX_BYTES:
                 return data, "jpeg"
 
-        sys.exit(f"Could not compress {path.name} under {MAX_BYTES // 1024}KB even at minimum quality.")
-
+        raise ExtractionError(f"Could not compress {path.name} under {MAX_BYTES // 1024}KB even at minimum quality.")
 
-def extract_recipe(image_paths: list[str], model: str = DEFAULT_MODEL) -> dict:
-    try:
-        import boto3
-    except ImportError:
-        sys.exit("boto3 not found — install it first:\n  pip install boto3")
 
-    import os
-    region = os.environ.get("AWS_DEFAULT_REGION", "us-east-1")
+def extract_recipe(image_paths: list[str], model: str = DEFAULT_MODEL, client=None) -> dict:
+    """Raises ExtractionError; pass `client` to share one Bedrock client across calls."""
+    client = client or make_client()
 
     paths = []
     for p in image_paths:
         path = Path(p).expanduser()
         if not path.exists():
-            sys.exit(f"File not found: {p}")
+            raise ExtractionError(f"File not found: {p}")
         paths.append(path)
 
     content = []
@@ -115,22 +94,21 @@ def extract_recipe(image_paths: list[str], model: str = DEFAULT_MODEL) -> dict:
         print(f"[info]   → {image_format}, {len(image_bytes) // 1024}KB after compression", file=sys.stderr)
         content.append({"image": {"format": image_format, "source": {"bytes": image_bytes}}})
 
-    noun = "these images" if len(paths) > 1 else "this image"
-    content.append({"text": f"Extract the recipe from {noun}."})
+    content.append({"text": prompts.image_request_text(len(paths))})
 
     print(f"[info] Sending {len(paths)} image(s) to {model}...", file=sys.stderr)
 
-    client = boto3.client("bedrock-runtime", region_name=region)
-
     try:
         response = client.converse(
             modelId=model,
-            system=[{"text": SYSTEM_PROMPT}],
+            system=prompts.system_blocks("image"),
             messages=[{"role": "user", "content": content}],
             inferenceConfig={"maxTokens": 2048},
         )
     except Exception as e:
-        sys.exit(f"Bedrock API error: {e}")
+        raise ExtractionError(f"Bedrock API error: {e}")
+
+    print(f"[info] Usage: {json.dumps(prompts.usage_summary(response))}", file=sys.stderr)
 
     raw = response["output"]["message"]["content"][0]["text"]
     raw = raw.strip().removeprefix("```json").removeprefix("```").removesuffix("```").strip()
@@ -141,13 +119,46 @@ def extract_recipe(image_paths: list[str], model: str = DEFAULT_MODEL) -> dict:
         return {"error": "model returned non-JSON", "raw": raw}
 
 
+def find_image_groups(root: str) -> list[tuple[str, list[str]]]:
+    """(job id, image paths) per recipe: each subdirectory is one recipe, each loose image is its own."""
+    root_path = Path(root).expanduser()
+    if not root_path.is_dir():
+        raise ExtractionError(f"Not a directory: {root}")
+
+    def images_in(directory: Path) -> list[str]:
+        return sorted(str(p) for p in directory.iterdir()
+                      if p.is_file() and p.suffix.lstrip(".").lower() in SUPPORTED_FORMATS)
+
+    groups = []
+    for entry in sorted(root_path.iterdir()):
+        if entry.is_dir():
+            images = images_in(entry)
+            if images:
+                groups.append((entry.name, images))
+        elif entry.suffix.lstrip(".").lower() in SUPPORTED_FORMATS:
+            groups.append((entry.name, [str(entry)]))
+    return groups
+
+
 if __name__ == "__main__":
     import argparse
 
     parser = argparse.ArgumentParser(description="Extract a recipe from one or more image files via AWS Bedrock.")
-    parser.add_argument("images", nargs="+", metavar="IMAGE", help="Path(s) to image file(s)")
+    parser.add_argument("images", nargs="*", metavar="IMAGE", help="Path(s) to image file(s)")
     parser.add_argument("--model", default=DEFAULT_MODEL, metavar="MODEL_ID", help="Bedrock model ID")
+    add_arguments(parser, "Directory of recipes: one subdirectory of images per recipe, or one image file per recipe")
     args = parser.parse_args()
+    if bool(args.images) == bool(args.batch):
+        parser.error("give either image files or --batch DIR")
 
-    result = extract_recipe(args.images, model=args.model)
+    try:
+        if args.batch:
+            client = make_client(args.concurrency)
+            summary = run_batch(find_image_groups(args.batch), lambda paths: extract_recipe(paths, args.model, client),
+                                args.out, args.concurrency, args.upload, args.table)
+            print(json.dumps(summary))
+            sys.exit(1 if summary["failed"] else 0)
+        result = extract_recipe(args.images, model=args.model)
+    except ExtractionError as e:
+        sys.exit(str(e))
     print(json.dumps(result, indent=2))
@@ -10,7 +10,8 @@ Setup:
     export AWS_DEFAULT_REGION=us-east-1   # or your region
 
 Usage:
-    python extract_from_url.py <url> [model-id]
+    python extract_from_url.py <url> [--model MODEL_ID]
+    python extract_from_url.py --batch urls.txt [--out results.ndjson] [--concurrency 4] [--upload api|dynamodb]
 
 Output: JSON matching the mbm-ui Recipe schema (ready to POST to /recipes).
 """
@@ -18,64 +19,20 @@ Output: JSON matching the mbm-ui Recipe schema (ready to POST to /recipes).
 import json
 import sys
 import urllib.request
-from html.parser import HTMLParser
+from pathlib import Path
+
+# The prompt and page-text extractor live with the Lambda so local runs and the app send the same thing
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "terraform" / "app_account" / "lambda" / "recipes"))
+import html_text  # noqa: E402
+import prompts  # noqa: E402
+from batch import ExtractionError, add_arguments, make_client, run_batch  # noqa: E402
 
 # Claude Sonnet 4.6 gives excellent recipe extraction quality at ~$0.02-0.03/call.
 # For a ~10x cost reduction with slightly lower quality, switch to: us.anthropic.claude-haiku-4-5
 DEFAULT_MODEL = "us.anthropic.claude-sonnet-4-6"
 
-SYSTEM_PROMPT = """You are a recipe extraction assistant. Given the text content of a recipe webpage,
-extract the recipe and return ONLY a JSON object.
-
-Return a JSON object with these fields (omit any you cannot determine):
-{
-  "title": "string (required)",
-  "description": "short summary string",
-  "tags": ["category", "strings"],
-  "ingredients": [{"name": "string", "amount": "string"}],
-  "servings": "string e.g. '4' or '4-6'",
-  "cookTime": "string e.g. '30 minutes'",
-  "instructions": ["step 1", "step 2"]
-}
-
-Rules:
-- Return ONLY valid JSON. No markdown fences, no explanation.
-- ingredients[].amount is quantity+unit as a string (e.g. "1 cup", "200g"), omit if unknown.
-- instructions are ordered plain strings with no numbering prefix.
-- tags are concise descriptors like ["italian", "pasta", "vegetarian"].
-- Ignore ads, navigation, comments, and unrelated page content.
-- If no recipe is present, return {"error": "no recipe found"}."""
-
-
-class TextExtractor(HTMLParser):
-    """Strips HTML tags and returns visible text, skipping script/style blocks."""
-
-    SKIP_TAGS = {"script", "style", "noscript", "head", "meta", "link"}
-
-    def __init__(self):
-        super().__init__()
-        self._skip = 0
-        self.chunks: list[str] = []
-
-    def handle_starttag(self, tag, attrs):
-        if tag.lower() in self.SKIP_TAGS:
-            self._skip += 1
-
-    def handle_endtag(self, tag):
-        if tag.lower() in self.SKIP_TAGS:
-            self._skip = max(0, self._skip - 1)
-
-    def handle_data(self, data):
-        if self._skip == 0:
-            text = data.strip()
-            if text:
-                self.chunks.append(text)
 
-    def get_text(self) -> str:
-        return "\n".join(self.chunks)
-
-
-def fetch_page_text(url: str, char_limit: int = 20_000) -> str:
+def fetch_html(url: str) -> str:
     req = urllib.request.Request(url, headers={
         "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
         "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
@@ -84,50 +41,49 @@ def fetch_page_text(url: str, char_limit: int = 20_000) -> str:
         "Connection": "keep-alive",
     })
     with urllib.request.urlopen(req, timeout=15) as resp:
-        html = resp.read().decode("utf-8", errors="replace")
+        return resp.read().decode("utf-8", errors="replace")
 
-    parser = TextExtractor()
-    parser.feed(html)
-    text = parser.get_text()
 
+def html_to_text(html: str, char_limit: int = html_text.PAGE_TEXT_LIMIT) -> str:
+    """The page text sent to the model, extracted the same way the Lambda does it."""
+    text = html_text.page_text(html, limit=None)
     if len(text) > char_limit:
         text = text[:char_limit] + "\n...[truncated]"
     return text
 
 
-def extract_recipe(url: str, model: str = DEFAULT_MODEL) -> dict:
-    try:
-        import boto3
-    except ImportError:
-        sys.exit("boto3 not found — install it first:\n  pip install boto3")
+def fetch_page_text(url: str, char_limit: int = html_text.PAGE_TEXT_LIMIT) -> str:
+    return html_to_text(fetch_html(url), char_limit)
 
-    import os
-    region = os.environ.get("AWS_DEFAULT_REGION", "us-east-1")
+
+def extract_recipe(url: str, model: str = DEFAULT_MODEL, client=None) -> dict:
+    """Raises ExtractionError; pass `client` to share one Bedrock client across calls."""
+    client = client or make_client()
 
     print(f"[info] Fetching {url}...", file=sys.stderr)
     try:
         page_text = fetch_page_text(url)
     except Exception as e:
-        sys.exit(f"Failed to fetch URL: {e}")
+        raise ExtractionError(f"Failed to fetch URL: {e}")
 
     print(f"[info] Extracted {len(page_text)} chars. Sending to {model}...", file=sys.stderr)
 
-    client = boto3.client("bedrock-runtime", region_name=region)
-
     try:
         response = client.converse(
             modelId=model,
-            system=[{"text": SYSTEM_PROMPT}],
+            system=prompts.system_blocks("url"),
             messages=[
                 {
                     "role": "user",
-                    "content": [{"text": f"URL: {url}\n\n---\n{page_text}"}],
+                    "content": [{"text": prompts.url_request_text(url, page_text)}],
                 }
             ],
             inferenceConfig={"maxTokens": 2048},
         )
     except Exception as e:
-        sys.exit(f"Bedrock API error: {e}")
+        raise ExtractionError(f"Bedrock API error: {e}")
+
+    print(f"[info] Usage: {json.dumps(prompts.usage_summary(response))}", file=sys.stderr)
 
     raw = response["output"]["message"]["content"][0]["text"]
     raw = raw.strip().removeprefix("```json").removeprefix("```").removesuffix("```").strip()
@@ -138,13 +94,36 @@ def extract_recipe(url: str, model: str = DEFAULT_MODEL) -> dict:
         return {"error": "model returned non-JSON", "raw": raw}
 
 
+def read_url_list(path: str) -> list[str]:
+    """One URL per line; blank lines and # comments are ignored. Duplicates are dropped."""
+    urls = []
+    for line in Path(path).expanduser().read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if line and not line.startswith("#") and line not in urls:
+            urls.append(line)
+    return urls
+
+
 if __name__ == "__main__":
     import argparse
 
     parser = argparse.ArgumentParser(description="Extract a recipe from a webpage URL via AWS Bedrock.")
-    parser.add_argument("url", help="URL of the recipe page")
+    parser.add_argument("url", nargs="?", help="URL of the recipe page")
     parser.add_argument("--model", default=DEFAULT_MODEL, metavar="MODEL_ID", help="Bedrock model ID")
+    add_arguments(parser, "File with one recipe URL per line")
     args = parser.parse_args()
+    if bool(args.url) == bool(args.batch):
+        parser.error("give either a URL or --batch FILE")
 
-    result = extract_recipe(args.url, model=args.model)
+    try:
+        if args.batch:
+            client = make_client(args.concurrency)
+            jobs = [(url, url) for url in read_url_list(args.batch)]
+            summary = run_batch(jobs, lambda url: extract_recipe(url, args.model, client), args.out,
+                                args.concurrency, args.upload, args.table)
+            print(json.dumps(summary))
+            sys.exit(1 if summary["failed"] else 0)
+        result = extract_recipe(args.url, model=args.model)
+    except ExtractionError as e:
+        sys.exit(str(e))
     print(json.dumps(result, indent=2))
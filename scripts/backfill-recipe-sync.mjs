@@ -0,0 +1,72 @@
+// Backfill syncBucket/updatedAt on existing recipes so they appear in the gsi_updated_at index
+// used by GET /recipes?since=<updatedAt>. Items written by the current Lambda already carry both.
+//
+// Usage (macOS zsh):
+//   # Dry run (recommended first)
+//   REGION=us-east-1 DDB_TABLE=mbm-recipes node scripts/backfill-recipe-sync.mjs --dry-run
+//
+//   # Apply updates
+//   REGION=us-east-1 DDB_TABLE=mbm-recipes node scripts/backfill-recipe-sync.mjs
+
+import { DynamoDBClient } from "@aws-sdk/client-dynamodb"
+import { DynamoDBDocumentClient, ScanCommand, UpdateCommand } from "@aws-sdk/lib-dynamodb"
+
+const REGION = process.env.REGION || "us-east-1"
+const TABLE = process.env.DDB_TABLE
+const DRY = process.argv.includes("--dry-run") || process.argv.includes("-n")
+const SYNC_BUCKET = "all"
+
+if (!TABLE) {
+  console.error("DDB_TABLE env var is required")
+  process.exit(1)
+}
+
+const ddb = DynamoDBDocumentClient.from(new DynamoDBClient({ region: REGION }))
+
+async function scanAll() {
+  let items = []
+  let ExclusiveStartKey = undefined
+  do {
+    const res = await ddb.send(new ScanCommand({
+      TableName: TABLE,
+      ExclusiveStartKey,
+    }))
+    items = items.concat(res.Items || [])
+    ExclusiveStartKey = res.LastEvaluatedKey
+  } while (ExclusiveStartKey)
+  return items
+}
+
+async function main() {
+  console.log(`Scanning table ${TABLE} in ${REGION}...`)
+  const items = await scanAll()
+  console.log(`Found ${items.length} item(s)`)
+
+  let updatedCount = 0
+  for (const item of items) {
+    const id = item.recipeId
+    if (!id) continue
+    if (item.syncBucket === SYNC_BUCKET && typeof item.updatedAt === "number") continue
+
+    // Fall back to createdAt, then 0, so untouched legacy items sort before any real watermark
+    const updatedAt = typeof item.updatedAt === "number" ? item.updatedAt : (item.createdAt || 0)
+    updatedCount++
+    console.log(`${DRY ? "[dry]" : "[set]"} ${id}`, { syncBucket: SYNC_BUCKET, updatedAt })
+
+    if (!DRY) {
+      await ddb.send(new UpdateCommand({
+        TableName: TABLE,
+        Key: { recipeId: id },
+        UpdateExpression: "SET syncBucket = :b, updatedAt = :u",
+        ExpressionAttributeValues: { ":b": SYNC_BUCKET, ":u": updatedAt },
+      }))
+    }
+  }
+
+  console.log(`Done. ${DRY ? "Would update" : "Updated"} ${updatedCount} item(s).`)
+}
+
+main().catch(err => {
+  console.error(err)
+  process.exit(1)
+})
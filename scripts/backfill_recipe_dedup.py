@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Backfill the duplicate-detection buckets (mbm-recipe-dedup) for existing recipes.
+
+The table stream keeps the buckets in step with every write from now on; recipes saved
+before the dedup consumer existed (or while it was failing) are only picked up here.
+Indexing goes through the recipes Lambda's own _dedup_index, so the buckets come out
+exactly as a fresh write would leave them. Safe to re-run: recipes whose stored bucket
+keys already match are skipped, and a copy older than the indexed one is never written.
+
+Usage:
+    # Dry run (recommended first)
+    REGION=us-east-1 DDB_TABLE=mbm-recipes DEDUP_TABLE=mbm-recipe-dedup python3 scripts/backfill_recipe_dedup.py --dry-run
+
+    # Apply updates
+    REGION=us-east-1 DDB_TABLE=mbm-recipes DEDUP_TABLE=mbm-recipe-dedup python3 scripts/backfill_recipe_dedup.py
+"""
+
+import argparse
+import importlib.util
+import os
+import sys
+
+LAMBDA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "terraform", "app_account", "lambda", "recipes"))
+
+
+def load_recipes_app(table: str, dedup_table: str, region: str):
+    # The Lambda reads its configuration from the environment at import time
+    os.environ.update(RECIPES_TABLE=table, DEDUP_TABLE=dedup_table, AWS_REGION=region)
+    if LAMBDA_DIR not in sys.path:
+        sys.path.insert(0, LAMBDA_DIR)
+    spec = importlib.util.spec_from_file_location("recipes_app", os.path.join(LAMBDA_DIR, "app.py"))
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def main() -> None:
+    env = os.environ
+    parser = argparse.ArgumentParser(description="Index existing recipes for duplicate detection.")
+    parser.add_argument("--table", default=env.get("DDB_TABLE", "mbm-recipes"))
+    parser.add_argument("--dedup-table", default=env.get("DEDUP_TABLE", "mbm-recipe-dedup"))
+    parser.add_argument("--region", default=env.get("REGION") or env.get("AWS_REGION") or "us-east-1")
+    parser.add_argument("-n", "--dry-run", action="store_true", help="Report what would change without writing")
+    args = parser.parse_args()
+
+    try:
+        import boto3
+    except ImportError:
+        sys.exit("boto3 not found — install it first:\n  pip install boto3")
+
+    app = load_recipes_app(args.table, args.dedup_table, args.region)
+    ddb = boto3.resource("dynamodb", region_name=args.region)
+    dedup = ddb.Table(args.dedup_table)
+
+    print(f"Scanning table {args.table} in {args.region}...", file=sys.stderr)
+    items = app._scan_all(ddb.Table(args.table), **app._projection(app.DEDUP_FIELDS))
+    print(f"Found {len(items)} item(s)", file=sys.stderr)
+
+    changed = 0
+    for item in items:
+        rid = item.get("recipeId")
+        if not rid:
+            continue
+        _, keys = app._dedup_keys(item) if not app._is_tombstone(item) else (None, set())
+        stored = set((dedup.get_item(Key={"pk": f"sig#{rid}"}).get("Item") or {}).get("keys") or ())
+        if stored == keys:
+            continue
+        if not args.dry_run and not app._dedup_index(rid, item):
+            # The stream indexed a newer copy since the scan
+            continue
+        changed += 1
+        print(f"{'[dry]' if args.dry_run else '[set]'} {rid} +{len(keys - stored)} -{len(stored - keys)} buckets")
+
+    print(f"Done. {'Would update' if args.dry_run else 'Updated'} {changed} recipe(s).", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
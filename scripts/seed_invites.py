@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Issue a batch of invite codes into the invites table.
+
+Writes META items (the shape the pre-sign-up trigger checks) with BatchWriteItem,
+25 per request, resending unprocessed items with backoff, then prints one code per line.
+
+Usage:
+    python3 scripts/seed_invites.py --count 50 --prefix FNF --ttl-days 30
+    python3 scripts/seed_invites.py --count 1 --prefix FNF-BETA --max-uses 25
+    python3 scripts/seed_invites.py --count 1 --prefix FNF-MASTER --unlimited
+
+The environment variables used by the old Node script (TABLE, COUNT, PREFIX, CODE_LEN,
+TTL_DAYS, AWS_REGION) still work as defaults.
+"""
+
+import argparse
+import os
+import secrets
+import sys
+import time
+
+ALPHABET = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"  # no 0/O or 1/I, codes get typed from a message
+BATCH_SIZE = 25  # BatchWriteItem limit
+
+
+def make_codes(count: int, prefix: str, code_len: int) -> list[str]:
+    codes = set()
+    while len(codes) < count:
+        codes.add(f"{prefix}-{''.join(secrets.choice(ALPHABET) for _ in range(code_len))}")
+    return sorted(codes)
+
+
+def meta_item(code: str, now: int, max_uses: int, unlimited: bool, ttl_days: int | None) -> dict:
+    item = {
+        "code": {"S": code},
+        "sk": {"S": "META"},
+        "uses": {"N": "0"},
+        "issuedAt": {"N": str(now)},
+    }
+    if unlimited:
+        item["unlimited"] = {"BOOL": True}
+    else:
+        item["maxUses"] = {"N": str(max_uses)}
+    if ttl_days:
+        item["expiresAt"] = {"N": str(now + ttl_days * 86400)}
+    return item
+
+
+def batch_write(client, table: str, items: list[dict], max_attempts: int = 8) -> None:
+    for start in range(0, len(items), BATCH_SIZE):
+        requests = [{"PutRequest": {"Item": item}} for item in items[start:start + BATCH_SIZE]]
+        for attempt in range(max_attempts):
+            res = client.batch_write_item(RequestItems={table: requests})
+            requests = res.get("UnprocessedItems", {}).get(table, [])
+            if not requests:
+                break
+            time.sleep(min(2.0, 0.05 * 2 ** attempt))
+        else:
+            raise RuntimeError(f"{len(requests)} codes still unprocessed after {max_attempts} attempts")
+
+
+def main() -> None:
+    env = os.environ
+    parser = argparse.ArgumentParser(description="Issue invite codes in bulk.")
+    parser.add_argument("--table", default=env.get("TABLE", "mbm-invites"))
+    parser.add_argument("--region", default=env.get("AWS_REGION") or env.get("AWS_DEFAULT_REGION") or "us-east-1")
+    parser.add_argument("--count", type=int, default=int(env.get("COUNT", 20)))
+    parser.add_argument("--prefix", default=env.get("PREFIX", "FNF"))
+    parser.add_argument("--code-len", type=int, default=int(env.get("CODE_LEN", 8)), help="Length of the random part")
+    parser.add_argument("--ttl-days", type=int, default=int(env["TTL_DAYS"]) if env.get("TTL_DAYS") else None)
+    uses = parser.add_mutually_exclusive_group()
+    uses.add_argument("--max-uses", type=int, default=1, help="Sign-ups allowed per code (default: %(default)s)")
+    uses.add_argument("--unlimited", action="store_true", help="Codes never run out (revoke to disable)")
+    args = parser.parse_args()
+
+    try:
+        import boto3
+    except ImportError:
+        sys.exit("boto3 not found — install it first:\n  pip install boto3")
+
+    now = int(time.time())
+    codes = make_codes(args.count, args.prefix, args.code_len)
+    items = [meta_item(code, now, args.max_uses, args.unlimited, args.ttl_days) for code in codes]
+    batch_write(boto3.client("dynamodb", region_name=args.region), args.table, items)
+
+    for code in codes:
+        print(code)
+    print(f"Seeded {len(codes)} codes into {args.table} ({args.region})", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
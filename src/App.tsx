@@ -24,6 +24,8 @@ export type Recipe = {
   servings?: string
   cookTime?: string
   instructions?: string[]
+  // Page the recipe was imported from; used to spot repeat imports
+  sourceUrl?: string
   // Attribution fields stamped by the backend
   createdByName?: string
   updatedByName?: string
@@ -286,6 +286,7 @@ export default function DetailsModal({
       ingredients: ingredients.length ? ingredients : undefined,
       instructions: instructions.length ? instructions : undefined,
       servings: servings || undefined,
+      sourceUrl: initialRecipe?.sourceUrl,
     }, initialRecipe?.id)
     onClose()
   }
@@ -7,6 +7,8 @@ import type { Recipe } from '../App'
 
 type Mode = 'url' | 'image'
 
+type Duplicate = { id: string; title: string; similarity: number; match: 'url' | 'content' | 'similar' }
+
 type Props = {
   visible: boolean
   authHeader: (prefer?: 'id' | 'access') => Record<string, string | undefined>
@@ -64,6 +66,9 @@ export default function ImportModal({ visible, authHeader, onClose, onImported }
   const [previews, setPreviews] = useState<string[]>([])
   const [loading, setLoading] = useState(false)
   const [error, setError] = useState<string | null>(null)
+  // Set when the page was imported before (409) or the extracted recipe resembles saved ones
+  const [duplicates, setDuplicates] = useState<Duplicate[] | null>(null)
+  const [pending, setPending] = useState<Omit<Recipe, 'id'> | null>(null)
   const urlInputRef = useRef<HTMLInputElement>(null)
   const fileInputRef = useRef<HTMLInputElement>(null)
 
@@ -73,6 +78,8 @@ export default function ImportModal({ visible, authHeader, onClose, onImported }
       setImageFiles([])
       setPreviews([])
       setError(null)
+      setDuplicates(null)
+      setPending(null)
       setMode('image')
     }
   }, [visible])
@@ -103,15 +110,32 @@ export default function ImportModal({ visible, authHeader, onClose, onImported }
     setPreviews(prev => prev.filter((_, i) => i !== idx))
   }
 
-  async function handleSubmit(e: React.FormEvent) {
-    e.preventDefault()
+  async function findDuplicates(recipe: Omit<Recipe, 'id'>): Promise<Duplicate[]> {
+    // Only a hint: a failed check never blocks the import
+    try {
+      const res = await fetch(`${getApiBase()}/recipes/duplicates`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json', ...authHeader() },
+        body: JSON.stringify(recipe),
+      })
+      if (!res.ok) return []
+      const result = await res.json()
+      return Array.isArray(result?.duplicates) ? result.duplicates : []
+    } catch {
+      return []
+    }
+  }
+
+  async function runImport(force: boolean) {
     setLoading(true)
     setError(null)
+    setDuplicates(null)
+    setPending(null)
     try {
       let body: object
       if (mode === 'url') {
         if (!url.trim()) return
-        body = { type: 'url', url: url.trim() }
+        body = { type: 'url', url: url.trim(), ...(force ? { force: true } : {}) }
       } else {
         if (imageFiles.length === 0) return
         const compressed = await Promise.all(imageFiles.map(compressImage))
@@ -124,8 +148,19 @@ export default function ImportModal({ visible, authHeader, onClose, onImported }
         body: JSON.stringify(body),
       })
       const result = await res.json()
+      if (res.status === 409 && Array.isArray(result?.duplicates)) {
+        // Already imported: nothing was extracted yet, so "Import anyway" resends with force
+        setDuplicates(result.duplicates)
+        return
+      }
       if (!res.ok) throw new Error(result?.error || result?.message || `HTTP ${res.status}`)
       if (result?.error) throw new Error(result.error)
+      const similar = await findDuplicates(result)
+      if (similar.length > 0) {
+        setPending(result)
+        setDuplicates(similar)
+        return
+      }
       onImported(result)
     } catch (err: unknown) {
       setError(err instanceof Error ? err.message : 'Something went wrong')
@@ -134,6 +169,19 @@ export default function ImportModal({ visible, authHeader, onClose, onImported }
     }
   }
 
+  function handleSubmit(e: React.FormEvent) {
+    e.preventDefault()
+    runImport(false)
+  }
+
+  function importAnyway() {
+    if (pending) {
+      onImported(pending)
+    } else {
+      runImport(true)
+    }
+  }
+
   const canSubmit = !loading && (mode === 'url' ? !!url.trim() : imageFiles.length > 0)
 
   const modalRoot = typeof document !== 'undefined' ? document.getElementById('modal-root') : null
@@ -152,7 +200,7 @@ export default function ImportModal({ visible, authHeader, onClose, onImported }
             <button
               key={m}
               type="button"
-              onClick={() => { setMode(m); setError(null) }}
+              onClick={() => { setMode(m); setError(null); setDuplicates(null); setPending(null) }}
               style={{
                 flex: 1,
                 padding: '10px 0',
@@ -181,7 +229,7 @@ export default function ImportModal({ visible, authHeader, onClose, onImported }
                 id="import-url"
                 type="url"
                 value={url}
-                onChange={e => setUrl(e.target.value)}
+                onChange={e => { setUrl(e.target.value); setDuplicates(null) }}
                 placeholder="https://www.allrecipes.com/recipe/..."
                 required
                 disabled={loading}
@@ -245,8 +293,35 @@ export default function ImportModal({ visible, authHeader, onClose, onImported }
             <p style={{ color: 'var(--error, #c00)', marginBottom: 16, fontSize: '0.9rem' }}>{error}</p>
           )}
 
+          {duplicates && duplicates.length > 0 && (
+            <div role="alert" style={{ marginBottom: 16, fontSize: '0.9rem' }}>
+              <p style={{ margin: '0 0 6px', fontWeight: 500 }}>
+                {pending
+                  ? 'This looks like a recipe you already have:'
+                  : `Already imported as “${duplicates[0].title}”`}
+              </p>
+              {pending && (
+                <ul style={{ margin: 0, paddingLeft: 20 }}>
+                  {duplicates.map(d => (
+                    <li key={d.id}>
+                      {d.title}{' '}
+                      <span style={{ color: 'var(--muted, #666)' }}>
+                        ({d.match === 'similar' ? `${Math.round(d.similarity * 100)}% similar` : 'same recipe'})
+                      </span>
+                    </li>
+                  ))}
+                </ul>
+              )}
+            </div>
+          )}
+
           {loading ? (
             <LoadingSpinner message="Simmering…" size={40} />
+          ) : duplicates && duplicates.length > 0 ? (
+            <div style={{ display: 'flex', gap: 12, justifyContent: 'flex-end' }}>
+              <button type="button" className="secondary" onClick={onClose}>Cancel</button>
+              <button type="button" className="primary" onClick={importAnyway}>Import anyway</button>
+            </div>
           ) : (
             <div style={{ display: 'flex', gap: 12, justifyContent: 'flex-end' }}>
               <button type="button" className="secondary" onClick={onClose}>Cancel</button>
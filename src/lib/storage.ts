@@ -75,10 +75,61 @@ class LocalAdapter implements Storage {
   }
 }
 
+// The list snapshot is rebuilt from the table stream and cached for up to ~80s (5s batching,
+// 15s max-age, 60s stale-while-revalidate). Inside that window after our own write, list
+// reads ask the API for ?fresh=1 so a reload never shows the recipe list from before the write.
+const FRESH_AFTER_WRITE_MS = 90_000
+const LAST_WRITE_KEY = 'mbm:lastWriteAt'
+
+// POST /recipes retries reuse one Idempotency-Key, so an attempt that did reach the server returns
+// its recipe instead of a duplicate. A 409 means that attempt is still running: wait, then ask again.
+const CREATE_ATTEMPTS = 4
+const CREATE_BACKOFF_MS = 500
+
+const sleep = (ms: number) => new Promise(resolve => setTimeout(resolve, ms))
+
+function retryDelayMs(attempt: number, res?: Response): number {
+  const retryAfter = Number(res?.headers.get('Retry-After'))
+  if (retryAfter > 0) return retryAfter * 1000
+  // 0.5s, 1s, 2s, jittered so tabs that failed together don't retry together
+  return CREATE_BACKOFF_MS * 2 ** (attempt - 1) * (0.5 + Math.random() / 2)
+}
+
+// Retries network failures and 409s; any other response is returned as is
+async function postWithRetry(url: string, init: RequestInit): Promise<Response> {
+  for (let attempt = 1; ; attempt++) {
+    let res: Response | undefined
+    try {
+      res = await fetch(url, init)
+      if (res.status !== 409 || attempt === CREATE_ATTEMPTS) return res
+    } catch (e) {
+      if (attempt === CREATE_ATTEMPTS) throw e
+    }
+    await sleep(retryDelayMs(attempt, res))
+  }
+}
+
 // RemoteAdapter stub: future implementation will call API endpoints
 class RemoteAdapter implements Storage {
   constructor(private base: string) {}
 
+  private markWrite() {
+    try {
+      window.sessionStorage.setItem(LAST_WRITE_KEY, String(Date.now()))
+    } catch {
+      // private mode: a reload may briefly show the previous list
+    }
+  }
+
+  private wroteRecently(): boolean {
+    try {
+      const at = Number(window.sessionStorage.getItem(LAST_WRITE_KEY) || 0)
+      return Date.now() - at < FRESH_AFTER_WRITE_MS
+    } catch {
+      return false
+    }
+  }
+
   private async getAuthHeader(): Promise<Record<string, string>> {
     try {
       const session = await fetchAuthSession()
@@ -91,7 +142,8 @@ class RemoteAdapter implements Storage {
 
   async listRecipes(): Promise<Recipe[]> {
     const authHeaders = await this.getAuthHeader()
-    const res = await fetch(`${this.base}/recipes`, { headers: authHeaders })
+    const url = this.wroteRecently() ? `${this.base}/recipes?fresh=1` : `${this.base}/recipes`
+    const res = await fetch(url, { headers: authHeaders })
     if (!res.ok) throw new Error('network')
     return res.json() as Promise<Recipe[]>
   }
@@ -106,12 +158,14 @@ class RemoteAdapter implements Storage {
 
   async createRecipe(r: Omit<Recipe, 'id'>) {
     const authHeaders = await this.getAuthHeader()
-    const res = await fetch(`${this.base}/recipes`, { method: 'POST', body: JSON.stringify(r), headers: { ...(authHeaders as Record<string,string>), 'Content-Type': 'application/json' } })
+    const init = { method: 'POST', body: JSON.stringify(r), headers: { ...(authHeaders as Record<string,string>), 'Content-Type': 'application/json', 'Idempotency-Key': crypto.randomUUID() } }
+    const res = await postWithRetry(`${this.base}/recipes`, init)
     if (!res.ok) {
       const text = await res.text().catch(() => '')
       console.error('POST /recipes failed', res.status, text)
       throw new Error(`network`)
     }
+    this.markWrite()
     return res.json()
   }
 
@@ -123,17 +177,20 @@ class RemoteAdapter implements Storage {
       console.error('PUT /recipes/{id} failed', res.status, text)
       throw new Error('network')
     }
+    this.markWrite()
     return res.json()
   }
 
   async deleteRecipe(id: string) {
     const authHeaders = await this.getAuthHeader()
     const res = await fetch(`${this.base}/recipes/${encodeURIComponent(id)}`, { method: 'DELETE', headers: { ...(authHeaders as Record<string,string>) } })
-    if (!res.ok) {
+    // 404: already deleted elsewhere, which is the outcome we wanted
+    if (!res.ok && res.status !== 404) {
       const text = await res.text().catch(() => '')
       console.error('DELETE /recipes/{id} failed', res.status, text)
       throw new Error('network')
     }
+    this.markWrite()
   }
 }
 
@@ -38,7 +38,7 @@ resource "aws_cloudfront_function" "redirect_www" {
   name    = "redirect-www-to-apex"
   runtime = "cloudfront-js-1.0"
 
-  comment = "Redirect www.mealsbymaggie.com to mealsbymaggie.com"
+  comment = "Redirect www to the apex domain; serve index.html for SPA routes"
 
   publish = true
 
@@ -56,6 +56,11 @@ function handler(event) {
       }
     };
   }
+  // Client-side routes (no file extension) get the SPA shell
+  var last = (request.uri || '/').split('/').pop();
+  if (last.indexOf('.') === -1) {
+    request.uri = '/index.html';
+  }
   return request;
 }
 EOF
@@ -13,6 +13,33 @@ resource "aws_dynamodb_table" "recipes" {
     type = "S"
   }
 
+  # Delta sync: every recipe carries syncBucket = "all" so this GSI can range over updatedAt
+  attribute {
+    name = "syncBucket"
+    type = "S"
+  }
+  attribute {
+    name = "updatedAt"
+    type = "N"
+  }
+
+  global_secondary_index {
+    name            = "gsi_updated_at"
+    hash_key        = "syncBucket"
+    range_key       = "updatedAt"
+    projection_type = "ALL"
+  }
+
+  # Soft-delete tombstones expire via TTL
+  ttl {
+    attribute_name = "expiresAt"
+    enabled        = true
+  }
+
+  # Feeds the snapshot Lambda that publishes the list to the site bucket
+  stream_enabled   = true
+  stream_view_type = "KEYS_ONLY"
+
   tags = {
     Name = "mbm-recipes"
   }
@@ -33,6 +60,66 @@ resource "aws_dynamodb_table" "ratings" {
   }
 }
 
+# Per-user token buckets and in-flight leases for AI extraction (one item per user)
+resource "aws_dynamodb_table" "rate_limits" {
+  name         = "mbm-rate-limits"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "limitKey"
+
+  attribute {
+    name = "limitKey"
+    type = "S"
+  }
+
+  # Idle buckets expire; a missing bucket is a full one
+  ttl {
+    attribute_name = "expiresAt"
+    enabled        = true
+  }
+
+  tags = {
+    Name = "mbm-rate-limits"
+  }
+}
+
+# Idempotency-Key records for POST /recipes and AI extraction (stored responses, replayed on retry)
+resource "aws_dynamodb_table" "idempotency" {
+  name         = "mbm-idempotency"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "idempotencyKey"
+
+  attribute {
+    name = "idempotencyKey"
+    type = "S"
+  }
+
+  ttl {
+    attribute_name = "expiresAt"
+    enabled        = true
+  }
+
+  tags = {
+    Name = "mbm-idempotency"
+  }
+}
+
+# MinHash/LSH buckets for duplicate detection: "url#…", "hash#…" and "band#…" items hold an
+# `ids` string set; "sig#<recipeId>" items hold each recipe's signature and bucket keys
+resource "aws_dynamodb_table" "recipe_dedup" {
+  name         = "mbm-recipe-dedup"
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "pk"
+
+  attribute {
+    name = "pk"
+    type = "S"
+  }
+
+  tags = {
+    Name = "mbm-recipe-dedup"
+  }
+}
+
 # S3 bucket for uploaded images
 resource "aws_s3_bucket" "images" {
   bucket        = "mbm-site-images-${random_id.bucket_suffix.hex}"
@@ -113,12 +200,20 @@ data "aws_iam_policy_document" "lambda_policy" {
     actions = [
       "dynamodb:PutItem",
       "dynamodb:GetItem",
+      "dynamodb:BatchGetItem",
       "dynamodb:Query",
       "dynamodb:Scan",
       "dynamodb:UpdateItem",
       "dynamodb:DeleteItem"
     ]
-    resources = [aws_dynamodb_table.recipes.arn, aws_dynamodb_table.ratings.arn]
+    resources = [
+      aws_dynamodb_table.recipes.arn,
+      "${aws_dynamodb_table.recipes.arn}/index/*",
+      aws_dynamodb_table.ratings.arn,
+      aws_dynamodb_table.rate_limits.arn,
+      aws_dynamodb_table.idempotency.arn,
+      aws_dynamodb_table.recipe_dedup.arn
+    ]
   }
 
   statement {
@@ -126,6 +221,23 @@ data "aws_iam_policy_document" "lambda_policy" {
     resources = ["${aws_s3_bucket.images.arn}/*"]
   }
 
+  # dedup_stream_handler reads the recipes stream
+  statement {
+    actions = [
+      "dynamodb:DescribeStream",
+      "dynamodb:GetRecords",
+      "dynamodb:GetShardIterator",
+      "dynamodb:ListStreams"
+    ]
+    resources = [aws_dynamodb_table.recipes.stream_arn]
+  }
+
+  # HeadObject on the list snapshot, to redirect only once it has been published
+  statement {
+    actions   = ["s3:GetObject"]
+    resources = ["${module.site.bucket_arn}/${local.snapshot_key}"]
+  }
+
   statement {
     actions   = ["sts:AssumeRole"]
     resources = ["arn:aws:iam::923988301699:role/mbm-bedrock-access"]
@@ -253,10 +365,20 @@ resource "archive_file" "recipes_zip" {
   source_dir  = "${path.module}/lambda/recipes"
 }
 
+# app.py plus the metrics/tracing helpers it shares with the recipes Lambda
 resource "archive_file" "images_zip" {
   type        = "zip"
   output_path = "${path.module}/dist/images.zip"
-  source_dir  = "${path.module}/lambda/images"
+
+  source {
+    content  = file("${path.module}/lambda/images/app.py")
+    filename = "app.py"
+  }
+
+  source {
+    content  = file("${path.module}/lambda/recipes/telemetry.py")
+    filename = "telemetry.py"
+  }
 }
 
 resource "aws_lambda_function" "recipes_fn" {
@@ -270,14 +392,158 @@ resource "aws_lambda_function" "recipes_fn" {
 
   environment {
     variables = {
-      RECIPES_TABLE    = aws_dynamodb_table.recipes.name
-      RATINGS_TABLE    = aws_dynamodb_table.ratings.name
-      IMAGES_BUCKET    = aws_s3_bucket.images.id
-      BEDROCK_ROLE_ARN = "arn:aws:iam::923988301699:role/mbm-bedrock-access"
+      RECIPES_TABLE           = aws_dynamodb_table.recipes.name
+      RECIPES_UPDATED_INDEX   = "gsi_updated_at"
+      RECIPES_SNAPSHOT_URL    = "https://${var.site_domain}/${local.snapshot_key}"
+      RECIPES_SNAPSHOT_BUCKET = module.site.bucket_name
+      RECIPES_SNAPSHOT_KEY    = local.snapshot_key
+      RATINGS_TABLE           = aws_dynamodb_table.ratings.name
+      RATE_LIMIT_TABLE        = aws_dynamodb_table.rate_limits.name
+      IDEMPOTENCY_TABLE       = aws_dynamodb_table.idempotency.name
+      DEDUP_TABLE             = aws_dynamodb_table.recipe_dedup.name
+      IMAGES_BUCKET           = aws_s3_bucket.images.id
+      BEDROCK_ROLE_ARN        = "arn:aws:iam::923988301699:role/mbm-bedrock-access"
     }
   }
 }
 
+# Recipe list snapshot: DynamoDB Stream -> Lambda -> gzipped JSON in the site bucket (served by CloudFront)
+locals {
+  snapshot_key = "data/recipes-index.json"
+}
+
+# app.py plus the DynamoDB helpers it shares with the recipes Lambda
+resource "archive_file" "snapshot_zip" {
+  type        = "zip"
+  output_path = "${path.module}/dist/snapshot.zip"
+
+  source {
+    content  = file("${path.module}/lambda/snapshot/app.py")
+    filename = "app.py"
+  }
+
+  source {
+    content  = file("${path.module}/lambda/recipes/ddb_utils.py")
+    filename = "ddb_utils.py"
+  }
+}
+
+resource "aws_iam_role" "snapshot_role" {
+  name               = "mbm-recipes-snapshot-role"
+  assume_role_policy = data.aws_iam_policy_document.lambda_assume_role.json
+}
+
+resource "aws_iam_policy" "snapshot_policy" {
+  name = "mbm-recipes-snapshot"
+  policy = jsonencode({
+    Version = "2012-10-17",
+    Statement = [
+      {
+        Effect   = "Allow",
+        Action   = ["dynamodb:Scan"],
+        Resource = aws_dynamodb_table.recipes.arn
+      },
+      {
+        Effect = "Allow",
+        Action = [
+          "dynamodb:DescribeStream",
+          "dynamodb:GetRecords",
+          "dynamodb:GetShardIterator",
+          "dynamodb:ListStreams"
+        ],
+        Resource = aws_dynamodb_table.recipes.stream_arn
+      },
+      {
+        Effect   = "Allow",
+        Action   = ["s3:PutObject", "s3:GetObject"],
+        Resource = "${module.site.bucket_arn}/data/*"
+      },
+      {
+        Effect = "Allow",
+        Action = [
+          "logs:CreateLogGroup",
+          "logs:CreateLogStream",
+          "logs:PutLogEvents"
+        ],
+        Resource = "arn:aws:logs:*:*:*"
+      }
+    ]
+  })
+}
+
+resource "aws_iam_role_policy_attachment" "snapshot_attach" {
+  role       = aws_iam_role.snapshot_role.name
+  policy_arn = aws_iam_policy.snapshot_policy.arn
+}
+
+resource "aws_lambda_function" "snapshot_fn" {
+  filename         = archive_file.snapshot_zip.output_path
+  function_name    = "mbm-recipes-snapshot-fn"
+  role             = aws_iam_role.snapshot_role.arn
+  handler          = "app.handler"
+  runtime          = "python3.10"
+  source_code_hash = archive_file.snapshot_zip.output_base64sha256
+  timeout          = 60
+
+  environment {
+    variables = {
+      RECIPES_TABLE   = aws_dynamodb_table.recipes.name
+      SNAPSHOT_BUCKET = module.site.bucket_name
+      SNAPSHOT_PREFIX = "data/"
+    }
+  }
+}
+
+# Publish once on deploy so the snapshot exists before the first recipe write
+resource "aws_lambda_invocation" "snapshot_initial" {
+  function_name = aws_lambda_function.snapshot_fn.function_name
+  input         = jsonencode({ Records = [] })
+
+  triggers = {
+    code = archive_file.snapshot_zip.output_base64sha256
+  }
+
+  depends_on = [aws_iam_role_policy_attachment.snapshot_attach]
+}
+
+# Batch changes for a few seconds so bursts of writes trigger one rebuild
+resource "aws_lambda_event_source_mapping" "recipes_stream" {
+  event_source_arn                   = aws_dynamodb_table.recipes.stream_arn
+  function_name                      = aws_lambda_function.snapshot_fn.arn
+  starting_position                  = "LATEST"
+  batch_size                         = 100
+  maximum_batching_window_in_seconds = 5
+}
+
+# Near-duplicate buckets, kept in step with recipe writes off the request path.
+# Same code as recipes_fn; the stream only carries keys, so the handler re-reads each recipe.
+resource "aws_lambda_function" "dedup_fn" {
+  filename         = archive_file.recipes_zip.output_path
+  function_name    = "mbm-recipes-dedup-fn"
+  role             = aws_iam_role.lambda_exec.arn
+  handler          = "app.dedup_stream_handler"
+  runtime          = "python3.10"
+  source_code_hash = archive_file.recipes_zip.output_base64sha256
+  timeout          = 60
+
+  environment {
+    variables = {
+      RECIPES_TABLE = aws_dynamodb_table.recipes.name
+      DEDUP_TABLE   = aws_dynamodb_table.recipe_dedup.name
+    }
+  }
+}
+
+# Records for one recipe stay in order on their shard; a failing batch is split to find the bad record
+resource "aws_lambda_event_source_mapping" "recipes_dedup_stream" {
+  event_source_arn               = aws_dynamodb_table.recipes.stream_arn
+  function_name                  = aws_lambda_function.dedup_fn.arn
+  starting_position              = "LATEST"
+  batch_size                     = 100
+  bisect_batch_on_function_error = true
+  maximum_retry_attempts         = 10
+}
+
 resource "aws_lambda_function" "images_fn" {
   filename         = archive_file.images_zip.output_path
   function_name    = "mbm-images-fn"
@@ -415,10 +681,11 @@ resource "aws_apigatewayv2_api" "http_api" {
   protocol_type = "HTTP"
 
   cors_configuration {
-    allow_origins = ["*"]
-    allow_methods = ["GET", "POST", "PUT", "DELETE", "OPTIONS"]
-    allow_headers = ["content-type", "authorization"]
-    max_age       = 3600
+    allow_origins  = ["*"]
+    allow_methods  = ["GET", "POST", "PUT", "DELETE", "OPTIONS"]
+    allow_headers  = ["content-type", "authorization", "if-none-match", "idempotency-key"]
+    expose_headers = ["etag", "retry-after", "idempotent-replayed"]
+    max_age        = 3600
   }
 }
 
@@ -473,6 +740,35 @@ resource "aws_apigatewayv2_route" "recipes_post" {
   authorizer_id      = aws_apigatewayv2_authorizer.cognito_jwt.id
 }
 
+resource "aws_apigatewayv2_route" "recipes_search" {
+  api_id    = aws_apigatewayv2_api.http_api.id
+  route_key = "GET /recipes/search"
+  target    = "integrations/${aws_apigatewayv2_integration.recipes_integration.id}"
+}
+
+# First-paint data (recipe summaries, ratings, image URLs, identity) in one call
+resource "aws_apigatewayv2_route" "bootstrap" {
+  api_id    = aws_apigatewayv2_api.http_api.id
+  route_key = "GET /bootstrap"
+  target    = "integrations/${aws_apigatewayv2_integration.recipes_integration.id}"
+}
+
+# Likely duplicates of a draft recipe (checked before saving an import)
+resource "aws_apigatewayv2_route" "recipes_duplicates" {
+  api_id             = aws_apigatewayv2_api.http_api.id
+  route_key          = "POST /recipes/duplicates"
+  target             = "integrations/${aws_apigatewayv2_integration.recipes_integration.id}"
+  authorization_type = "JWT"
+  authorizer_id      = aws_apigatewayv2_authorizer.cognito_jwt.id
+}
+
+# Aggregated ingredients for a meal plan (public, like recipe reads)
+resource "aws_apigatewayv2_route" "shopping_list" {
+  api_id    = aws_apigatewayv2_api.http_api.id
+  route_key = "POST /shopping-list"
+  target    = "integrations/${aws_apigatewayv2_integration.recipes_integration.id}"
+}
+
 resource "aws_apigatewayv2_route" "recipes_item_get" {
   api_id    = aws_apigatewayv2_api.http_api.id
   route_key = "GET /recipes/{id}"
@@ -622,6 +918,26 @@ resource "aws_cloudwatch_log_group" "recipes_lambda_logs" {
   }
 }
 
+resource "aws_cloudwatch_log_group" "snapshot_lambda_logs" {
+  name              = "/aws/lambda/${aws_lambda_function.snapshot_fn.function_name}"
+  retention_in_days = 14
+
+  tags = {
+    ManagedBy = "terraform"
+    site      = "mbm"
+  }
+}
+
+resource "aws_cloudwatch_log_group" "dedup_lambda_logs" {
+  name              = "/aws/lambda/${aws_lambda_function.dedup_fn.function_name}"
+  retention_in_days = 14
+
+  tags = {
+    ManagedBy = "terraform"
+    site      = "mbm"
+  }
+}
+
 resource "aws_cloudwatch_log_group" "images_lambda_logs" {
   name              = "/aws/lambda/${aws_lambda_function.images_fn.function_name}"
   retention_in_days = 14
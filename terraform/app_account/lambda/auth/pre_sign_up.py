@@ -1,8 +1,33 @@
 import os, time, json, boto3
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
 TABLE = os.environ.get('INVITES_TABLE')
-ddb = boto3.client('dynamodb')
+META_ATTRS = ("code", "revoked", "expiresAt", "unlimited", "maxUses", "uses", "used")
+INVALID_CODE = 'Invalid, expired, revoked, or exhausted invite code'
+
+# Cognito gives the trigger 5 seconds: fail fast and retry once rather than use the SDK defaults
+# (60s timeouts, 3 legacy retries). Kept warm across sign-ups with TCP keepalive.
+ddb = boto3.client('dynamodb', config=Config(
+    connect_timeout=1,
+    read_timeout=2,
+    retries={'mode': 'standard', 'max_attempts': 2},
+    tcp_keepalive=True,
+))
+
+def _usable(meta, now):
+    """Mirror of the transaction's condition, so unusable codes are rejected with a single read."""
+    if meta is None:
+        return False
+    if meta.get('revoked', {}).get('BOOL'):
+        return False
+    if 'expiresAt' in meta and int(meta['expiresAt']['N']) <= now:
+        return False
+    if meta.get('unlimited', {}).get('BOOL'):
+        return True
+    if 'maxUses' in meta:
+        return int(meta.get('uses', {}).get('N', '0')) < int(meta['maxUses']['N'])
+    return not meta.get('used', {}).get('BOOL')
 
 def handler(event, _ctx):
     # minimal safe placeholder: deny missing code, allow if exists and mark used
@@ -13,6 +38,19 @@ def handler(event, _ctx):
         raise Exception(json.dumps({'message': 'Missing invite code'}))
 
     now = int(time.time())
+
+    # Cheap pre-check: typos and guessed codes cost one consistent read instead of a transaction.
+    # The transaction below still enforces the same conditions against concurrent sign-ups.
+    meta = ddb.get_item(
+        TableName=TABLE,
+        Key={"code": {"S": code}, "sk": {"S": "META"}},
+        ConsistentRead=True,
+        ProjectionExpression=", ".join(f"#{a}" for a in META_ATTRS),
+        ExpressionAttributeNames={f"#{a}": a for a in META_ATTRS},
+    ).get('Item')
+    if not _usable(meta, now):
+        raise Exception(json.dumps({'message': INVALID_CODE}))
+
     used_at_iso = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(now))
 
     meta_key = {"code": {"S": code}, "sk": {"S": "META"}}
@@ -66,7 +104,7 @@ def handler(event, _ctx):
     except ClientError as e:
         code_str = e.response.get("Error", {}).get("Code", "")
         if code_str in ("ConditionalCheckFailedException", "TransactionCanceledException"):
-            raise Exception(json.dumps({'message': 'Invalid, expired, revoked, or exhausted invite code'}))
+            raise Exception(json.dumps({'message': INVALID_CODE}))
         raise
 
     event.setdefault('response', {})
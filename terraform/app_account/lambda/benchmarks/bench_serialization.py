@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark list-response serialization over a synthetic DynamoDB scan.
+
+Compares the old two-pass path (recursive Decimal conversion, then json.dumps)
+with the current response() + gzip path in recipes/app.py.
+
+Usage:
+    python benchmarks/bench_serialization.py [--recipes 5000] [--repeat 5]
+"""
+
+import argparse
+import base64
+import gzip
+import importlib.util
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from decimal import Decimal
+
+LAMBDA_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def load_recipes_app():
+    # The Lambda runtime puts the function directory on sys.path (for prompts.py)
+    if os.path.join(LAMBDA_ROOT, 'recipes') not in sys.path:
+        sys.path.insert(0, os.path.join(LAMBDA_ROOT, 'recipes'))
+    spec = importlib.util.spec_from_file_location('recipes_app', os.path.join(LAMBDA_ROOT, 'recipes', 'app.py'))
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def synthetic_items(n, seed=7):
+    """Items shaped like a boto3 resource scan: numbers come back as Decimal."""
+    rnd = random.Random(seed)
+    words = ['chicken', 'garlic', 'lemon', 'butter', 'onion', 'basil', 'tomato', 'rice', 'beans', 'cumin',
+             'pasta', 'ricotta', 'spinach', 'pepper', 'honey', 'ginger', 'salmon', 'potato', 'thyme', 'flour']
+    items = []
+    for i in range(n):
+        ts = Decimal(1_700_000_000 + rnd.randint(0, 10_000_000))
+        items.append({
+            'recipeId': f'{i:08x}-0000-4000-8000-{rnd.getrandbits(48):012x}',
+            'title': ' '.join(rnd.sample(words, 3)).title(),
+            'description': ' '.join(rnd.choices(words, k=20)),
+            'tags': rnd.sample(['italian', 'quick', 'vegetarian', 'dessert', 'soup', 'bbq'], 2),
+            'ingredients': [{'name': w, 'amount': f'{rnd.randint(1, 4)} cups'} for w in rnd.sample(words, 8)],
+            'instructions': [' '.join(rnd.choices(words, k=15)) for _ in range(6)],
+            'servings': str(rnd.randint(2, 8)),
+            'cookTime': f'{rnd.randint(10, 90)} minutes',
+            'rating': Decimal('4.5'),
+            'createdAt': ts,
+            'updatedAt': ts,
+            'createdBySub': 'sub-1234',
+            'createdByName': 'maggie',
+        })
+    return items
+
+
+def legacy_to_jsonable(obj):
+    """The pre-change conversion: rebuilds every dict and list before encoding."""
+    if isinstance(obj, Decimal):
+        return int(obj) if obj % 1 == 0 else float(obj)
+    if isinstance(obj, dict):
+        return {k: legacy_to_jsonable(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [legacy_to_jsonable(v) for v in obj]
+    return obj
+
+
+def timeit(fn, repeat):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--recipes', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    app = load_recipes_app()
+    items = [app.map_recipe_out(i) for i in synthetic_items(args.recipes)]
+    gzip_event = {'headers': {'accept-encoding': 'gzip, deflate, br'}}
+
+    legacy_ms, legacy_body = timeit(lambda: json.dumps(legacy_to_jsonable(items)), args.repeat)
+    current_ms, current = timeit(lambda: app.response(200, items), args.repeat)
+    gzip_ms, gzipped = timeit(lambda: app._maybe_compress(gzip_event, app.response(200, items)), args.repeat)
+
+    assert json.loads(legacy_body) == json.loads(current['body'])
+    # API Gateway decodes the base64 wrapper, so the raw gzip bytes are what goes on the wire
+    raw = base64.b64decode(gzipped['body'])
+    assert gzip.decompress(raw).decode('utf-8') == current['body']
+    wire = len(raw)
+
+    print(f'{args.recipes} recipes, median of {args.repeat} runs')
+    print(f'  legacy _to_jsonable + dumps : {legacy_ms:8.1f} ms  {len(legacy_body):>10,} bytes')
+    print(f'  response() default= hook    : {current_ms:8.1f} ms  {len(current["body"]):>10,} bytes')
+    print(f'  response() + gzip           : {gzip_ms:8.1f} ms  {wire:>10,} bytes on the wire')
+
+
+if __name__ == '__main__':
+    main()
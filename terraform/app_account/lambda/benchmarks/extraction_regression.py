@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Offline regression harness for AI recipe extraction.
+
+Runs the real `_extract_from_url` / `_extract_from_image` pipeline in recipes/app.py
+over saved pages and images in fixtures/extraction/. Page fetches read the saved
+HTML and Bedrock is a stub that replays the recorded `converse` response for each
+case, so nothing touches the network or costs money. Per case it reports:
+
+  parse ms     time spent turning HTML into prompt text (_page_text)
+  html/sent    characters of HTML in and of text sent to the model (system + messages)
+  est tokens   input tokens estimated from what was sent: chars / 4 for text,
+               width * height / 750 per image (Anthropic's sizing rule)
+  coverage     share of the expected title and ingredient names present in the text
+               sent, which drops when the extractor or truncation loses the recipe
+  local        the same coverage for the text local_testing_scripts/extract_from_url.py
+               would send for the saved page (its batch mode feeds many URLs at once)
+  json         whether the recorded reply survives _parse_bedrock_json
+  complete     share of the expected fields that come back non-empty
+
+Replies are fixed recordings, so coverage and token estimates are what move when
+recipes/html_text.py, PAGE_TEXT_LIMIT or prompts.py change; json and complete move when
+_parse_bedrock_json changes. Re-record a response (and update the baseline) when a
+prompt change is expected to change what the model says.
+
+Usage:
+    python benchmarks/extraction_regression.py                    # exits 1 on regressions
+    python benchmarks/extraction_regression.py --update-baseline  # accept the current numbers
+"""
+
+import argparse
+import base64
+import contextlib
+import importlib.util
+import io
+import json
+import math
+import os
+import struct
+import sys
+import time
+
+LAMBDA_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'extraction')
+BASELINE = os.path.join(FIXTURES, 'baseline.json')
+LOCAL_SCRIPT = os.path.join(LAMBDA_ROOT, '..', '..', '..', 'local_testing_scripts', 'extract_from_url.py')
+
+# Allowed growth in estimated input tokens before it counts as a regression
+TOKEN_TOLERANCE = 0.05
+
+
+def load_recipes_app():
+    # The Lambda runtime puts the function directory on sys.path (for prompts.py)
+    if os.path.join(LAMBDA_ROOT, 'recipes') not in sys.path:
+        sys.path.insert(0, os.path.join(LAMBDA_ROOT, 'recipes'))
+    spec = importlib.util.spec_from_file_location('recipes_app', os.path.join(LAMBDA_ROOT, 'recipes', 'app.py'))
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def load_local_extractor():
+    # extract_from_url.py imports its batch helpers from its own directory
+    if os.path.dirname(os.path.abspath(LOCAL_SCRIPT)) not in sys.path:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(LOCAL_SCRIPT)))
+    spec = importlib.util.spec_from_file_location('extract_from_url', LOCAL_SCRIPT)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+class ReplayBedrock:
+    """bedrock-runtime stand-in: returns a recorded converse response and keeps the request."""
+
+    def __init__(self, recorded):
+        self.recorded = recorded
+        self.requests = []
+
+    def converse(self, **kwargs):
+        self.requests.append(kwargs)
+        return self.recorded
+
+
+def _png_size(data):
+    if data[:8] == b'\x89PNG\r\n\x1a\n':
+        return struct.unpack('>II', data[16:24])
+    return None
+
+
+def request_size(request):
+    """(text chars, estimated input tokens) for one converse request."""
+    chars, image_tokens = 0, 0
+    blocks = list(request.get('system') or [])
+    for message in request.get('messages') or []:
+        blocks.extend(message.get('content') or [])
+    for block in blocks:
+        if 'text' in block:
+            chars += len(block['text'])
+        elif 'image' in block:
+            size = _png_size(block['image']['source']['bytes'])
+            # Unknown formats are counted at the cap Bedrock resizes images down to
+            image_tokens += math.ceil(size[0] * size[1] / 750) if size else 1600
+    return chars, math.ceil(chars / 4) + image_tokens
+
+
+def _present(value):
+    return value not in (None, '', [], {})
+
+
+def coverage_of(case, text):
+    """Share of the case's expected title and ingredient names found in `text` (None when not scored)."""
+    expect = case['expect']
+    if expect.get('noRecipe') or case['type'] != 'url':
+        return None
+    needles = [expect['title']] + expect.get('ingredients', [])
+    haystack = text.lower()
+    return round(sum(n.lower() in haystack for n in needles) / len(needles), 3)
+
+
+def score(case, result, sent_text):
+    expect = case['expect']
+    json_ok = isinstance(result, dict) and result.get('error') != 'model returned non-JSON'
+    if expect.get('noRecipe'):
+        complete = 1.0 if json_ok and 'error' in result else 0.0
+    else:
+        fields = expect.get('fields') or ['title']
+        complete = sum(_present(result.get(f)) for f in fields) / len(fields) if json_ok else 0.0
+    return json_ok, round(complete, 3), coverage_of(case, sent_text)
+
+
+def run_case(app, local, case):
+    with open(os.path.join(FIXTURES, 'responses', f"{case['id']}.json"), encoding='utf-8') as f:
+        stub = ReplayBedrock(json.load(f))
+    app._bedrock = stub
+    parse_seconds = []
+    html_chars = 0
+    local_coverage = None
+
+    if case['type'] == 'url':
+        with open(os.path.join(FIXTURES, case['page']), encoding='utf-8') as f:
+            html = f.read()
+        html_chars = len(html)
+        local_coverage = coverage_of(case, local.html_to_text(html))
+        page_text = app._page_text
+
+        def timed_page_text(markup):
+            start = time.perf_counter()
+            try:
+                return page_text(markup)
+            finally:
+                parse_seconds.append(time.perf_counter() - start)
+
+        app._fetch_page = lambda url, timeout: html
+        app._page_text = timed_page_text
+        try:
+            result = app._extract_from_url(case['url'])
+        finally:
+            app._page_text = page_text
+    else:
+        images = []
+        for path in case['images']:
+            with open(os.path.join(FIXTURES, path), 'rb') as f:
+                images.append({'data': base64.b64encode(f.read()).decode('ascii'), 'mediaType': 'image/png'})
+        result = app._extract_from_image(images)
+
+    request = stub.requests[-1]
+    sent_text = '\n'.join(
+        block['text'] for message in request['messages'] for block in message['content'] if 'text' in block
+    )
+    chars, tokens = request_size(request)
+    json_ok, complete, coverage = score(case, result, sent_text)
+    return {
+        'parseMs': round(sum(parse_seconds) * 1000, 3),
+        'htmlChars': html_chars,
+        'sentChars': chars,
+        'estInputTokens': tokens,
+        'coverage': coverage,
+        'localCoverage': local_coverage,
+        'jsonOk': json_ok,
+        'completeness': complete,
+    }
+
+
+def run(case_ids=None):
+    """Run every fixture case (or just `case_ids`) and return {'cases': {...}, 'summary': {...}}."""
+    with open(os.path.join(FIXTURES, 'cases.json'), encoding='utf-8') as f:
+        cases = [c for c in json.load(f) if not case_ids or c['id'] in case_ids]
+    app = load_recipes_app()
+    local = load_local_extractor()
+    results = {}
+    # The pipeline logs usage and metrics lines to stdout; keep the report readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        for case in cases:
+            results[case['id']] = run_case(app, local, case)
+    coverages = [r['coverage'] for r in results.values() if r['coverage'] is not None]
+    summary = {
+        'cases': len(results),
+        'jsonSuccessRate': round(sum(r['jsonOk'] for r in results.values()) / len(results), 3),
+        'meanCompleteness': round(sum(r['completeness'] for r in results.values()) / len(results), 3),
+        'meanCoverage': round(sum(coverages) / len(coverages), 3) if coverages else None,
+        'estInputTokens': sum(r['estInputTokens'] for r in results.values()),
+        'parseMs': round(sum(r['parseMs'] for r in results.values()), 3),
+    }
+    return {'promptVersion': app.prompts.PROMPT_VERSION, 'cases': results, 'summary': summary}
+
+
+def compare(report, baseline):
+    """Regressions of `report` against `baseline`, as human-readable strings (empty when clean).
+
+    Parse time is reported but never gated: it is too noisy on shared CI machines.
+    """
+    problems = []
+    for case_id, base in baseline['cases'].items():
+        cur = report['cases'].get(case_id)
+        if cur is None:
+            problems.append(f'{case_id}: missing from this run')
+            continue
+        if base['jsonOk'] and not cur['jsonOk']:
+            problems.append(f'{case_id}: reply no longer parses as JSON')
+        if cur['completeness'] < base['completeness']:
+            problems.append(f"{case_id}: completeness {base['completeness']} -> {cur['completeness']}")
+        if base['coverage'] is not None and (cur['coverage'] or 0) < base['coverage']:
+            problems.append(f"{case_id}: coverage {base['coverage']} -> {cur['coverage']}")
+        if base.get('localCoverage') is not None and (cur['localCoverage'] or 0) < base['localCoverage']:
+            problems.append(f"{case_id}: local script coverage {base['localCoverage']} -> {cur['localCoverage']}")
+        if cur['estInputTokens'] > base['estInputTokens'] * (1 + TOKEN_TOLERANCE):
+            problems.append(f"{case_id}: est. input tokens {base['estInputTokens']} -> {cur['estInputTokens']}")
+    if report['summary']['jsonSuccessRate'] < baseline['summary']['jsonSuccessRate']:
+        problems.append(f"JSON success rate {baseline['summary']['jsonSuccessRate']} -> {report['summary']['jsonSuccessRate']}")
+    return problems
+
+
+def format_report(report, baseline=None):
+    lines = [
+        f"prompt={report['promptVersion']}",
+        f"{'case':<18} {'parse ms':>9} {'html':>7} {'sent':>7} {'tokens':>7} {'cover':>6} {'local':>6} {'json':>5} {'complete':>9}",
+    ]
+    for case_id, r in report['cases'].items():
+        coverage = '-' if r['coverage'] is None else f"{r['coverage']:.2f}"
+        local = '-' if r['localCoverage'] is None else f"{r['localCoverage']:.2f}"
+        line = (f"{case_id:<18} {r['parseMs']:>9.3f} {r['htmlChars']:>7} {r['sentChars']:>7} {r['estInputTokens']:>7} "
+                f"{coverage:>6} {local:>6} {'ok' if r['jsonOk'] else 'FAIL':>5} {r['completeness']:>9.2f}")
+        base = (baseline or {}).get('cases', {}).get(case_id)
+        if base and base['estInputTokens']:
+            line += f"   tokens {(r['estInputTokens'] - base['estInputTokens']) / base['estInputTokens'] * 100:+.1f}%"
+        lines.append(line)
+    s = report['summary']
+    lines.append(
+        f"{s['cases']} cases: json {s['jsonSuccessRate']:.0%}, completeness {s['meanCompleteness']:.2f}, "
+        f"coverage {s['meanCoverage']}, {s['estInputTokens']} est. input tokens, {s['parseMs']} ms parsing"
+    )
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay recorded extraction cases and check for regressions.')
+    parser.add_argument('--case', action='append', help='run only this case id (repeatable)')
+    parser.add_argument('--update-baseline', action='store_true', help='write this run to fixtures/extraction/baseline.json')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+
+    report = run(args.case)
+    baseline = None
+    if os.path.exists(BASELINE):
+        with open(BASELINE, encoding='utf-8') as f:
+            baseline = json.load(f)
+    print(json.dumps(report, indent=2) if args.json else format_report(report, baseline))
+
+    if args.update_baseline:
+        # parseMs is machine-specific; keep it out of the committed baseline
+        stored = json.loads(json.dumps(report))
+        for r in stored['cases'].values():
+            r.pop('parseMs')
+        stored['summary'].pop('parseMs')
+        with open(BASELINE, 'w', encoding='utf-8') as f:
+            json.dump(stored, f, indent=2)
+            f.write('\n')
+        print(f'saved {BASELINE}', file=sys.stderr)
+        return
+
+    if baseline:
+        problems = compare(report, baseline)
+        for problem in problems:
+            print(f'REGRESSION {problem}', file=sys.stderr)
+        if problems:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+Load test the recipes and images Lambda handlers against moto-backed DynamoDB and S3.
+
+Seeds realistic data volumes, drives `handler` with synthetic API Gateway v1/v2
+events from concurrent workers, and reports throughput and p50/p95/p99 latency
+per route. Each worker loads its own copy of the handler modules, the same way
+each Lambda container has its own warm globals. Bedrock is stubbed with a
+configurable latency.
+
+moto's own per-item cost dominates the list routes (a 300-recipe scan takes
+about 2 s), so absolute numbers are only meaningful against a baseline taken on
+the same machine with the same data volume. Concurrency is bounded by the GIL.
+
+Usage:
+    python benchmarks/load_test.py --recipes 1000 --requests 2000 --concurrency 8
+    python benchmarks/load_test.py --recipes 10000 --save main        # writes baselines/main.json
+    python benchmarks/load_test.py --recipes 10000 --compare main     # diff against a saved baseline
+"""
+
+import argparse
+import base64
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+LAMBDA_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+
+RECIPES_TABLE = 'mbm-recipes'
+RATINGS_TABLE = 'mbm-ratings'
+IMAGES_BUCKET = 'mbm-site-images-bench'
+
+# Relative weights of each route in the request mix
+DEFAULT_MIX = {
+    'GET /recipes': 10,
+    'GET /recipes/{id}': 30,
+    'GET /recipes?since': 10,
+    'GET /recipes/search': 15,
+    'GET /ratings': 15,
+    'POST /recipes': 5,
+    'POST /ratings': 5,
+    'POST /ai/extract-recipe': 2,
+    'POST /images': 4,
+    'GET /images/{key+}': 4,
+}
+
+WORDS = ['chicken', 'garlic', 'lemon', 'butter', 'onion', 'basil', 'tomato', 'rice', 'beans', 'cumin',
+         'pasta', 'ricotta', 'spinach', 'pepper', 'honey', 'ginger', 'salmon', 'potato', 'thyme', 'flour']
+TAGS = ['italian', 'quick', 'vegetarian', 'dessert', 'soup', 'bbq', 'breakfast', 'mexican']
+
+# Smallest valid PNG; the stubbed model never looks at it
+TINY_PNG = base64.b64encode(bytes.fromhex(
+    '89504e470d0a1a0a0000000d4948445200000001000000010806000000'
+    '1f15c4890000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082'
+)).decode('ascii')
+
+
+def load_module(name, path):
+    # The Lambda runtime puts the function directory on sys.path (for prompts.py)
+    if os.path.dirname(path) not in sys.path:
+        sys.path.insert(0, os.path.dirname(path))
+    spec = importlib.util.spec_from_file_location(name, path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+class StubBedrock:
+    """Stands in for the bedrock-runtime client: sleeps, then returns a canned recipe."""
+
+    def __init__(self, latency_ms):
+        self.latency_ms = latency_ms
+
+    def converse(self, **kwargs):
+        time.sleep(self.latency_ms / 1000)
+        text = json.dumps({'title': 'Stub Stew', 'ingredients': [{'name': 'water', 'amount': '1 cup'}]})
+        return {
+            'output': {'message': {'content': [{'text': text}]}},
+            'usage': {'inputTokens': 1200, 'outputTokens': 150},
+        }
+
+
+def synthetic_recipe(rnd, i, now):
+    ts = now - rnd.randint(0, 20 * 86400)
+    return {
+        'recipeId': f'bench-{i:07d}',
+        'title': ' '.join(rnd.sample(WORDS, 3)).title(),
+        'description': ' '.join(rnd.choices(WORDS, k=20)),
+        'tags': rnd.sample(TAGS, 2),
+        'ingredients': [{'name': w, 'amount': f'{rnd.randint(1, 4)} cups'} for w in rnd.sample(WORDS, 8)],
+        'instructions': [' '.join(rnd.choices(WORDS, k=15)) for _ in range(6)],
+        'servings': str(rnd.randint(2, 8)),
+        'cookTime': f'{rnd.randint(10, 90)} minutes',
+        'createdAt': ts,
+        'updatedAt': ts,
+        'syncBucket': 'all',
+        'createdBySub': 'bench-user',
+        'createdByName': 'bench',
+    }
+
+
+def create_resources(boto3):
+    ddb = boto3.resource('dynamodb', region_name='us-east-1')
+    ddb.create_table(
+        TableName=RECIPES_TABLE,
+        KeySchema=[{'AttributeName': 'recipeId', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[
+            {'AttributeName': 'recipeId', 'AttributeType': 'S'},
+            {'AttributeName': 'syncBucket', 'AttributeType': 'S'},
+            {'AttributeName': 'updatedAt', 'AttributeType': 'N'},
+        ],
+        GlobalSecondaryIndexes=[{
+            'IndexName': 'gsi_updated_at',
+            'KeySchema': [
+                {'AttributeName': 'syncBucket', 'KeyType': 'HASH'},
+                {'AttributeName': 'updatedAt', 'KeyType': 'RANGE'},
+            ],
+            'Projection': {'ProjectionType': 'ALL'},
+        }],
+        BillingMode='PAY_PER_REQUEST',
+    ).wait_until_exists()
+    ddb.create_table(
+        TableName=RATINGS_TABLE,
+        KeySchema=[{'AttributeName': 'ratingId', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': 'ratingId', 'AttributeType': 'S'}],
+        BillingMode='PAY_PER_REQUEST',
+    ).wait_until_exists()
+    boto3.client('s3', region_name='us-east-1').create_bucket(Bucket=IMAGES_BUCKET)
+    return ddb
+
+
+def seed(ddb, n_recipes, ratings_per_recipe, seed_value=7):
+    rnd = random.Random(seed_value)
+    now = int(time.time())
+    ids = []
+    with ddb.Table(RECIPES_TABLE).batch_writer() as batch:
+        for i in range(n_recipes):
+            item = synthetic_recipe(rnd, i, now)
+            ids.append(item['recipeId'])
+            batch.put_item(Item=item)
+    with ddb.Table(RATINGS_TABLE).batch_writer() as batch:
+        for i, rid in enumerate(ids):
+            for j in range(ratings_per_recipe):
+                batch.put_item(Item={
+                    'ratingId': f'rating-{i:07d}-{j}',
+                    'recipeId': rid,
+                    'stars': Decimal(rnd.randint(1, 5)),
+                })
+    return ids
+
+
+def make_event(route, rnd, ids, payload):
+    """Build an API Gateway event for `route`; payload is 'v1' or 'v2'."""
+    rid = rnd.choice(ids)
+    method, _, path = route.partition(' ')
+    query = {}
+    body = None
+    route_key = route
+    if route == 'GET /recipes/{id}':
+        path = f'/recipes/{rid}'
+    elif route == 'GET /recipes?since':
+        path, route_key = '/recipes', 'GET /recipes'
+        query = {'since': str(int(time.time()) - 86400)}
+    elif route == 'GET /recipes/search':
+        query = {'q': rnd.choice(WORDS)[:4]}
+    elif route == 'GET /ratings':
+        query = {'recipeId': rid}
+    elif route == 'POST /recipes':
+        body = {'title': 'Bench ' + ' '.join(rnd.sample(WORDS, 2)), 'tags': rnd.sample(TAGS, 1)}
+    elif route == 'POST /ratings':
+        body = {'recipeId': rid, 'stars': rnd.randint(1, 5)}
+    elif route == 'POST /ai/extract-recipe':
+        body = {'type': 'image', 'images': [{'data': TINY_PNG, 'mediaType': 'image/png'}]}
+    elif route == 'POST /images':
+        body = {'filename': 'photo.jpg', 'type': 'image/jpeg'}
+    elif route == 'GET /images/{key+}':
+        path = f'/images/uploads/{rid}.jpg'
+
+    path_params = {'id': rid} if '{id}' in route_key else {}
+    headers = {'accept-encoding': 'gzip', 'content-type': 'application/json'}
+    body_text = json.dumps(body) if body is not None else None
+    if payload == 'v1':
+        return {
+            'resource': route_key.partition(' ')[2],
+            'path': path,
+            'httpMethod': method,
+            'headers': headers,
+            'queryStringParameters': query or None,
+            'pathParameters': path_params or None,
+            'requestContext': {'httpMethod': method, 'resourcePath': route_key.partition(' ')[2]},
+            'body': body_text,
+            'isBase64Encoded': False,
+        }
+    return {
+        'version': '2.0',
+        'routeKey': route_key,
+        'rawPath': path,
+        'headers': headers,
+        'queryStringParameters': query or None,
+        'pathParameters': path_params or None,
+        'requestContext': {'http': {'method': method, 'path': path}, 'routeKey': route_key},
+        'body': body_text,
+        'isBase64Encoded': False,
+    }
+
+
+class Worker:
+    """One simulated warm container: private copies of the handler modules."""
+
+    _load_lock = threading.Lock()
+
+    def __init__(self, index, bedrock_latency_ms):
+        with self._load_lock:
+            self.recipes = load_module(f'recipes_app_{index}', os.path.join(LAMBDA_ROOT, 'recipes', 'app.py'))
+            self.images = load_module(f'images_app_{index}', os.path.join(LAMBDA_ROOT, 'images', 'app.py'))
+        self.recipes._bedrock = StubBedrock(bedrock_latency_ms)
+
+    def invoke(self, route, event):
+        handler = self.images.handler if '/images' in route else self.recipes.handler
+        start = time.perf_counter()
+        res = handler(event, None)
+        return (time.perf_counter() - start) * 1000, res.get('statusCode', 500)
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def run(n_recipes=1000, ratings_per_recipe=3, requests=2000, concurrency=8, payload='mixed',
+        bedrock_latency_ms=50, mix=None, seed_value=7):
+    """Seed, drive the handlers and return a report dict. Must be called under moto's mock_aws()."""
+    import boto3
+
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    os.environ.update({
+        'RECIPES_TABLE': RECIPES_TABLE,
+        'RATINGS_TABLE': RATINGS_TABLE,
+        'RECIPES_UPDATED_INDEX': 'gsi_updated_at',
+        'IMAGES_BUCKET': IMAGES_BUCKET,
+    })
+    os.environ.pop('BEDROCK_ROLE_ARN', None)
+    os.environ.pop('RECIPES_SNAPSHOT_URL', None)
+
+    ddb = create_resources(boto3)
+    seed_start = time.perf_counter()
+    ids = seed(ddb, n_recipes, ratings_per_recipe, seed_value)
+    seed_s = time.perf_counter() - seed_start
+
+    mix = mix or DEFAULT_MIX
+    rnd = random.Random(seed_value)
+    routes = rnd.choices(list(mix), weights=list(mix.values()), k=requests)
+    plan = []
+    for i, route in enumerate(routes):
+        fmt = payload if payload != 'mixed' else ('v1' if i % 2 else 'v2')
+        plan.append((route, make_event(route, rnd, ids, fmt)))
+
+    workers = [Worker(i, bedrock_latency_ms) for i in range(concurrency)]
+    results = [None] * len(plan)
+
+    def drive(w):
+        for i in range(w, len(plan), concurrency):
+            route, event = plan[i]
+            results[i] = (route, *workers[w].invoke(route, event))
+
+    # Handlers print diagnostics and EMF lines on every call; keep them out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(drive, range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    per_route = {}
+    for route, ms, status in results:
+        r = per_route.setdefault(route, {'latencies': [], 'errors': 0})
+        r['latencies'].append(ms)
+        if status >= 500:
+            r['errors'] += 1
+
+    routes_report = {}
+    for route, r in sorted(per_route.items()):
+        lat = sorted(r['latencies'])
+        routes_report[route] = {
+            'count': len(lat),
+            'errors': r['errors'],
+            'p50_ms': round(percentile(lat, 50), 3),
+            'p95_ms': round(percentile(lat, 95), 3),
+            'p99_ms': round(percentile(lat, 99), 3),
+        }
+    return {
+        'config': {
+            'recipes': n_recipes,
+            'ratings_per_recipe': ratings_per_recipe,
+            'requests': requests,
+            'concurrency': concurrency,
+            'payload': payload,
+            'bedrock_latency_ms': bedrock_latency_ms,
+        },
+        'commit': _git_commit(),
+        'seed_seconds': round(seed_s, 3),
+        'elapsed_seconds': round(elapsed, 3),
+        'throughput_rps': round(len(plan) / elapsed, 2) if elapsed else 0.0,
+        'routes': routes_report,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=LAMBDA_ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def format_report(report, baseline=None):
+    lines = [
+        f"commit={report['commit']} recipes={report['config']['recipes']} requests={report['config']['requests']} "
+        f"concurrency={report['config']['concurrency']} payload={report['config']['payload']}",
+        f"seeded in {report['seed_seconds']}s; ran in {report['elapsed_seconds']}s; {report['throughput_rps']} req/s",
+        f"{'route':<26} {'count':>6} {'err':>4} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}",
+    ]
+    for route, r in report['routes'].items():
+        line = f"{route:<26} {r['count']:>6} {r['errors']:>4} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f}"
+        base = (baseline or {}).get('routes', {}).get(route)
+        if base and base['p95_ms']:
+            delta = (r['p95_ms'] - base['p95_ms']) / base['p95_ms'] * 100
+            line += f"   p95 {delta:+.1f}% vs {baseline.get('commit') or 'baseline'}"
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the Lambda handlers against moto.')
+    parser.add_argument('--recipes', type=int, default=1000)
+    parser.add_argument('--ratings-per-recipe', type=int, default=3)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--payload', choices=['v1', 'v2', 'mixed'], default='mixed')
+    parser.add_argument('--bedrock-latency-ms', type=float, default=50)
+    parser.add_argument('--save', metavar='NAME', help='write the report to baselines/NAME.json')
+    parser.add_argument('--compare', metavar='NAME', help='compare p95 against baselines/NAME.json')
+    args = parser.parse_args()
+
+    from moto import mock_aws
+
+    with mock_aws():
+        report = run(args.recipes, args.ratings_per_recipe, args.requests, args.concurrency,
+                     args.payload, args.bedrock_latency_ms)
+
+    baseline = None
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f'{args.compare}.json')) as f:
+            baseline = json.load(f)
+    print(format_report(report, baseline))
+
+    if args.save:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        path = os.path.join(BASELINE_DIR, f'{args.save}.json')
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'saved {path}', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,9 +4,14 @@ import boto3
 from botocore.exceptions import ClientError
 import logging
 
+from telemetry import Metrics, trace_context
+
 s3 = boto3.client('s3')
 IMAGES_BUCKET = os.environ.get('IMAGES_BUCKET')
 
+# Per-request timings, emitted as one CloudWatch Embedded Metric Format (EMF) log line (telemetry.py)
+_cold_start = True
+
 
 def response(status_code, body):
     return {
@@ -74,6 +79,25 @@ def _extract_request(event: dict):
 
 
 def handler(event, context):
+    global _cold_start
+    metrics = Metrics(*trace_context(event))
+    status = 500
+    try:
+        # Presigning is local signing work, so one handler span is the only phase worth timing
+        with metrics.timed('Total', 'handler'):
+            res, metrics.route = _route(event, context)
+        status = res.get('statusCode', 200)
+        return res
+    finally:
+        try:
+            print(json.dumps(metrics.emf(status, _cold_start)))
+        except Exception:
+            pass
+        _cold_start = False
+
+
+def _route(event, context):
+    """Return (response, route label for metrics)."""
     # Support two operations:
     # POST /images -> returns { uploadUrl, key }
     # GET /images/{key} -> returns { url }
@@ -149,7 +173,7 @@ def handler(event, context):
                 'fields': post_fields,
                 'key': key,
                 'url': get_url
-            })
+            }), 'POST /images'
 
         # GET presigned view URL: /images/{key}
         is_get_image = (method == 'GET') and (
@@ -161,7 +185,7 @@ def handler(event, context):
                 key = path.split('/images/', 1)[1]
             else:
                 # Fallback: nothing to extract
-                return response(400, {'message': 'Missing image key in path', 'path': path})
+                return response(400, {'message': 'Missing image key in path', 'path': path}), 'GET /images/{key+}'
             # decode if needed
             from urllib.parse import unquote
             key = unquote(key)
@@ -171,13 +195,13 @@ def handler(event, context):
                 ExpiresIn=3600
             )
             # Redirect to the signed URL so <img src> works directly
-            return redirect(url, 302)
+            return redirect(url, 302), 'GET /images/{key+}'
 
         # Default if nothing matched
-        return response(400, {'message': 'Unsupported operation', 'method': method, 'path': path})
+        return response(400, {'message': 'Unsupported operation', 'method': method, 'path': path}), route_key
     except ClientError as e:
         logging.exception("ClientError while handling request")
-        return response(500, {'error': str(e)})
+        return response(500, {'error': str(e)}), route_key
     except Exception as e:
         logging.exception("Unhandled error while handling request")
-        return response(500, {'error': 'Internal server error'})
+        return response(500, {'error': 'Internal server error'}), route_key
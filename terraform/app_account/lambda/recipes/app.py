@@ -2,95 +2,388 @@ import os
 import json
 from decimal import Decimal
 import uuid
+import math
 import time
+import re
+import bisect
+import hashlib
+import heapq
+import io
+import cProfile
+import threading
+import random
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 # v2 — includes AI recipe extraction handler
 import base64
+import gzip
+import urllib.parse
 import urllib.request
-from html.parser import HTMLParser
 import boto3
-from botocore.exceptions import ClientError
+import botocore.session
+from botocore.config import Config
+from botocore.credentials import CredentialProvider, RefreshableCredentials
+from botocore.exceptions import ClientError, ConnectTimeoutError, EndpointConnectionError, ReadTimeoutError
+from boto3.dynamodb.conditions import Key, Attr
+
+import prompts
+from html_text import PAGE_TEXT_LIMIT, TextExtractor as _TextExtractor, page_text as _html_page_text
+from ddb_utils import RECIPE_FIELDS, json_default as _json_default, projection as _projection, query_all as _query_all, scan_all as _scan_all
+import ingredients as ingredient_parser
+import recipe_items
+from telemetry import Metrics as _Metrics, trace_context as _trace_context
 
 RECIPES_TABLE = os.environ.get('RECIPES_TABLE')
 RATINGS_TABLE = os.environ.get('RATINGS_TABLE')
 
+# Delta sync: recipes carry a constant syncBucket so a GSI can range over updatedAt.
+# Deletes leave a tombstone that DynamoDB TTL removes after TOMBSTONE_TTL_DAYS.
+RECIPES_UPDATED_INDEX = os.environ.get('RECIPES_UPDATED_INDEX')
+SYNC_BUCKET = recipe_items.SYNC_BUCKET
+TOMBSTONE_TTL = int(os.environ.get('TOMBSTONE_TTL_DAYS', '30')) * 86400
+
+# When set, full list reads redirect to the CDN snapshot published by the snapshot Lambda.
+# With RECIPES_SNAPSHOT_BUCKET set, the redirect waits until the object exists: before the
+# first publish, CloudFront would answer with a 404 (or worse, an HTML page) instead of JSON.
+RECIPES_SNAPSHOT_URL = os.environ.get('RECIPES_SNAPSHOT_URL')
+RECIPES_SNAPSHOT_BUCKET = os.environ.get('RECIPES_SNAPSHOT_BUCKET')
+RECIPES_SNAPSHOT_KEY = os.environ.get('RECIPES_SNAPSHOT_KEY', 'data/recipes-index.json')
+SNAPSHOT_RECHECK_SECONDS = 60
+
 BEDROCK_MODEL = "us.anthropic.claude-sonnet-4-6"
 # For ~10x cost reduction with slightly lower quality, switch to: us.anthropic.claude-haiku-4-5
 
+# Bedrock resilience. Retries are ours (full jitter, bounded by the Lambda deadline);
+# botocore only does one attempt per call, in adaptive mode for client-side rate limiting.
+# While the circuit is open, calls fail fast or go to BEDROCK_FALLBACK_MODEL if set.
+BEDROCK_FALLBACK_MODEL = os.environ.get('BEDROCK_FALLBACK_MODEL')
+BEDROCK_MAX_ATTEMPTS = int(os.environ.get('BEDROCK_MAX_ATTEMPTS', '3'))
+BEDROCK_MIN_ATTEMPT_SECONDS = float(os.environ.get('BEDROCK_MIN_ATTEMPT_SECONDS', '3'))
+BEDROCK_BREAKER_THRESHOLD = int(os.environ.get('BEDROCK_BREAKER_THRESHOLD', '5'))
+BEDROCK_BREAKER_COOLDOWN = float(os.environ.get('BEDROCK_BREAKER_COOLDOWN', '30'))
+# Time kept back from the Lambda timeout to build and return the error response
+DEADLINE_SAFETY_SECONDS = 1.5
+BEDROCK_READ_TIMEOUT = float(os.environ.get('BEDROCK_READ_TIMEOUT', '25'))
+_BEDROCK_CONFIG = Config(
+    connect_timeout=3,
+    read_timeout=BEDROCK_READ_TIMEOUT,
+    retries={'mode': 'adaptive', 'total_max_attempts': 1},
+)
+# botocore fixes the read timeout per client, so attempts near the deadline use one of a few
+# shorter-timeout clients (halving down to the minimum attempt time): an attempt never blocks
+# past the deadline, and a container builds at most ~4 clients.
+_BEDROCK_READ_TIMEOUTS = [BEDROCK_READ_TIMEOUT]
+while _BEDROCK_READ_TIMEOUTS[-1] / 2 > BEDROCK_MIN_ATTEMPT_SECONDS:
+    _BEDROCK_READ_TIMEOUTS.append(_BEDROCK_READ_TIMEOUTS[-1] / 2)
+if BEDROCK_MIN_ATTEMPT_SECONDS < BEDROCK_READ_TIMEOUT:
+    _BEDROCK_READ_TIMEOUTS.append(BEDROCK_MIN_ATTEMPT_SECONDS)
+_RETRYABLE_BEDROCK_ERRORS = {
+    'ThrottlingException',
+    'ServiceUnavailableException',
+    'InternalServerException',
+    'ModelNotReadyException',
+    'ModelTimeoutException',
+}
+
+# Per-user admission control for AI extraction: a token bucket plus an in-flight cap, kept in
+# DynamoDB so it holds across containers. Disabled when RATE_LIMIT_TABLE is unset.
+RATE_LIMIT_TABLE = os.environ.get('RATE_LIMIT_TABLE')
+AI_RATE_CAPACITY = float(os.environ.get('AI_RATE_CAPACITY', '10'))
+AI_RATE_REFILL_PER_MINUTE = float(os.environ.get('AI_RATE_REFILL_PER_MINUTE', '4'))
+AI_MAX_IN_FLIGHT = int(os.environ.get('AI_MAX_IN_FLIGHT', '2'))
+# In-flight leases expire on their own if a container dies before releasing them
+AI_LEASE_SECONDS = int(os.environ.get('AI_LEASE_SECONDS', '120'))
+
+# Idempotency-Key support for POST /recipes and AI extraction. Records keep the stored response
+# for IDEMPOTENCY_TTL_HOURS; an IN_PROGRESS record whose lock has lapsed can be taken over.
+IDEMPOTENCY_TABLE = os.environ.get('IDEMPOTENCY_TABLE')
+IDEMPOTENCY_TTL = int(os.environ.get('IDEMPOTENCY_TTL_HOURS', '24')) * 3600
+IDEMPOTENCY_LOCK_SECONDS = int(os.environ.get('IDEMPOTENCY_LOCK_SECONDS', '90'))
+
+# GET /bootstrap: recipe summaries, rating aggregates, image URLs and identity in one response.
+# Image URLs are presigned once per BOOTSTRAP_URL_WINDOW (part of the ETag) and stay valid for
+# two windows, so a copy revalidated with 304 inside its window still has working links.
+IMAGES_BUCKET = os.environ.get('IMAGES_BUCKET')
+BOOTSTRAP_URL_WINDOW = int(os.environ.get('BOOTSTRAP_URL_WINDOW_SECONDS', '1800'))
+BOOTSTRAP_SCAN_SEGMENTS = int(os.environ.get('BOOTSTRAP_SCAN_SEGMENTS', '2'))
+SUMMARY_FIELDS = ('title', 'description', 'tags', 'image', 'servings', 'cookTime',
+                  'createdByName', 'createdAt', 'updatedAt')
+
+# Near-duplicate detection (disabled when DEDUP_TABLE is unset). Each recipe gets a MinHash
+# signature over its title words, ingredient names and 3-word instruction shingles. LSH
+# splits the signature into bands; every band value is a bucket item listing the recipeIds
+# that share it. Recipes with Jaccard similarity s share a bucket with probability
+# 1 - (1 - s^ROWS)^BANDS: about 0.65 at s=0.5 and 0.99 at s=0.8 for 16 bands of 4 rows.
+# Buckets are maintained off the request path by dedup_stream_handler.
+DEDUP_TABLE = os.environ.get('DEDUP_TABLE')
+DEDUP_FIELDS = ('recipeId', 'title', 'ingredients', 'instructions', 'sourceUrl', 'updatedAt', 'deleted')
+DUPLICATE_THRESHOLD = float(os.environ.get('DUPLICATE_THRESHOLD', '0.5'))
+MINHASH_BANDS = 16
+MINHASH_ROWS = 4
+
+# Per-request timings, emitted as one CloudWatch Embedded Metric Format (EMF) log line (telemetry.py)
+_cold_start = True
+
+# Opt-in profiling: with PROFILE_SLOWEST_N > 0 every request runs under cProfile and
+# the stats of any request among the N slowest seen by this container are logged.
+PROFILE_SLOWEST_N = int(os.environ.get('PROFILE_SLOWEST_N', '0'))
+_slowest = []  # min-heap of the N slowest durations (ms)
+
+
+_metrics = _Metrics()
+
+
+def timed(name, span=None, **attributes):
+    """Time a block into the current request's metrics and trace, e.g. `with timed('Bedrock'): ...`."""
+    return _metrics.timed(name, span, **attributes)
+
+
+def _log_if_slowest(profiler, duration_ms):
+    """Log profiler stats when this request ranks among the PROFILE_SLOWEST_N slowest so far."""
+    if len(_slowest) < PROFILE_SLOWEST_N:
+        heapq.heappush(_slowest, duration_ms)
+    elif duration_ms > _slowest[0]:
+        heapq.heapreplace(_slowest, duration_ms)
+    else:
+        return
+    import pstats
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(30)
+    print(json.dumps({
+        'profile': {
+            'traceId': _metrics.trace_id,
+            'route': _metrics.route,
+            'durationMs': round(duration_ms, 3),
+            'stats': out.getvalue(),
+        }
+    }))
+
+
+class _TimedTable:
+    """DynamoDB Table wrapper that times every call under the DynamoDB metric."""
+
+    def __init__(self, table):
+        self._table = table
+
+    def __getattr__(self, name):
+        attr = getattr(self._table, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            with timed('DynamoDB', f'DynamoDB.{name}', table=self._table.name):
+                return attr(*args, **kwargs)
+        return call
+
+
 _bedrock = None
-_bedrock_expiry = 0  # epoch seconds; 0 means never set
+_bedrock_lock = threading.Lock()
+_sts = None
+
+
+def _assume_bedrock_role(role_arn):
+    """Credential metadata in the shape botocore's RefreshableCredentials expects."""
+    global _sts
+    if _sts is None:
+        _sts = boto3.client("sts")
+    with timed('AssumeRole', 'STS.AssumeRole'):
+        assumed = _sts.assume_role(
+            RoleArn=role_arn,
+            RoleSessionName="mbm-recipes-bedrock",
+        )
+    creds = assumed["Credentials"]
+    return {
+        "access_key": creds["AccessKeyId"],
+        "secret_key": creds["SecretAccessKey"],
+        "token": creds["SessionToken"],
+        "expiry_time": creds["Expiration"].isoformat(),
+    }
+
+
+_bedrock_session = None
+# Shorter-read-timeout clients, keyed by timeout; they share the session and its credentials
+_bedrock_short = {}
+
+
+class _BedrockRoleProvider(CredentialProvider):
+    """Credential provider that hands botocore the shared assumed-role credentials."""
+
+    METHOD = 'sts-assume-role'
+    CANONICAL_NAME = 'mbm-bedrock-role'
+
+    def __init__(self, credentials):
+        super().__init__()
+        self._role_credentials = credentials
+
+    def load(self):
+        return self._role_credentials
+
+
+def _new_bedrock_client(read_timeout):
+    """A bedrock-runtime client whose calls give up reading after `read_timeout` seconds.
 
-def get_bedrock():
-    global _bedrock, _bedrock_expiry
+    With BEDROCK_ROLE_ARN every client signs with the same RefreshableCredentials:
+    botocore renews them 15 minutes before expiry and lets a single caller refresh
+    while others keep using the current keys.
+    """
+    global _bedrock_session
     region = os.environ.get("AWS_REGION", "us-east-1")
-    role_arn = os.environ.get("BEDROCK_ROLE_ARN")
-    if role_arn:
-        # Refresh assumed-role credentials when they're within 5 minutes of expiry
-        if _bedrock is None or time.time() > _bedrock_expiry - 300:
-            sts = boto3.client("sts")
-            assumed = sts.assume_role(
-                RoleArn=role_arn,
-                RoleSessionName="mbm-recipes-bedrock",
+    if _bedrock_session is None:
+        role_arn = os.environ.get("BEDROCK_ROLE_ARN")
+        if role_arn:
+            credentials = RefreshableCredentials.create_from_metadata(
+                metadata=_assume_bedrock_role(role_arn),
+                refresh_using=lambda: _assume_bedrock_role(role_arn),
+                method="sts-assume-role",
             )
-            creds = assumed["Credentials"]
-            _bedrock_expiry = int(assumed["Credentials"]["Expiration"].timestamp())
-            _bedrock = boto3.client(
-                "bedrock-runtime",
-                region_name=region,
-                aws_access_key_id=creds["AccessKeyId"],
-                aws_secret_access_key=creds["SecretAccessKey"],
-                aws_session_token=creds["SessionToken"],
-            )
-    elif _bedrock is None:
-        _bedrock = boto3.client("bedrock-runtime", region_name=region)
-    return _bedrock
-
-
-AI_SYSTEM_PROMPT = """You are a recipe extraction assistant. Extract recipe information and return ONLY a JSON object.
-
-Return a JSON object with these fields (omit any you cannot determine):
-{
-  "title": "string (required)",
-  "description": "short summary string",
-  "tags": ["category", "strings"],
-  "ingredients": [{"name": "string", "amount": "string"}],
-  "servings": "string e.g. '4' or '4-6'",
-  "cookTime": "string e.g. '30 minutes'",
-  "instructions": ["step 1", "step 2"]
-}
+            session = botocore.session.get_session()
+            # Ahead of the environment: those are the function's own keys, which can't call Bedrock
+            session.get_component('credential_provider').insert_before('env', _BedrockRoleProvider(credentials))
+            _bedrock_session = boto3.Session(botocore_session=session)
+        else:
+            _bedrock_session = boto3.Session()
+    config = _BEDROCK_CONFIG.merge(Config(read_timeout=read_timeout))
+    return _bedrock_session.client("bedrock-runtime", region_name=region, config=config)
 
-Rules:
-- Return ONLY valid JSON. No markdown fences, no explanation.
-- ingredients[].amount is quantity+unit as a string (e.g. "1 cup", "200g"), omit if unknown.
-- instructions are ordered plain strings with no numbering prefix.
-- tags are concise descriptors like ["italian", "pasta", "vegetarian"].
-- Ignore ads, navigation, comments, and unrelated content.
-- If no recipe is present, return {"error": "no recipe found"}."""
 
+def get_bedrock(read_timeout=None):
+    """Return a shared bedrock-runtime client, built once per container and timeout.
 
-class _TextExtractor(HTMLParser):
-    SKIP_TAGS = {"script", "style", "noscript", "head", "meta", "link"}
+    read_timeout picks a shorter-timeout client for attempts close to the deadline;
+    None (or anything at least BEDROCK_READ_TIMEOUT) gets the default client.
+    """
+    global _bedrock
+    if read_timeout is None or read_timeout >= BEDROCK_READ_TIMEOUT:
+        if _bedrock is None:
+            with _bedrock_lock:
+                if _bedrock is None:
+                    _bedrock = _new_bedrock_client(BEDROCK_READ_TIMEOUT)
+        return _bedrock
+    client = _bedrock_short.get(read_timeout)
+    if client is None:
+        with _bedrock_lock:
+            client = _bedrock_short.get(read_timeout)
+            if client is None:
+                client = _bedrock_short[read_timeout] = _new_bedrock_client(read_timeout)
+    return client
+
+
+def _attempt_read_timeout(deadline):
+    """Longest client read timeout that still ends before `deadline` (None without a deadline)."""
+    if deadline is None:
+        return None
+    remaining = deadline - time.monotonic()
+    for timeout in _BEDROCK_READ_TIMEOUTS:
+        if timeout <= remaining:
+            return timeout
+    return _BEDROCK_READ_TIMEOUTS[-1]
+
+
+class BedrockUnavailable(Exception):
+    """Bedrock is failing or the request ran out of time; maps to 503/504 with Retry-After."""
+
+    def __init__(self, message, status=503, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class _CircuitBreaker:
+    """Opens after `threshold` consecutive failures; lets one trial call through per cooldown."""
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.cooldown:
+                # Half-open: this caller is the trial; others keep failing fast
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def retry_after(self):
+        if self.opened_at is None:
+            return 0
+        return max(1, int(self.cooldown - (time.monotonic() - self.opened_at)))
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+_bedrock_breaker = _CircuitBreaker(BEDROCK_BREAKER_THRESHOLD, BEDROCK_BREAKER_COOLDOWN)
 
-    def __init__(self):
-        super().__init__()
-        self._skip = 0
-        self.chunks = []
 
-    def handle_starttag(self, tag, attrs):
-        if tag.lower() in self.SKIP_TAGS:
-            self._skip += 1
+def _log_bedrock_usage(resp, model):
+    """Log token usage per call and add it to the request's EMF counts."""
+    usage = prompts.usage_summary(resp)
+    print(json.dumps({'bedrockUsage': usage, 'modelId': model}))
+    for name in ('inputTokens', 'outputTokens', 'cacheReadInputTokens', 'cacheWriteInputTokens'):
+        _metrics.count(name[0].upper() + name[1:], usage[name])
 
-    def handle_endtag(self, tag):
-        if tag.lower() in self.SKIP_TAGS:
-            self._skip = max(0, self._skip - 1)
 
-    def handle_data(self, data):
-        if self._skip == 0:
-            text = data.strip()
-            if text:
-                self.chunks.append(text)
+def _deadline_from(context):
+    """Monotonic deadline for outbound calls, or None when there is no Lambda context (local runs)."""
+    remaining = getattr(context, 'get_remaining_time_in_millis', None)
+    if remaining is None:
+        return None
+    return time.monotonic() + remaining() / 1000 - DEADLINE_SAFETY_SECONDS
 
-    def get_text(self):
-        return "\n".join(self.chunks)
+
+def _converse(deadline=None, span_attributes=None, **kwargs):
+    """bedrock-runtime converse with deadline-bounded jittered retries and a circuit breaker."""
+    model = BEDROCK_MODEL
+    breaker = _bedrock_breaker
+    if not breaker.allow():
+        if not BEDROCK_FALLBACK_MODEL:
+            raise BedrockUnavailable('AI service is temporarily unavailable', 503, breaker.retry_after())
+        # The fallback is not tracked by the breaker; it only runs while the primary is open
+        model, breaker = BEDROCK_FALLBACK_MODEL, None
+    attempt = 0
+    while True:
+        attempt += 1
+        if deadline is not None and deadline - time.monotonic() < BEDROCK_MIN_ATTEMPT_SECONDS:
+            raise BedrockUnavailable('AI request ran out of time', 504, 1)
+        read_timeout = _attempt_read_timeout(deadline)
+        client = get_bedrock(read_timeout)
+        try:
+            with timed('Bedrock', 'Bedrock.Converse', modelId=model, attempt=attempt, readTimeout=read_timeout,
+                       **(span_attributes or {})):
+                resp = client.converse(modelId=model, **kwargs)
+            if breaker:
+                breaker.record_success()
+            _log_bedrock_usage(resp, model)
+            return resp
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') not in _RETRYABLE_BEDROCK_ERRORS:
+                raise
+            error = e
+        except (ReadTimeoutError, ConnectTimeoutError, EndpointConnectionError) as e:
+            error = e
+        # Full jitter: sleep uniformly in [0, min(cap, base * 2^attempt)]
+        backoff = random.uniform(0, min(4.0, 0.25 * 2 ** attempt))
+        out_of_time = deadline is not None and time.monotonic() + backoff + BEDROCK_MIN_ATTEMPT_SECONDS > deadline
+        if attempt >= BEDROCK_MAX_ATTEMPTS or out_of_time:
+            if breaker:
+                breaker.record_failure()
+            if out_of_time:
+                raise BedrockUnavailable('AI request ran out of time', 504, 1) from error
+            raise error
+        time.sleep(backoff)
 
 
 def _parse_bedrock_json(raw):
@@ -101,7 +394,7 @@ def _parse_bedrock_json(raw):
         return {"error": "model returned non-JSON", "raw": raw}
 
 
-def _extract_from_image(images):
+def _extract_from_image(images, deadline=None):
     """images: list of {"data": base64_str, "mediaType": "image/jpeg"|...}"""
     content = []
     for img in images:
@@ -109,35 +402,45 @@ def _extract_from_image(images):
         if fmt == "jpg":
             fmt = "jpeg"
         content.append({"image": {"format": fmt, "source": {"bytes": base64.b64decode(img["data"])}}})
-    noun = "these images" if len(images) > 1 else "this image"
-    content.append({"text": f"Extract the recipe from {noun}."})
-    resp = get_bedrock().converse(
-        modelId=BEDROCK_MODEL,
-        system=[{"text": AI_SYSTEM_PROMPT}],
+    content.append({"text": prompts.image_request_text(len(images))})
+    resp = _converse(
+        deadline,
+        span_attributes={'images': len(images)},
+        system=prompts.system_blocks("image"),
         messages=[{"role": "user", "content": content}],
         inferenceConfig={"maxTokens": 2048},
     )
     return _parse_bedrock_json(resp["output"]["message"]["content"][0]["text"])
 
 
-def _extract_from_url(url):
+def _fetch_page(url, timeout):
     req = urllib.request.Request(url, headers={
         "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
         "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
         "Accept-Language": "en-US,en;q=0.9",
         "Accept-Encoding": "identity",
     })
-    with urllib.request.urlopen(req, timeout=10) as r:
-        html = r.read().decode("utf-8", errors="replace")
-    parser = _TextExtractor()
-    parser.feed(html)
-    text = parser.get_text()[:20000]
-    resp = get_bedrock().converse(
-        modelId=BEDROCK_MODEL,
-        system=[{"text": AI_SYSTEM_PROMPT}],
+    with urllib.request.urlopen(req, timeout=timeout) as r:
+        return r.read().decode("utf-8", errors="replace")
+
+
+def _page_text(html):
+    return _html_page_text(html, PAGE_TEXT_LIMIT, _TextExtractor)
+
+
+def _extract_from_url(url, deadline=None):
+    timeout = 10 if deadline is None else max(1.0, min(10.0, deadline - time.monotonic() - BEDROCK_MIN_ATTEMPT_SECONDS))
+    with timed('PageFetch', host=urllib.parse.urlsplit(url).hostname):
+        html = _fetch_page(url, timeout)
+    with timed('HtmlParse', chars=len(html)):
+        text = _page_text(html)
+    resp = _converse(
+        deadline,
+        span_attributes={'chars': len(text)},
+        system=prompts.system_blocks("url"),
         messages=[{
             "role": "user",
-            "content": [{"text": f"URL: {url}\n\n---\n{text}"}],
+            "content": [{"text": prompts.url_request_text(url, text)}],
         }],
         inferenceConfig={"maxTokens": 2048},
     )
@@ -149,33 +452,140 @@ def get_dynamodb():
     return boto3.resource('dynamodb', region_name=region)
 
 
-def _to_jsonable(obj):
-    """Recursively convert DynamoDB Decimals and nested structures to JSON-serializable types."""
-    if isinstance(obj, Decimal):
-        # Preserve integers as int, otherwise use float
-        try:
-            return int(obj) if obj % 1 == 0 else float(obj)
-        except Exception:
-            return float(obj)
-    if isinstance(obj, dict):
-        return {k: _to_jsonable(v) for k, v in obj.items()}
-    if isinstance(obj, list):
-        return [_to_jsonable(v) for v in obj]
-    return obj
-
-
 def response(status_code, body):
+    with timed('Serialize'):
+        text = json.dumps(body, default=_json_default, separators=(',', ':'))
     return {
         'statusCode': status_code,
-        'body': json.dumps(_to_jsonable(body)),
+        'body': text,
         'headers': {'Content-Type': 'application/json'}
     }
 
 
+# Bodies below this size are not worth the gzip framing and CPU
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', '1024'))
+
+
+def _accepts_gzip(event):
+    """True when Accept-Encoding gives gzip a non-zero q; an explicit gzip entry overrides "*"."""
+    weights = {}
+    for part in (_header(event, 'Accept-Encoding') or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding.strip().lower()] = q
+    return weights.get('gzip', weights.get('*', 0.0)) > 0
+
+
+def _gzip_etag(etag):
+    # The compressed bytes are a different representation, so they get their own strong validator
+    return f'{etag[:-1]}-gzip"' if etag.endswith('"') else etag
+
+
+def _maybe_compress(event, res):
+    """Gzip large JSON bodies when the client accepts it; API Gateway decodes the base64 wrapper."""
+    body = res.get('body')
+    etag = (res.get('headers') or {}).get('ETag')
+    if res.get('statusCode') == 304 and etag and _gzip_etag(etag) in (_header(event, 'If-None-Match') or ''):
+        # Confirm the variant the client holds
+        return {**res, 'headers': {**res['headers'], 'ETag': _gzip_etag(etag)}}
+    if not body or res.get('isBase64Encoded') or len(body) < COMPRESS_MIN_BYTES or not _accepts_gzip(event):
+        return res
+    headers = dict(res.get('headers') or {})
+    headers['Content-Encoding'] = 'gzip'
+    headers['Vary'] = 'Accept-Encoding'
+    if etag:
+        headers['ETag'] = _gzip_etag(etag)
+    with timed('Compress'):
+        encoded = base64.b64encode(gzip.compress(body.encode('utf-8'), compresslevel=5)).decode('ascii')
+    return {
+        **res,
+        'headers': headers,
+        'body': encoded,
+        'isBase64Encoded': True,
+    }
+
+
+# Public reads are revalidated on every use; unchanged data comes back as an empty 304
+READ_CACHE_CONTROL = 'public, no-cache'
+
+
+def _header(event, name):
+    """Case-insensitive header lookup (HTTP API v2 lowercases names, v1 does not)."""
+    name = name.lower()
+    for k, v in ((event or {}).get('headers') or {}).items():
+        if k.lower() == name:
+            return v
+    return None
+
+
+def _content_digest(item):
+    # Stamped at write time; items written before that (and ratings) are hashed here
+    return item.get('contentHash') or recipe_items.content_hash(item)
+
+
+def _recipe_etag(item):
+    """Strong ETag from the item's content; updatedAt alone has one-second resolution."""
+    return f'"{_content_digest(item)}"'
+
+
+def _list_etag(items, id_attr='recipeId'):
+    """Strong ETag for a list from each item's id + content digest."""
+    h = hashlib.sha256()
+    for key in sorted(f'{i.get(id_attr)}:{_content_digest(i)}' for i in items):
+        h.update(key.encode('utf-8'))
+        h.update(b'\n')
+    return f'"l-{h.hexdigest()[:32]}"'
+
+
+def _etag_matches(event, etag):
+    inm = _header(event, 'If-None-Match')
+    if not inm:
+        return False
+    if inm.strip() == '*':
+        return True
+    # Weak comparison, as required for If-None-Match (RFC 9110 13.1.2); the gzip variant is equivalent
+    return etag in (t.strip().removeprefix('W/').replace('-gzip"', '"') for t in inm.split(','))
+
+
+def cached_response(event, status_code, body, etag, cache_control=READ_CACHE_CONTROL):
+    """response() with validators; returns 304 before serialising anything when the client copy is current."""
+    if _etag_matches(event, etag):
+        return {
+            'statusCode': 304,
+            'body': '',
+            'headers': {'ETag': etag, 'Cache-Control': cache_control},
+        }
+    res = response(status_code, body)
+    res['headers']['ETag'] = etag
+    res['headers']['Cache-Control'] = cache_control
+    return res
+
+
+def redirect(location: str, status: int = 302):
+    return {
+        'statusCode': status,
+        'headers': {
+            'Location': location,
+            'Cache-Control': 'no-cache'
+        },
+        'body': ''
+    }
+
+
 def map_recipe_out(item: dict | None) -> dict | None:
     if not item:
         return None
     out = dict(item)
+    # Server-side only (shopping lists and validators); clients keep using `ingredients`
+    out.pop('parsedIngredients', None)
+    out.pop('contentHash', None)
     rid = out.get('recipeId')
     if rid is not None:
         # Keep both for backward compatibility
@@ -187,10 +597,801 @@ def map_recipe_out(item: dict | None) -> dict | None:
 def _get_table(name, dynamodb):
     if not name:
         raise ValueError('Table name not set in environment')
-    return dynamodb.Table(name)
+    return _TimedTable(dynamodb.Table(name))
+
+
+def _is_tombstone(item):
+    return bool(item and item.get('deleted'))
+
+
+def _changed_since(table, since, **options):
+    """All recipes and tombstones with updatedAt >= since (inclusive, so same-second writes are not lost)."""
+    if RECIPES_UPDATED_INDEX:
+        return _query_all(
+            table,
+            IndexName=RECIPES_UPDATED_INDEX,
+            KeyConditionExpression=Key('syncBucket').eq(SYNC_BUCKET) & Key('updatedAt').gte(since),
+            **options,
+        )
+    return _scan_all(table, FilterExpression=Attr('updatedAt').gte(since), **options)
+
+
+# Search index: tokenised title/description/ingredients/tags -> recipeIds.
+# Built from one scan per warm container and patched in place by local writes. Every
+# SEARCH_INDEX_TTL seconds it pulls what other containers wrote from the updatedAt index,
+# going back SEARCH_INDEX_OVERLAP seconds before the last refresh for writes stamped just
+# before it. Documents keep only the summary fields results return.
+SEARCH_INDEX_TTL = int(os.environ.get('SEARCH_INDEX_TTL', '300'))
+SEARCH_INDEX_OVERLAP = 30
+SEARCH_FIELDS = ('recipeId', 'deleted', 'ingredients') + SUMMARY_FIELDS
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def _tokenize(text):
+    if not text or not isinstance(text, str):
+        return []
+    return _TOKEN_RE.findall(text.lower())
+
+
+class _SearchIndex:
+    # Posting keys are field-prefixed tokens: "t:" any text, "i:" ingredient names, "g:" tags
+    TITLE_WEIGHT = 3
+
+    def __init__(self):
+        self.postings = {}
+        self.docs = {}
+        self._keys = []
+        self._dirty = False
+        self.built_at = 0.0
+
+    @staticmethod
+    def _doc_keys(item):
+        title = set(_tokenize(item.get('title')))
+        keys = {f't:{t}' for t in title}
+        keys.update(f't:{t}' for t in _tokenize(item.get('description')))
+        for ing in item.get('ingredients') or []:
+            name = ing.get('name') if isinstance(ing, dict) else ing
+            for t in _tokenize(name):
+                keys.add(f't:{t}')
+                keys.add(f'i:{t}')
+        for tag in item.get('tags') or []:
+            if isinstance(tag, str) and tag.strip():
+                keys.add(f'g:{tag.strip().lower()}')
+                keys.update(f't:{t}' for t in _tokenize(tag))
+        return keys, title
+
+    def add(self, item):
+        rid = item.get('recipeId')
+        if not rid:
+            return
+        self.remove(rid)
+        if _is_tombstone(item):
+            return
+        keys, title = self._doc_keys(item)
+        summary = {k: item[k] for k in ('recipeId',) + SUMMARY_FIELDS if k in item}
+        self.docs[rid] = (summary, keys, title)
+        for k in keys:
+            ids = self.postings.get(k)
+            if ids is None:
+                self.postings[k] = {rid}
+                self._dirty = True
+            else:
+                ids.add(rid)
+
+    def remove(self, rid):
+        doc = self.docs.pop(rid, None)
+        if not doc:
+            return
+        for k in doc[1]:
+            ids = self.postings.get(k)
+            if ids is None:
+                continue
+            ids.discard(rid)
+            if not ids:
+                del self.postings[k]
+                self._dirty = True
+
+    def _prefix(self, key):
+        """Union of posting sets for every indexed key starting with `key`."""
+        if self._dirty:
+            self._keys = sorted(self.postings)
+            self._dirty = False
+        out = set()
+        i = bisect.bisect_left(self._keys, key)
+        while i < len(self._keys) and self._keys[i].startswith(key):
+            out |= self.postings[self._keys[i]]
+            i += 1
+        return out
+
+    def search(self, q='', tags=(), ingredients=(), limit=50):
+        terms = _tokenize(q)
+        matched = None
+        for term in terms:
+            ids = self._prefix(f't:{term}')
+            matched = ids if matched is None else matched & ids
+        for tag in tags:
+            ids = set(self.postings.get(f'g:{tag}', ()))
+            matched = ids if matched is None else matched & ids
+        for ing in ingredients:
+            for term in _tokenize(ing):
+                ids = self._prefix(f'i:{term}')
+                matched = ids if matched is None else matched & ids
+        if matched is None:
+            matched = set(self.docs)
+
+        def score(rid):
+            item, _, title = self.docs[rid]
+            hits = sum(self.TITLE_WEIGHT if any(t.startswith(term) for t in title) else 1 for term in terms)
+            return (-hits, -int(item.get('updatedAt') or 0))
+
+        return [self.docs[rid][0] for rid in sorted(matched, key=score)[:limit]]
+
+
+_search_index = None
+
+
+def get_search_index(table):
+    global _search_index
+    now = time.time()
+    # Tombstones expire after TOMBSTONE_TTL, so deletes older than that need a full build
+    if _search_index is None or now - _search_index.built_at > TOMBSTONE_TTL:
+        index = _SearchIndex()
+        for item in _scan_all(table, **_projection(SEARCH_FIELDS)):
+            index.add(item)
+        index.built_at = now
+        _search_index = index
+    elif now - _search_index.built_at > SEARCH_INDEX_TTL:
+        since = int(_search_index.built_at) - SEARCH_INDEX_OVERLAP
+        for item in _changed_since(table, since, **_projection(SEARCH_FIELDS)):
+            _search_index.add(item)
+        _search_index.built_at = now
+    return _search_index
+
+
+def _index_put(item):
+    """Patch the warm search index after a local write (no-op until first search)."""
+    if _search_index is not None:
+        _search_index.add(item)
+
+
+def _index_remove(recipe_id):
+    if _search_index is not None:
+        _search_index.remove(recipe_id)
+
+
+# Warm-container read-through cache for GET /recipes/{id}. Local writes update or
+# drop entries; writes from other containers become visible after RECIPE_CACHE_TTL
+# seconds. Misses are filled with eventually consistent (half-cost) reads, as before the
+# cache; RECIPE_CACHE_MODE=strong opts into strongly consistent ones.
+RECIPE_CACHE_TTL = float(os.environ.get('RECIPE_CACHE_TTL', '5'))
+RECIPE_CACHE_MAX = int(os.environ.get('RECIPE_CACHE_MAX', '256'))
+RECIPE_CACHE_MODE = os.environ.get('RECIPE_CACHE_MODE', 'eventual')
+
+
+class _RecipeCache:
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # recipeId -> (expires_at, item)
+
+    def get(self, recipe_id):
+        entry = self._entries.get(recipe_id)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[recipe_id]
+            return None
+        self._entries.move_to_end(recipe_id)
+        return entry[1]
+
+    def put(self, item):
+        if self.ttl <= 0 or self.max_entries <= 0:
+            return
+        rid = item.get('recipeId')
+        current = self._entries.get(rid)
+        # Versioned by updatedAt: never replace a newer copy with an older read
+        if current and int(current[1].get('updatedAt') or 0) > int(item.get('updatedAt') or 0):
+            return
+        self._entries[rid] = (time.monotonic() + self.ttl, item)
+        self._entries.move_to_end(rid)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, recipe_id):
+        self._entries.pop(recipe_id, None)
+
+
+_recipe_cache = _RecipeCache(RECIPE_CACHE_MAX, RECIPE_CACHE_TTL)
+
+
+def _get_recipe_cached(table, recipe_id):
+    """Return (item or None, cache_hit)."""
+    item = _recipe_cache.get(recipe_id)
+    if item is not None:
+        return item, True
+    res = table.get_item(Key={'recipeId': recipe_id}, ConsistentRead=RECIPE_CACHE_MODE == 'strong')
+    item = res.get('Item')
+    if item and not _is_tombstone(item):
+        _recipe_cache.put(item)
+    return item, False
+
+
+class _TokenBucketLimiter:
+    """Token bucket plus in-flight leases per key, one DynamoDB item each.
+
+    Writes are conditional on the item's updatedAt, so concurrent containers never
+    spend the same tokens twice; the loser re-reads and tries again.
+    """
+
+    IN_FLIGHT_RETRY_AFTER = 5
+
+    def __init__(self, table_name, capacity, refill_per_second, max_in_flight, lease_seconds):
+        self.table_name = table_name
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.max_in_flight = max_in_flight
+        self.lease_seconds = lease_seconds
+        self._table = None
+
+    def _get_table(self):
+        if self._table is None:
+            self._table = _get_table(self.table_name, get_dynamodb())
+        return self._table
+
+    def acquire(self, key, cost, lease_id):
+        """Take `cost` tokens and an in-flight lease; returns 0, or seconds to wait before retrying."""
+        table = self._get_table()
+        cost = min(cost, self.capacity)
+        for _ in range(3):
+            now = time.time()
+            item = table.get_item(Key={'limitKey': key}, ConsistentRead=True).get('Item')
+            leases = (item or {}).get('inFlight') or {}
+            live = [k for k, expires in leases.items() if expires > now]
+            if len(live) >= self.max_in_flight:
+                return self.IN_FLIGHT_RETRY_AFTER
+            tokens = self.capacity
+            if item:
+                elapsed = max(0.0, now - int(item['updatedAt']) / 1000)
+                tokens = min(self.capacity, float(item['tokens']) + elapsed * self.refill_per_second)
+            if tokens < cost:
+                return max(1, math.ceil((cost - tokens) / self.refill_per_second))
+            try:
+                self._write(table, key, item, tokens - cost, now, lease_id, [k for k in leases if k not in live])
+                return 0
+            except ClientError as e:
+                if e.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+                    raise
+        # Persistent contention on one user's bucket is itself a burst
+        return 1
+
+    def _write(self, table, key, item, tokens, now, lease_id, expired):
+        values = {
+            ':t': Decimal(str(round(tokens, 3))),
+            ':now': int(now * 1000),
+            ':lease': int(now) + self.lease_seconds,
+            # Idle buckets are refilled by then; TTL removes them
+            ':ttl': int(now + self.capacity / self.refill_per_second) + 3600,
+        }
+        if item is None:
+            table.put_item(
+                Item={'limitKey': key, 'tokens': values[':t'], 'updatedAt': values[':now'],
+                      'inFlight': {lease_id: values[':lease']}, 'expiresAt': values[':ttl']},
+                ConditionExpression='attribute_not_exists(limitKey)',
+            )
+            return
+        names = {'#lease': lease_id}
+        expr = 'SET tokens = :t, updatedAt = :now, inFlight.#lease = :lease, expiresAt = :ttl'
+        if expired:
+            names.update({f'#x{i}': k for i, k in enumerate(expired)})
+            expr += ' REMOVE ' + ', '.join(f'inFlight.#x{i}' for i in range(len(expired)))
+        values[':prev'] = item['updatedAt']
+        table.update_item(
+            Key={'limitKey': key},
+            UpdateExpression=expr,
+            ConditionExpression='updatedAt = :prev',
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values,
+        )
+
+    def release(self, key, lease_id):
+        try:
+            self._get_table().update_item(
+                Key={'limitKey': key},
+                UpdateExpression='REMOVE inFlight.#lease',
+                ExpressionAttributeNames={'#lease': lease_id},
+            )
+        except ClientError as e:
+            # The lease still expires after AI_LEASE_SECONDS
+            print(f"rate limit release failed: {e}")
+
+
+_ai_limiter = _TokenBucketLimiter(
+    RATE_LIMIT_TABLE, AI_RATE_CAPACITY, AI_RATE_REFILL_PER_MINUTE / 60, AI_MAX_IN_FLIGHT, AI_LEASE_SECONDS
+) if RATE_LIMIT_TABLE else None
+
+
+def _with_retry_after(res, seconds):
+    res['headers']['Retry-After'] = str(seconds)
+    return res
+
+
+def _forget_idempotency(table, record_key):
+    try:
+        table.delete_item(Key={'idempotencyKey': record_key})
+    except ClientError as e:
+        # The lock lapses after IDEMPOTENCY_LOCK_SECONDS anyway
+        print(f"idempotency cleanup failed: {e}")
+
+
+def _idempotent(event, scope, run):
+    """Call `run()` at most once per (scope, Idempotency-Key) and replay its response on retries.
+
+    Without the header or IDEMPOTENCY_TABLE this is just `run()`. Server errors and 429s are not
+    stored, so the client can retry them with the same key. Records past expiresAt count as absent:
+    TTL deletion can lag by up to 48 hours.
+    """
+    key = _header(event, 'idempotency-key')
+    if not IDEMPOTENCY_TABLE or not key:
+        return run()
+    if len(key) > 255:
+        return response(400, {'error': 'Idempotency-Key must be at most 255 characters'})
+    table = _get_table(IDEMPOTENCY_TABLE, get_dynamodb())
+    record_key = f'{scope}#{key}'
+    payload_hash = hashlib.sha256((event.get('body') or '').encode('utf-8')).hexdigest()
+    now = int(time.time())
+    try:
+        table.put_item(
+            Item={
+                'idempotencyKey': record_key,
+                'status': 'IN_PROGRESS',
+                'payloadHash': payload_hash,
+                'lockedUntil': now + IDEMPOTENCY_LOCK_SECONDS,
+                'expiresAt': now + IDEMPOTENCY_TTL,
+            },
+            ConditionExpression=('attribute_not_exists(idempotencyKey) OR expiresAt <= :now'
+                                 ' OR (#s = :in_progress AND lockedUntil < :now)'),
+            ExpressionAttributeNames={'#s': 'status'},
+            ExpressionAttributeValues={':in_progress': 'IN_PROGRESS', ':now': now},
+        )
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+            # Fail open: without the table we behave as if no key was sent
+            print(f"idempotency check failed: {e}")
+            return run()
+        existing = table.get_item(Key={'idempotencyKey': record_key}, ConsistentRead=True).get('Item')
+        if existing and existing.get('payloadHash') != payload_hash:
+            return response(422, {'error': 'Idempotency-Key was already used with a different request body'})
+        if existing and existing.get('status') == 'COMPLETED':
+            _metrics.count('IdempotentReplay', 1)
+            stored = existing['response']
+            return {
+                'statusCode': int(stored['statusCode']),
+                'body': stored['body'],
+                'headers': {**stored.get('headers', {}), 'Idempotent-Replayed': 'true'},
+            }
+        return _with_retry_after(response(409, {'error': 'A request with this Idempotency-Key is in progress'}), 2)
+
+    try:
+        res = run()
+    except Exception:
+        _forget_idempotency(table, record_key)
+        raise
+    status = res.get('statusCode', 200)
+    if status >= 500 or status == 429:
+        _forget_idempotency(table, record_key)
+        return res
+    try:
+        table.update_item(
+            Key={'idempotencyKey': record_key},
+            UpdateExpression='SET #s = :done, #r = :res',
+            ExpressionAttributeNames={'#s': 'status', '#r': 'response'},
+            ExpressionAttributeValues={
+                ':done': 'COMPLETED',
+                ':res': {'statusCode': status, 'body': res.get('body', ''), 'headers': res.get('headers', {})},
+            },
+        )
+    except ClientError as e:
+        # e.g. a response over the 400 KB item limit: let retries run again rather than wait on the lock
+        print(f"idempotency store failed: {e}")
+        _forget_idempotency(table, record_key)
+    return res
+
+
+# Fan-out for parallel DynamoDB calls. Warm threads keep their own boto3 resources between
+# invocations (resources are not thread-safe).
+_io_pool = ThreadPoolExecutor(max_workers=8)
+_thread_state = threading.local()
+_s3 = None
+
+
+def _thread_table(name):
+    resource = getattr(_thread_state, 'dynamodb', None)
+    if resource is None:
+        resource = _thread_state.dynamodb = get_dynamodb()
+    return resource.Table(name)
+
+
+def _bootstrap_reads():
+    """(recipes, ratings): a segmented parallel scan of recipes alongside the ratings scan."""
+    segments = max(1, BOOTSTRAP_SCAN_SEGMENTS)
+    # contentHash feeds the ETag, so a same-second edit still changes it
+    fields = _projection(('recipeId', 'deleted', 'contentHash') + SUMMARY_FIELDS)
+    parts = [
+        _io_pool.submit(lambda s=s: _scan_all(_thread_table(RECIPES_TABLE), Segment=s, TotalSegments=segments, **fields))
+        for s in range(segments)
+    ]
+    ratings = _io_pool.submit(lambda: _scan_all(_thread_table(RATINGS_TABLE))) if RATINGS_TABLE else None
+    recipes = [item for part in parts for item in part.result()]
+    return recipes, (ratings.result() if ratings else [])
+
+
+def _rating_summary(ratings):
+    """recipeId -> {count, average}; the average covers ratings with a numeric rating/stars field."""
+    totals = {}
+    for r in ratings:
+        entry = totals.setdefault(r.get('recipeId'), [0, 0, Decimal(0)])
+        entry[0] += 1
+        value = r.get('rating', r.get('stars'))
+        if isinstance(value, (int, float, Decimal)):
+            entry[1] += 1
+            entry[2] += Decimal(str(value))
+    return {
+        rid: {'count': count, 'average': round(float(total) / scored, 2) if scored else None}
+        for rid, (count, scored, total) in totals.items()
+    }
+
+
+def _get_s3():
+    global _s3
+    if _s3 is None:
+        _s3 = boto3.client('s3', region_name=os.environ.get('AWS_REGION', 'us-east-1'))
+    return _s3
+
+
+def _image_url(image, expires_in):
+    """Presigned GET for a stored image key; full URLs (and data:/blob:) pass through."""
+    if not image or re.match(r'^(https?:|data:|blob:)', image, re.I) or not IMAGES_BUCKET:
+        return image
+    return _get_s3().generate_presigned_url(
+        ClientMethod='get_object', Params={'Bucket': IMAGES_BUCKET, 'Key': image}, ExpiresIn=expires_in)
+
+
+# Once the snapshot exists it is only ever replaced, so a positive check lasts for the container
+_snapshot_state = {'ready': False, 'checkedAt': 0.0}
+
+
+def _snapshot_ready():
+    if not RECIPES_SNAPSHOT_BUCKET or _snapshot_state['ready']:
+        return True
+    now = time.monotonic()
+    if _snapshot_state['checkedAt'] and now - _snapshot_state['checkedAt'] < SNAPSHOT_RECHECK_SECONDS:
+        return False
+    _snapshot_state['checkedAt'] = now
+    try:
+        with timed('S3', 'S3.head_object', key=RECIPES_SNAPSHOT_KEY):
+            _get_s3().head_object(Bucket=RECIPES_SNAPSHOT_BUCKET, Key=RECIPES_SNAPSHOT_KEY)
+        _snapshot_state['ready'] = True
+    except ClientError as e:
+        print(f"recipes snapshot not available yet: {e}")
+    return _snapshot_state['ready']
+
+
+def _batch_get(table_name, keys, strict=False, **options):
+    """BatchGetItem in chunks of 100 keys, resending unprocessed keys.
+
+    Keys still unprocessed after five attempts are logged and counted, or raised when
+    `strict` (for callers that must not treat a throttled key as a missing item).
+    """
+    dynamodb = get_dynamodb()
+    items = []
+    for start in range(0, len(keys), 100):
+        request = {table_name: {'Keys': keys[start:start + 100], **options}}
+        for attempt in range(5):
+            with timed('DynamoDB', 'DynamoDB.batch_get_item', table=table_name):
+                res = dynamodb.batch_get_item(RequestItems=request)
+            items.extend(res.get('Responses', {}).get(table_name, []))
+            request = res.get('UnprocessedKeys')
+            if not request:
+                break
+            time.sleep(0.05 * 2 ** attempt)
+        if request:
+            dropped = len(request[table_name]['Keys'])
+            _metrics.count('BatchGetUnprocessed', dropped)
+            print(f"batch_get_item gave up on {dropped} unprocessed keys in {table_name}")
+            if strict:
+                raise RuntimeError(f'{dropped} keys in {table_name} stayed unprocessed')
+    return items
+
+
+_MERSENNE_61 = (1 << 61) - 1
+# Fixed seed: every container must draw the same permutations
+_minhash_rng = random.Random(0x6D626D)
+_MINHASH_PARAMS = [(_minhash_rng.randrange(1, _MERSENNE_61), _minhash_rng.randrange(_MERSENNE_61))
+                   for _ in range(MINHASH_BANDS * MINHASH_ROWS)]
+_TRACKING_PARAMS = re.compile(r'^(utm_.*|fbclid|gclid|mc_[a-z]+)$', re.I)
+
+
+def _shingles(recipe):
+    shingles = {f't:{w}' for w in _tokenize(recipe.get('title'))}
+    for ing in recipe.get('ingredients') or []:
+        name = ' '.join(_tokenize(ing.get('name') if isinstance(ing, dict) else ing))
+        if name:
+            shingles.add(f'i:{name}')
+    words = _tokenize(' '.join(s for s in recipe.get('instructions') or [] if isinstance(s, str)))
+    shingles.update(f"s:{' '.join(words[i:i + 3])}" for i in range(len(words) - 2))
+    return shingles
+
+
+def _minhash(shingles):
+    hashes = [int.from_bytes(hashlib.blake2b(sh.encode('utf-8'), digest_size=8).digest(), 'big') for sh in shingles]
+    return [min((a * h + b) % _MERSENNE_61 for h in hashes) for a, b in _MINHASH_PARAMS]
+
+
+def _normalise_url(url):
+    """Host + path + meaningful query: ignores scheme, www., fragments, trailing slashes and tracking params."""
+    parts = urllib.parse.urlsplit(url.strip())
+    host = (parts.hostname or '').lower().removeprefix('www.')
+    params = sorted((k, v) for k, v in urllib.parse.parse_qsl(parts.query) if not _TRACKING_PARAMS.match(k))
+    query = urllib.parse.urlencode(params)
+    return f"{host}{parts.path.rstrip('/')}" + (f'?{query}' if query else '')
+
+
+def _dedup_keys(recipe):
+    """(MinHash signature or None, bucket keys): url#, hash# (exact content) and band# keys."""
+    keys = set()
+    if isinstance(recipe.get('sourceUrl'), str) and recipe['sourceUrl'].strip():
+        keys.add('url#' + _normalise_url(recipe['sourceUrl']))
+    shingles = _shingles(recipe)
+    if not shingles:
+        return None, keys
+    keys.add('hash#' + hashlib.sha256('\n'.join(sorted(shingles)).encode('utf-8')).hexdigest()[:32])
+    sig = _minhash(shingles)
+    for band in range(MINHASH_BANDS):
+        rows = sig[band * MINHASH_ROWS:(band + 1) * MINHASH_ROWS]
+        keys.add(f'band#{band}#' + hashlib.blake2b(repr(rows).encode('utf-8'), digest_size=8).hexdigest())
+    return sig, keys
+
+
+def _dedup_index(recipe_id, recipe):
+    """Move recipe_id into the buckets for `recipe`, or out of all of them when it is None or a tombstone.
+
+    The sig# item is written first, conditional on its stored updatedAt, and ReturnValues
+    hands back exactly the keys it replaced; so a writer holding an older copy of the
+    recipe changes nothing, and two writers never diff against the same old keys.
+    Returns False when a newer copy was already indexed.
+    """
+    table = _get_table(DEDUP_TABLE, get_dynamodb())
+    live = bool(recipe) and not _is_tombstone(recipe)
+    sig, new_keys = _dedup_keys(recipe) if live else (None, set())
+    key = {'pk': f'sig#{recipe_id}'}
+    options = {'ReturnValues': 'ALL_OLD'}
+    if recipe:
+        # A recipe gone from the table entirely (tombstone expired) is removed unconditionally
+        options.update(
+            ConditionExpression='attribute_not_exists(updatedAt) OR updatedAt <= :u',
+            ExpressionAttributeValues={':u': int(recipe.get('updatedAt') or 0)},
+        )
+    try:
+        if new_keys:
+            entry = {**key, 'keys': new_keys, 'updatedAt': int(recipe.get('updatedAt') or 0)}
+            if sig:
+                entry['sig'] = ','.join(f'{v:x}' for v in sig)
+            res = table.put_item(Item=entry, **options)
+        else:
+            res = table.delete_item(Key=key, **options)
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') == 'ConditionalCheckFailedException':
+            return False
+        raise
+    old_keys = set((res.get('Attributes') or {}).get('keys') or ())
+    changes = [(k, 'ADD') for k in new_keys - old_keys] + [(k, 'DELETE') for k in old_keys - new_keys]
+
+    def apply(change):
+        bucket, action = change
+        _thread_table(DEDUP_TABLE).update_item(
+            Key={'pk': bucket}, UpdateExpression=f'{action} ids :id', ExpressionAttributeValues={':id': {recipe_id}})
+
+    with timed('DynamoDB', 'DynamoDB.dedup_buckets', changes=len(changes)):
+        list(_io_pool.map(apply, changes))
+    return True
+
+
+def dedup_stream_handler(event, context):
+    """Recipes table stream consumer that keeps DEDUP_TABLE in step with recipe writes.
+
+    The stream is KEYS_ONLY, so each batch re-reads the current items (strongly
+    consistent) and indexes those: replays and retries converge on the latest copy.
+    Errors propagate so Lambda retries the batch.
+    """
+    global _metrics, _cold_start
+    _metrics = _Metrics()
+    _metrics.route = 'stream:dedup'
+    status = 500
+    try:
+        with timed('Total', 'dedup_stream_handler'):
+            ids = sorted({
+                r['dynamodb']['Keys']['recipeId']['S']
+                for r in event.get('Records') or []
+                if 'recipeId' in r.get('dynamodb', {}).get('Keys', {})
+            })
+            if not DEDUP_TABLE or not ids:
+                status = 200
+                return {'indexed': 0}
+            items = {
+                i['recipeId']: i
+                for i in _batch_get(RECIPES_TABLE, [{'recipeId': rid} for rid in ids], strict=True,
+                                    ConsistentRead=True, **_projection(DEDUP_FIELDS))
+            }
+            indexed = sum(_dedup_index(rid, items.get(rid)) for rid in ids)
+            # Skipped ones were already indexed from a newer copy
+            _metrics.count('DedupIndexed', indexed)
+            _metrics.count('DedupSkipped', len(ids) - indexed)
+        status = 200
+        return {'indexed': indexed}
+    finally:
+        print(json.dumps(_metrics.emf(status, _cold_start)))
+        _cold_start = False
+
+
+def _find_duplicates(recipe, exclude_id=None, limit=10):
+    """Likely duplicates of `recipe` as [{id, title, similarity, match}], best first."""
+    sig, keys = _dedup_keys(recipe)
+    if not DEDUP_TABLE or not keys:
+        return []
+    exact, candidates = {}, set()
+    for bucket in _batch_get(DEDUP_TABLE, [{'pk': k} for k in keys]):
+        kind = bucket['pk'].split('#', 1)[0]
+        for rid in bucket.get('ids') or ():
+            candidates.add(rid)
+            if kind == 'url':
+                exact[rid] = 'url'
+            elif kind == 'hash':
+                exact.setdefault(rid, 'content')
+    candidates.discard(exclude_id)
+    if not candidates:
+        return []
+    signatures = {
+        e['pk'][4:]: [int(v, 16) for v in e['sig'].split(',')]
+        for e in _batch_get(DEDUP_TABLE, [{'pk': f'sig#{rid}'} for rid in candidates])
+        if e.get('sig')
+    }
+    scored = []
+    for rid in candidates:
+        if rid in exact:
+            scored.append((1.0, rid))
+        elif sig and rid in signatures:
+            # Fraction of equal MinHash rows estimates the Jaccard similarity
+            similarity = sum(x == y for x, y in zip(sig, signatures[rid])) / len(sig)
+            if similarity >= DUPLICATE_THRESHOLD:
+                scored.append((similarity, rid))
+    scored = sorted(scored, reverse=True)[:limit]
+    if not scored:
+        return []
+    titles = {
+        i['recipeId']: i.get('title')
+        for i in _batch_get(RECIPES_TABLE, [{'recipeId': rid} for _, rid in scored],
+                            ProjectionExpression='recipeId, #t', ExpressionAttributeNames={'#t': 'title'})
+    }
+    return [
+        {'id': rid, 'title': titles[rid], 'similarity': round(similarity, 2), 'match': exact.get(rid, 'similar')}
+        for similarity, rid in scored
+        if rid in titles
+    ]
+
+
+SHOPPING_LIST_MAX_RECIPES = 100
+
+
+def _parsed_ingredients(item):
+    """(arrays, stale): the item's stored ingredient arrays, re-parsed when missing or from an older parser."""
+    parsed = item.get('parsedIngredients')
+    if not parsed or parsed.get('v') != ingredient_parser.PARSER_VERSION:
+        return ingredient_parser.parse_all(item.get('ingredients')), True
+    return parsed, False
+
+
+def _store_parsed_ingredients(reparsed):
+    """Write re-parsed arrays back for [(item, parsed)] so each item is only re-parsed once.
+
+    Conditional on the updatedAt that was read: an edit since then stored its own arrays.
+    Best effort; a failed write just means the next shopping list parses again.
+    """
+    def store(entry):
+        item, parsed = entry
+        if item.get('updatedAt') is None:
+            condition, values = 'attribute_not_exists(updatedAt)', {':p': parsed}
+        else:
+            condition, values = 'updatedAt = :u', {':p': parsed, ':u': item['updatedAt']}
+        try:
+            _thread_table(RECIPES_TABLE).update_item(
+                Key={'recipeId': item['recipeId']},
+                UpdateExpression='SET parsedIngredients = :p',
+                ConditionExpression=condition,
+                ExpressionAttributeValues=values,
+            )
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') != 'ConditionalCheckFailedException':
+                print(f"parsedIngredients write-back failed for {item['recipeId']}: {e}")
+
+    with timed('DynamoDB', 'DynamoDB.store_parsed_ingredients', items=len(reparsed)):
+        list(_io_pool.map(store, reparsed))
+
+
+def _shopping_list(entries):
+    """Aggregate ingredients for [{id, multiplier?, servings?}]; servings scales from the recipe's own."""
+    multipliers = {}
+    for entry in entries:
+        rid = str(entry.get('id') or entry.get('recipeId') or '')
+        if not rid:
+            raise ValueError('Each entry needs an id')
+        try:
+            multiplier = float(entry.get('multiplier', 1))
+            servings = float(entry['servings']) if entry.get('servings') is not None else None
+        except (TypeError, ValueError):
+            raise ValueError(f'Invalid multiplier or servings for {rid}')
+        if multiplier < 0 or (servings is not None and servings < 0):
+            raise ValueError(f'Invalid multiplier or servings for {rid}')
+        multipliers.setdefault(rid, []).append((multiplier, servings))
+
+    items = {
+        i['recipeId']: i
+        for i in _batch_get(
+            RECIPES_TABLE, [{'recipeId': rid} for rid in multipliers],
+            ProjectionExpression='recipeId, #t, servings, ingredients, parsedIngredients, deleted, updatedAt',
+            ExpressionAttributeNames={'#t': 'title'},
+        )
+        if not _is_tombstone(i)
+    }
+    plan, reparsed = [], []
+    for rid, requested in multipliers.items():
+        item = items.get(rid)
+        if item is None:
+            continue
+        parsed, stale = _parsed_ingredients(item)
+        if stale:
+            reparsed.append((item, parsed))
+        base_servings = ingredient_parser.parse_servings(item.get('servings'))
+        # The same recipe twice in a plan (e.g. two dinners) adds up
+        total = sum(m * (s / base_servings if s is not None and base_servings else 1) for m, s in requested)
+        plan.append((rid, parsed, total))
+    if reparsed:
+        _store_parsed_ingredients(reparsed)
+    with timed('Aggregate', 'shopping_list.aggregate', recipes=len(plan)):
+        aggregated = ingredient_parser.aggregate(plan)
+    return {
+        'items': aggregated,
+        'recipes': [{'id': rid, 'title': items[rid].get('title'), 'multiplier': round(m, 3)} for rid, _, m in plan],
+        'missing': [rid for rid in multipliers if rid not in items],
+    }
+
+
+def _split_param(value):
+    return [v.strip().lower() for v in (value or '').split(',') if v.strip()]
 
 
 def handler(event, context):
+    global _metrics, _cold_start
+    _metrics = _Metrics(*_trace_context(event))
+    profiler = cProfile.Profile() if PROFILE_SLOWEST_N > 0 else None
+    status = 500
+    try:
+        if profiler:
+            profiler.enable()
+        with timed('Total', 'handler'):
+            res = _maybe_compress(event, _route(event, context))
+        status = res.get('statusCode', 200)
+        return res
+    finally:
+        try:
+            if profiler:
+                profiler.disable()
+                _log_if_slowest(profiler, _metrics.timings.get('Total', 0.0))
+            print(json.dumps(_metrics.emf(status, _cold_start)))
+        except Exception:
+            pass
+        _cold_start = False
+
+
+def _route(event, context):
     rc = event.get('requestContext', {})
     http = rc.get('http', {})
     # Support v2.0 and 1.0 payloads
@@ -209,6 +1410,14 @@ def handler(event, context):
             # Map concrete path to templated route where possible
             if path == '/recipes' and method in ('GET', 'POST'):
                 route_key = f'{method} /recipes'
+            elif path == '/recipes/search' and method == 'GET':
+                route_key = 'GET /recipes/search'
+            elif path == '/bootstrap' and method == 'GET':
+                route_key = 'GET /bootstrap'
+            elif path == '/recipes/duplicates' and method == 'POST':
+                route_key = 'POST /recipes/duplicates'
+            elif path == '/shopping-list' and method == 'POST':
+                route_key = 'POST /shopping-list'
             elif path.startswith('/recipes/') and method in ('GET', 'PUT', 'DELETE'):
                 route_key = f'{method} /recipes/{{id}}'
             elif path == '/ratings' and method in ('GET', 'POST'):
@@ -219,6 +1428,10 @@ def handler(event, context):
     # If route_key provided but unexpected (e.g., path has trailing slash), re-derive a normalized key
     expected = {
         'GET /recipes',
+        'GET /recipes/search',
+        'GET /bootstrap',
+        'POST /recipes/duplicates',
+        'POST /shopping-list',
         'GET /recipes/{id}',
         'POST /recipes',
         'PUT /recipes/{id}',
@@ -237,6 +1450,14 @@ def handler(event, context):
         if method and path:
             if path == '/recipes' and method in ('GET', 'POST'):
                 route_key = f'{method} /recipes'
+            elif path == '/recipes/search' and method == 'GET':
+                route_key = 'GET /recipes/search'
+            elif path == '/bootstrap' and method == 'GET':
+                route_key = 'GET /bootstrap'
+            elif path == '/recipes/duplicates' and method == 'POST':
+                route_key = 'POST /recipes/duplicates'
+            elif path == '/shopping-list' and method == 'POST':
+                route_key = 'POST /shopping-list'
             elif path.startswith('/recipes/') and method in ('GET', 'PUT', 'DELETE'):
                 route_key = f'{method} /recipes/{{id}}'
             elif path == '/ratings' and method in ('GET', 'POST'):
@@ -249,6 +1470,8 @@ def handler(event, context):
     if norm_path.endswith('/') and norm_path != '/':
         norm_path = norm_path.rstrip('/')
 
+    _metrics.route = route_key
+
     # Emit a lightweight log line for quick diagnostics in CloudWatch
     try:
         region = os.environ.get('AWS_REGION', 'us-east-1')
@@ -316,6 +1539,92 @@ def handler(event, context):
             'name': name,
         }
 
+    if route_key == 'GET /bootstrap':
+        try:
+            with timed('DynamoDB', 'DynamoDB.bootstrap_scans', segments=BOOTSTRAP_SCAN_SEGMENTS):
+                recipes, ratings = _bootstrap_reads()
+        except ClientError as e:
+            return response(500, {'error': str(e)})
+        # Start point for GET /recipes?since= delta sync; tombstones count so they are not resent
+        watermark = max((int(i.get('updatedAt') or 0) for i in recipes), default=0)
+        recipes = [i for i in recipes if not _is_tombstone(i)]
+        identity = get_identity() if _header(event, 'authorization') else None
+        window = int(time.time()) // BOOTSTRAP_URL_WINDOW
+        h = hashlib.sha256()
+        for part in (_list_etag(recipes), _list_etag(ratings, 'ratingId'), json.dumps(identity, sort_keys=True), str(window)):
+            h.update(part.encode('utf-8'))
+        etag = f'"b-{h.hexdigest()[:32]}"'
+        # Identity is in the body, so only the caller's own cache may keep it
+        cache_control = 'private, no-cache'
+        if _etag_matches(event, etag):
+            return cached_response(event, 200, None, etag, cache_control)
+
+        summary = _rating_summary(ratings)
+        expires_in = BOOTSTRAP_URL_WINDOW * 2
+        items = []
+        for item in sorted(recipes, key=lambda i: str(i.get('title') or '').lower()):
+            out = {k: item[k] for k in SUMMARY_FIELDS if k in item}
+            out['id'] = out['recipeId'] = item['recipeId']
+            if item.get('image'):
+                out['imageUrl'] = _image_url(item['image'], expires_in)
+            out['rating'] = summary.get(item['recipeId'], {'count': 0, 'average': None})
+            items.append(out)
+        _metrics.count('ItemCount', len(items))
+        body = {
+            'recipes': items,
+            'identity': identity,
+            'watermark': watermark,
+        }
+        return cached_response(event, 200, body, etag, cache_control)
+
+    if route_key == 'POST /recipes/duplicates':
+        try:
+            body = json.loads(event.get('body') or '{}')
+        except json.JSONDecodeError:
+            return response(400, {'error': 'Invalid JSON body'})
+        try:
+            duplicates = _find_duplicates(body, exclude_id=body.get('id') or body.get('recipeId'))
+        except ClientError as e:
+            return response(500, {'error': str(e)})
+        return response(200, {'duplicates': duplicates})
+
+    if route_key == 'POST /shopping-list':
+        try:
+            body = json.loads(event.get('body') or '{}')
+        except json.JSONDecodeError:
+            return response(400, {'error': 'Invalid JSON body'})
+        entries = body.get('recipes') if isinstance(body, dict) else None
+        if not isinstance(entries, list) or not entries or not all(isinstance(e, dict) for e in entries):
+            return response(400, {'error': 'recipes must be a non-empty list of {id, multiplier?, servings?}'})
+        if len(entries) > SHOPPING_LIST_MAX_RECIPES:
+            return response(400, {'error': f'At most {SHOPPING_LIST_MAX_RECIPES} recipes per list'})
+        try:
+            return response(200, _shopping_list(entries))
+        except ValueError as e:
+            return response(400, {'error': str(e)})
+        except ClientError as e:
+            return response(500, {'error': str(e)})
+
+    # Search (must match before the GET /recipes/{id} path fallback below)
+    if route_key == 'GET /recipes/search':
+        table = _get_table(RECIPES_TABLE, get_dynamodb())
+        try:
+            limit = max(1, min(int(query.get('limit') or 50), 200))
+        except ValueError:
+            return response(400, {'message': 'limit must be an integer'})
+        try:
+            index = get_search_index(table)
+            items = index.search(
+                q=query.get('q') or '',
+                tags=_split_param(query.get('tags')),
+                ingredients=_split_param(query.get('ingredient')),
+                limit=limit,
+            )
+            _metrics.count('ItemCount', len(items))
+            return response(200, [map_recipe_out(i) for i in items])
+        except ClientError as e:
+            return response(500, {'error': str(e)})
+
     # Recipes
     if route_key in (
         'GET /recipes',
@@ -327,10 +1636,32 @@ def handler(event, context):
         table = _get_table(RECIPES_TABLE, get_dynamodb())
 
         if route_key == 'GET /recipes' or (method == 'GET' and norm_path == '/recipes'):
+            if query.get('since') is not None:
+                try:
+                    since = int(query['since'])
+                except ValueError:
+                    return response(400, {'message': 'since must be an epoch-seconds integer'})
+                if since < int(time.time()) - TOMBSTONE_TTL:
+                    # Tombstones older than the TTL are gone; the client must do a full refresh
+                    return response(410, {'message': 'since is older than the tombstone window; refetch /recipes'})
+                try:
+                    changed = _changed_since(table, since)
+                except ClientError as e:
+                    return response(500, {'error': str(e)})
+                watermark = max([since] + [int(i.get('updatedAt') or 0) for i in changed])
+                _metrics.count('ItemCount', len(changed))
+                return response(200, {
+                    'items': [map_recipe_out(i) for i in changed if not _is_tombstone(i)],
+                    'deleted': [i['recipeId'] for i in changed if _is_tombstone(i)],
+                    'watermark': watermark,
+                })
+            if RECIPES_SNAPSHOT_URL and query.get('fresh') is None and _snapshot_ready():
+                # Served from S3/CloudFront: no scan; ?fresh=1 bypasses it right after a local write
+                return redirect(RECIPES_SNAPSHOT_URL, 302)
             try:
-                res = table.scan()
-                items = res.get('Items', [])
-                return response(200, [map_recipe_out(i) for i in items])
+                items = [i for i in _scan_all(table, **_projection(RECIPE_FIELDS)) if not _is_tombstone(i)]
+                _metrics.count('ItemCount', len(items))
+                return cached_response(event, 200, [map_recipe_out(i) for i in items], _list_etag(items))
             except ClientError as e:
                 return response(500, {'error': str(e)})
 
@@ -339,35 +1670,31 @@ def handler(event, context):
             if not recipe_id:
                 return response(400, {'message': 'Missing id'})
             try:
-                res = table.get_item(Key={'recipeId': recipe_id})
-                item = res.get('Item')
-                if not item:
+                item, hit = _get_recipe_cached(table, recipe_id)
+                _metrics.count('RecipeCacheHit', int(hit))
+                if not item or _is_tombstone(item):
                     return response(404, {'message': 'Not found'})
-                return response(200, map_recipe_out(item))
+                return cached_response(event, 200, map_recipe_out(item), _recipe_etag(item))
             except ClientError as e:
                 return response(500, {'error': str(e)})
 
         if route_key == 'POST /recipes':
-            try:
-                body = json.loads(event.get('body') or '{}')
-                recipe_id = str(uuid.uuid4())
-                ident = get_identity()
-                now = int(time.time())
-                # Stamp attribution and timestamps
-                item = {
-                    'recipeId': recipe_id,
-                    **body,
-                    'createdAt': now,
-                    'createdBySub': ident.get('sub'),
-                    'createdByName': ident.get('name'),
-                    'updatedAt': now,
-                    'updatedBySub': ident.get('sub'),
-                    'updatedByName': ident.get('name'),
-                }
-                table.put_item(Item=item)
-                return response(201, map_recipe_out(item))
-            except ClientError as e:
-                return response(500, {'error': str(e)})
+            ident = get_identity()
+
+            def create():
+                try:
+                    body = json.loads(event.get('body') or '{}')
+                    # Stamp attribution, timestamps and parsed ingredients
+                    item = recipe_items.new_item(str(uuid.uuid4()), body, ident, int(time.time()))
+                    table.put_item(Item=item)
+                    _index_put(item)
+                    _recipe_cache.put(item)
+                    return response(201, map_recipe_out(item))
+                except ClientError as e:
+                    return response(500, {'error': str(e)})
+
+            # Retries with the same Idempotency-Key get the first response instead of a second recipe
+            return _idempotent(event, f"{ident.get('sub') or 'anonymous'}#{route_key}", create)
 
         if route_key == 'PUT /recipes/{id}':
             recipe_id = path_params.get('id') or (raw_path.split('/')[-1] if raw_path else None)
@@ -380,24 +1707,12 @@ def handler(event, context):
 
                 # Load existing to preserve created* fields if present
                 existing = table.get_item(Key={'recipeId': recipe_id}).get('Item') or {}
-                created_at = existing.get('createdAt') or now
-                created_by_sub = existing.get('createdBySub')
-                created_by_name = existing.get('createdByName')
-
-                item = {
-                    'recipeId': recipe_id,
-                    **existing,
-                    **body,
-                    # preserve original creation metadata
-                    'createdAt': created_at,
-                    'createdBySub': created_by_sub,
-                    'createdByName': created_by_name,
-                    # update modification metadata
-                    'updatedAt': now,
-                    'updatedBySub': ident.get('sub'),
-                    'updatedByName': ident.get('name'),
-                }
+                if _is_tombstone(existing):
+                    existing = {}
+                item = recipe_items.updated_item(recipe_id, existing, body, ident, now)
                 table.put_item(Item=item)
+                _index_put(item)
+                _recipe_cache.put(item)
                 return response(200, map_recipe_out(item))
             except ClientError as e:
                 return response(500, {'error': str(e)})
@@ -407,9 +1722,25 @@ def handler(event, context):
             if not recipe_id:
                 return response(400, {'message': 'Missing id'})
             try:
-                table.delete_item(Key={'recipeId': recipe_id})
+                # Soft delete: replace the item with a tombstone so delta sync can report it
+                ident = get_identity()
+                now = int(time.time())
+                table.put_item(Item={
+                    'recipeId': recipe_id,
+                    'deleted': True,
+                    'syncBucket': SYNC_BUCKET,
+                    'updatedAt': now,
+                    'updatedBySub': ident.get('sub'),
+                    'expiresAt': now + TOMBSTONE_TTL,
+                }, ConditionExpression='attribute_exists(recipeId) AND attribute_not_exists(deleted)')
+                _index_remove(recipe_id)
+                _recipe_cache.invalidate(recipe_id)
                 return response(204, {})
             except ClientError as e:
+                # Unknown or already deleted: don't plant a tombstone for a recipe that never existed
+                if e.response.get('Error', {}).get('Code') == 'ConditionalCheckFailedException':
+                    _recipe_cache.invalidate(recipe_id)
+                    return response(404, {'message': 'Not found'})
                 return response(500, {'error': str(e)})
 
     # Ratings
@@ -420,7 +1751,8 @@ def handler(event, context):
             try:
                 body = json.loads(event.get('body') or '{}')
                 rating_id = str(uuid.uuid4())
-                item = {'ratingId': rating_id, **body}
+                # Set after the body so a client can't overwrite someone else's rating
+                item = {**body, 'ratingId': rating_id}
                 table.put_item(Item=item)
                 return response(201, item)
             except ClientError as e:
@@ -432,33 +1764,89 @@ def handler(event, context):
                 items = res.get('Items', [])
                 if 'recipeId' in query:
                     items = [i for i in items if i.get('recipeId') == query['recipeId']]
-                return response(200, items)
+                _metrics.count('ItemCount', len(items))
+                # Ratings are never edited, so their ids alone identify the list
+                return cached_response(event, 200, items, _list_etag(items, 'ratingId'))
             except ClientError as e:
                 return response(500, {'error': str(e)})
 
     # AI recipe extraction
     if route_key == 'POST /ai/extract-recipe':
+        deadline = _deadline_from(context)
         try:
             body = json.loads(event.get('body') or '{}')
-            extract_type = body.get('type')
-            if extract_type == 'image':
-                images = body.get('images') or []
-                if not images:
-                    return response(400, {'error': 'Missing images field for image extraction'})
-                result = _extract_from_image(images)
-            elif extract_type == 'url':
-                url = body.get('url', '').strip()
-                if not url:
-                    return response(400, {'error': 'Missing url field for URL extraction'})
-                result = _extract_from_url(url)
-            else:
-                return response(400, {'error': 'type must be "image" or "url"'})
-            return response(200, result)
-        except ClientError as e:
-            print(f"Bedrock error: {e}")
-            return response(502, {'error': 'AI service error', 'detail': str(e)})
-        except Exception as e:
-            print(f"extract-recipe error: {e}")
-            return response(500, {'error': str(e)})
+        except json.JSONDecodeError:
+            return response(400, {'error': 'Invalid JSON body'})
+        extract_type = body.get('type')
+        if extract_type == 'image':
+            images = body.get('images') or []
+            if not images:
+                return response(400, {'error': 'Missing images field for image extraction'})
+            cost = len(images)
+        elif extract_type == 'url':
+            url = body.get('url', '').strip()
+            if not url:
+                return response(400, {'error': 'Missing url field for URL extraction'})
+            cost = 1
+        else:
+            return response(400, {'error': 'type must be "image" or "url"'})
+
+        sub = get_identity().get('sub') or 'anonymous'
+
+        def extract():
+            # A page that was already imported is caught before paying for the fetch and inference
+            if extract_type == 'url' and DEDUP_TABLE and not body.get('force'):
+                try:
+                    known = _find_duplicates({'sourceUrl': url})
+                except ClientError as e:
+                    print(f"duplicate check failed: {e}")
+                    known = []
+                if known:
+                    _metrics.count('DuplicateImport', 1)
+                    return response(409, {
+                        'error': f"Already imported as \u201c{known[0]['title']}\u201d",
+                        'duplicates': known,
+                    })
+
+            # Admission control: each image costs a token; at most AI_MAX_IN_FLIGHT calls per user
+            limit_key = lease_id = None
+            if _ai_limiter:
+                limit_key = f'ai#{sub}'
+                lease_id = getattr(context, 'aws_request_id', None) or str(uuid.uuid4())
+                try:
+                    retry_after = _ai_limiter.acquire(limit_key, cost, lease_id)
+                except ClientError as e:
+                    # Fail open: a limiter outage should not take extraction down with it
+                    print(f"rate limit check failed: {e}")
+                    retry_after, lease_id = 0, None
+                if retry_after:
+                    _metrics.count('RateLimited', 1)
+                    res = response(429, {'error': f'Too many extraction requests; try again in {retry_after}s'})
+                    return _with_retry_after(res, retry_after)
+
+            try:
+                if extract_type == 'image':
+                    result = _extract_from_image(images, deadline)
+                else:
+                    result = _extract_from_url(url, deadline)
+                    if isinstance(result, dict) and 'error' not in result:
+                        result['sourceUrl'] = url
+                return response(200, result)
+            except BedrockUnavailable as e:
+                print(f"Bedrock unavailable: {e}")
+                res = response(e.status, {'error': str(e)})
+                return _with_retry_after(res, e.retry_after) if e.retry_after else res
+            except (ClientError, ReadTimeoutError, ConnectTimeoutError, EndpointConnectionError) as e:
+                print(f"Bedrock error: {e}")
+                return response(502, {'error': 'AI service error', 'detail': str(e)})
+            except Exception as e:
+                print(f"extract-recipe error: {e}")
+                return response(500, {'error': str(e)})
+            finally:
+                if lease_id:
+                    _ai_limiter.release(limit_key, lease_id)
+
+        # Checked before the rate limiter so replays cost neither tokens nor inference
+        return _idempotent(event, f'{sub}#{route_key}', extract)
 
     return response(400, {'message': 'Unsupported operation'})
@@ -0,0 +1,52 @@
+"""
+DynamoDB helpers shared by the recipes and snapshot Lambdas.
+
+Lives next to the recipes handler; the snapshot Lambda's zip bundles a copy
+(see archive_file.snapshot_zip in backend_api.tf).
+"""
+
+from decimal import Decimal
+
+# Every recipe attribute clients see, plus the tombstone flag and the contentHash
+# validator. Full scans project to these so the write-time parsedIngredients arrays,
+# read only by shopping lists, never cost scan capacity.
+RECIPE_FIELDS = ('recipeId', 'title', 'description', 'image', 'tags', 'ingredients', 'servings', 'cookTime',
+                 'instructions', 'sourceUrl', 'createdAt', 'createdBySub', 'createdByName', 'updatedAt',
+                 'updatedBySub', 'updatedByName', 'deleted', 'contentHash')
+
+
+def json_default(obj):
+    """json.dumps hook for DynamoDB Decimals, converted during the single encoding pass."""
+    if isinstance(obj, Decimal):
+        # Preserve integers as int, otherwise use float
+        try:
+            return int(obj) if obj % 1 == 0 else float(obj)
+        except Exception:
+            return float(obj)
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+def projection(fields):
+    """ProjectionExpression keyword arguments for `fields`, each aliased (several are reserved words)."""
+    names = {f'#p{i}': f for i, f in enumerate(fields)}
+    return {'ProjectionExpression': ', '.join(names), 'ExpressionAttributeNames': names}
+
+
+def paginate(op, **kwargs):
+    """Every item from a scan or query; a single call stops at 1 MB of data."""
+    items = []
+    while True:
+        res = op(**kwargs)
+        items.extend(res.get('Items', []))
+        last = res.get('LastEvaluatedKey')
+        if not last:
+            return items
+        kwargs['ExclusiveStartKey'] = last
+
+
+def scan_all(table, **kwargs):
+    return paginate(table.scan, **kwargs)
+
+
+def query_all(table, **kwargs):
+    return paginate(table.query, **kwargs)
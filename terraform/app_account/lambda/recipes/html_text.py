@@ -0,0 +1,46 @@
+"""
+Visible text of a web page, as sent to the model for URL extraction.
+
+Shared by the recipes Lambda and local_testing_scripts/extract_from_url.py so both
+send the model the same text; benchmarks/extraction_regression.py measures each.
+"""
+
+from html.parser import HTMLParser
+
+# Page text sent to the model is cut here; benchmarks/extraction_regression.py measures what that loses
+PAGE_TEXT_LIMIT = 20000
+
+
+class TextExtractor(HTMLParser):
+    """Strips HTML tags and returns visible text, skipping script/style blocks."""
+
+    # Only elements with end tags: a void <meta>/<link> would never close and hide the rest of the page
+    SKIP_TAGS = {"script", "style", "noscript", "head", "template", "svg"}
+
+    def __init__(self):
+        super().__init__()
+        self._skip = 0
+        self.chunks = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag.lower() in self.SKIP_TAGS:
+            self._skip += 1
+
+    def handle_endtag(self, tag):
+        if tag.lower() in self.SKIP_TAGS:
+            self._skip = max(0, self._skip - 1)
+
+    def handle_data(self, data):
+        if self._skip == 0:
+            text = data.strip()
+            if text:
+                self.chunks.append(text)
+
+    def get_text(self):
+        return "\n".join(self.chunks)
+
+
+def page_text(html, limit=PAGE_TEXT_LIMIT, extractor=TextExtractor):
+    parser = extractor()
+    parser.feed(html)
+    return parser.get_text()[:limit]
@@ -0,0 +1,202 @@
+"""
+Ingredient amount parsing and shopping-list aggregation for the recipes Lambda.
+
+Amounts arrive as free text from the extraction prompt ("1 1/2 cups", "200g",
+"2-3 cloves", "1 (14 oz) can"). parse_all() turns a recipe's ingredient list into
+parallel arrays (keys, names, quantities, units), with mass in grams and volume in
+millilitres, so aggregation is a single pass of multiply-and-add. The arrays are
+stored on the recipe item at write time; bump PARSER_VERSION when parsing changes
+so stale arrays are re-parsed on read.
+
+Mass and volume are never converted into each other (that needs a density per
+ingredient), so "butter" in grams and "butter" in tablespoons stay separate lines.
+"""
+
+import re
+from decimal import Decimal
+
+PARSER_VERSION = 1
+
+# alias -> (canonical unit, dimension, factor to the base unit of that dimension)
+_MASS = {
+    'g': 1, 'gram': 1, 'grams': 1, 'gr': 1,
+    'kg': 1000, 'kilogram': 1000, 'kilograms': 1000,
+    'mg': 0.001,
+    'oz': 28.3495, 'ounce': 28.3495, 'ounces': 28.3495,
+    'lb': 453.592, 'lbs': 453.592, 'pound': 453.592, 'pounds': 453.592,
+}
+_VOLUME = {
+    'ml': 1, 'millilitre': 1, 'milliliter': 1, 'millilitres': 1, 'milliliters': 1,
+    'cl': 10, 'dl': 100,
+    'l': 1000, 'litre': 1000, 'liter': 1000, 'litres': 1000, 'liters': 1000,
+    'tsp': 4.92892, 'teaspoon': 4.92892, 'teaspoons': 4.92892, 't': 4.92892,
+    'tbsp': 14.7868, 'tablespoon': 14.7868, 'tablespoons': 14.7868, 'tbs': 14.7868, 'tbl': 14.7868, 'T': 14.7868,
+    'fl oz': 29.5735, 'floz': 29.5735, 'fluid ounce': 29.5735, 'fluid ounces': 29.5735,
+    'cup': 236.588, 'cups': 236.588, 'c': 236.588,
+    'pint': 473.176, 'pints': 473.176, 'pt': 473.176,
+    'quart': 946.353, 'quarts': 946.353, 'qt': 946.353,
+    'gallon': 3785.41, 'gallons': 3785.41, 'gal': 3785.41,
+}
+_IMPERIAL = {'oz', 'ounce', 'ounces', 'lb', 'lbs', 'pound', 'pounds', 'tsp', 'teaspoon', 'teaspoons', 't',
+             'tbsp', 'tablespoon', 'tablespoons', 'tbs', 'tbl', 'T', 'fl oz', 'floz', 'fluid ounce',
+             'fluid ounces', 'cup', 'cups', 'c', 'pint', 'pints', 'pt', 'quart', 'quarts', 'qt',
+             'gallon', 'gallons', 'gal'}
+# Countable units keep their own name as the unit
+_COUNT = {
+    'clove': 'clove', 'cloves': 'clove', 'can': 'can', 'cans': 'can', 'tin': 'can', 'tins': 'can',
+    'slice': 'slice', 'slices': 'slice', 'piece': 'piece', 'pieces': 'piece', 'stick': 'stick',
+    'sticks': 'stick', 'bunch': 'bunch', 'bunches': 'bunch', 'sprig': 'sprig', 'sprigs': 'sprig',
+    'head': 'head', 'heads': 'head', 'pinch': 'pinch', 'pinches': 'pinch', 'dash': 'dash',
+    'dashes': 'dash', 'package': 'package', 'packages': 'package', 'pkg': 'package', 'packet': 'package',
+    'jar': 'jar', 'jars': 'jar', 'bag': 'bag', 'bags': 'bag', 'handful': 'handful', 'handfuls': 'handful',
+}
+_UNICODE_FRACTIONS = {'½': '1/2', '⅓': '1/3', '⅔': '2/3', '¼': '1/4', '¾': '3/4', '⅕': '1/5',
+                      '⅛': '1/8', '⅜': '3/8', '⅝': '5/8', '⅞': '7/8', '⅙': '1/6', '⅚': '5/6'}
+_NUMBER = r'(?:\d+\s+\d+/\d+|\d+/\d+|\d+(?:\.\d+)?|\.\d+)'
+_QUANTITY_RE = re.compile(rf'^\s*(?:about|approx\.?|~)?\s*({_NUMBER})(?:\s*(?:-|–|to)\s*({_NUMBER}))?\s*')
+_UNIT_RE = re.compile(
+    r'^(' + '|'.join(sorted((re.escape(u) for u in {**_MASS, **_VOLUME, **_COUNT}), key=len, reverse=True)) + r')\.?(?![a-z])',
+    re.I,
+)
+_PAREN_RE = re.compile(r'\([^)]*\)')
+
+
+def _number(text):
+    text = text.strip()
+    if ' ' in text:
+        whole, frac = text.split(None, 1)
+        return float(whole) + _number(frac)
+    if '/' in text:
+        num, den = text.split('/', 1)
+        return float(num) / float(den) if float(den) else 0.0
+    return float(text)
+
+
+def _unit(token):
+    """(base unit, factor, imperial) for a unit token, or None."""
+    # "T" (tablespoon) and "t" (teaspoon) are only told apart by case
+    if token in ('T', 't'):
+        return 'ml', _VOLUME[token], True
+    lower = token.lower()
+    if lower in _MASS:
+        return 'g', _MASS[lower], lower in _IMPERIAL
+    if lower in _VOLUME:
+        return 'ml', _VOLUME[lower], lower in _IMPERIAL
+    if lower in _COUNT:
+        return _COUNT[lower], 1, False
+    return None
+
+
+def parse_amount(text):
+    """(quantity, base unit, imperial) for an amount like "1 1/2 cups"; quantity is None if absent.
+
+    Ranges take the upper bound (you need enough for "2-3 cloves"). A bare number is a
+    count with unit "".
+    """
+    text = _PAREN_RE.sub(' ', text or '')
+    for char, frac in _UNICODE_FRACTIONS.items():
+        text = re.sub(rf'(\d)\s*{char}', rf'\1 {frac}', text).replace(char, frac)
+    match = _QUANTITY_RE.match(text)
+    if not match:
+        return None, '', False, text.strip()
+    quantity = _number(match.group(2) or match.group(1))
+    rest = text[match.end():]
+    unit = _UNIT_RE.match(rest)
+    if unit and _unit(unit.group(1)):
+        base, factor, imperial = _unit(unit.group(1))
+        return quantity * factor, base, imperial, rest[unit.end():].strip()
+    return quantity, '', False, rest.strip()
+
+
+def normalise_name(name):
+    """Grouping key: lower case, no parentheticals or prep notes, last word singular."""
+    name = _PAREN_RE.sub(' ', name or '').split(',')[0].lower()
+    words = re.findall(r"[a-z][a-z'-]*", name)
+    if not words:
+        return ''
+    last = words[-1]
+    if last.endswith('ies') and len(last) > 4:
+        last = last[:-3] + 'y'
+    elif last.endswith('oes') and len(last) > 4:
+        last = last[:-2]
+    elif last.endswith('s') and not last.endswith('ss') and len(last) > 3:
+        last = last[:-1]
+    return ' '.join(words[:-1] + [last])
+
+
+def parse_all(ingredients):
+    """Columnar parse of a recipe's ingredients, ready to store on the item.
+
+    {v, keys, names, qty, units, imperial}: qty entries are Decimals (DynamoDB has no
+    floats) or None for "salt to taste"; units are "g", "ml", a count unit or "".
+    """
+    parsed = {'v': PARSER_VERSION, 'keys': [], 'names': [], 'qty': [], 'units': [], 'imperial': []}
+    for ing in ingredients or []:
+        if isinstance(ing, dict):
+            name, amount = str(ing.get('name') or ''), str(ing.get('amount') or '')
+        else:
+            name, amount = str(ing or ''), ''
+        quantity, unit, imperial, leftover = parse_amount(amount)
+        if quantity is None and not amount:
+            # "2 cups flour" with everything in the name
+            quantity, unit, imperial, leftover = parse_amount(name)
+            if quantity is not None:
+                name = leftover
+        key = normalise_name(name)
+        if not key:
+            continue
+        parsed['keys'].append(key)
+        parsed['names'].append(name.split(',')[0].strip())
+        parsed['qty'].append(None if quantity is None else Decimal(str(round(quantity, 4))))
+        parsed['units'].append(unit)
+        parsed['imperial'].append(imperial)
+    return parsed
+
+
+def parse_servings(servings):
+    """Lower bound of a servings string ("4-6" -> 4), or None."""
+    match = re.search(r'\d+', str(servings or ''))
+    return int(match.group()) if match and int(match.group()) > 0 else None
+
+
+def _display(quantity, unit, imperial):
+    """Convert a base quantity back to a unit a shopper would use."""
+    if unit == 'g':
+        if imperial:
+            return (quantity / 453.592, 'lb') if quantity >= 453.592 else (quantity / 28.3495, 'oz')
+        return (quantity / 1000, 'kg') if quantity >= 1000 else (quantity, 'g')
+    if unit == 'ml':
+        if imperial:
+            if quantity >= 59.147:
+                return quantity / 236.588, 'cup'
+            return (quantity / 14.7868, 'tbsp') if quantity >= 14.7868 else (quantity / 4.92892, 'tsp')
+        return (quantity / 1000, 'l') if quantity >= 1000 else (quantity, 'ml')
+    return quantity, unit
+
+
+def aggregate(plan):
+    """Shopping list for [(recipe_id, parsed, multiplier)]: one multiply-and-add per ingredient line."""
+    totals = {}
+    for recipe_id, parsed, multiplier in plan:
+        for key, name, quantity, unit, imperial in zip(parsed['keys'], parsed['names'], parsed['qty'],
+                                                       parsed['units'], parsed['imperial']):
+            line = totals.get((key, unit))
+            if line is None:
+                line = totals[(key, unit)] = {'name': name, 'quantity': None, 'unit': unit,
+                                              'imperial': False, 'recipes': []}
+            if quantity is not None:
+                line['quantity'] = (line['quantity'] or 0.0) + float(quantity) * multiplier
+                line['imperial'] = line['imperial'] or bool(imperial)
+            if recipe_id not in line['recipes']:
+                line['recipes'].append(recipe_id)
+
+    items = []
+    for (key, _), line in sorted(totals.items()):
+        quantity, unit = line['quantity'], line['unit'] or None
+        if quantity is not None:
+            quantity, unit = _display(quantity, line['unit'], line['imperial'])
+            quantity, unit = round(quantity, 2), unit or None
+        elif not unit:
+            unit = None
+        items.append({'name': line['name'], 'quantity': quantity, 'unit': unit, 'recipes': line['recipes']})
+    return items
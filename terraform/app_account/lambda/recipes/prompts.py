@@ -0,0 +1,70 @@
+"""
+Recipe extraction prompts, shared by the recipes Lambda and local_testing_scripts.
+
+Bump PROMPT_VERSION on any wording change: it is logged with every extraction so
+quality and token counts can be compared across prompt revisions.
+
+The system prompt is sent as [instructions, schema, source hint], a stable prefix per
+source. It carries no cachePoint: Bedrock only caches prefixes of at least the model's
+minimum (1,024 tokens on Sonnet) and this one is about 250, so a marker would be
+accepted and ignored. Add one after the source hint if the prefix grows past that.
+"""
+
+PROMPT_VERSION = "2026-10-19.1"
+
+INSTRUCTIONS = """You are a recipe extraction assistant. Extract recipe information and return ONLY a JSON object.
+
+Rules:
+- Return ONLY valid JSON. No markdown fences, no explanation.
+- ingredients[].amount is quantity+unit as a string (e.g. "1 cup", "200g"), omit if unknown.
+- instructions are ordered plain strings with no numbering prefix.
+- tags are concise descriptors like ["italian", "pasta", "vegetarian"].
+- If no recipe is present, return {"error": "no recipe found"}."""
+
+SCHEMA = """Return a JSON object with these fields (omit any you cannot determine):
+{
+  "title": "string (required)",
+  "description": "short summary string",
+  "tags": ["category", "strings"],
+  "ingredients": [{"name": "string", "amount": "string"}],
+  "servings": "string e.g. '4' or '4-6'",
+  "cookTime": "string e.g. '30 minutes'",
+  "instructions": ["step 1", "step 2"]
+}"""
+
+SOURCE_HINTS = {
+    "image": """Input: one or more images of a recipe card, handwritten note, cookbook page, or plated dish.
+If multiple images are provided they may show different sides or sections of the same recipe; combine them into one complete result.""",
+    "url": """Input: the visible text of a recipe webpage.
+Ignore ads, navigation, comments, and unrelated page content.""",
+}
+
+
+def system_blocks(source):
+    """Converse `system` blocks for `source` ("image" or "url")."""
+    return [
+        {"text": INSTRUCTIONS},
+        {"text": SCHEMA},
+        {"text": SOURCE_HINTS[source]},
+    ]
+
+
+def image_request_text(count):
+    noun = "these images" if count > 1 else "this image"
+    return f"Extract the recipe from {noun}."
+
+
+def url_request_text(url, page_text):
+    return f"URL: {url}\n\n---\n{page_text}"
+
+
+def usage_summary(resp):
+    """Token counts from a converse response; cache fields are 0 when nothing was cached."""
+    usage = resp.get("usage") or {}
+    return {
+        "promptVersion": PROMPT_VERSION,
+        "inputTokens": usage.get("inputTokens", 0),
+        "outputTokens": usage.get("outputTokens", 0),
+        "cacheReadInputTokens": usage.get("cacheReadInputTokens", 0),
+        "cacheWriteInputTokens": usage.get("cacheWriteInputTokens", 0),
+    }
@@ -0,0 +1,80 @@
+"""
+Recipe item construction, shared by the recipes Lambda and local_testing_scripts.
+
+Everything a write stamps onto a recipe lives here: attribution, timestamps, the
+delta-sync bucket and the pre-parsed ingredient arrays. A recipe loaded straight into
+DynamoDB (batch.py --upload dynamodb) then matches one saved through POST /recipes.
+Duplicate buckets and the list snapshot follow from the table stream either way.
+"""
+
+import hashlib
+import json
+
+import ingredients as ingredient_parser
+from ddb_utils import json_default
+
+# Delta sync: every recipe carries this constant so the gsi_updated_at index can range over updatedAt
+SYNC_BUCKET = 'all'
+
+# Written only by the server. A request body carrying any of them (a recipe echoed back
+# from GET, or a crafted {"deleted": true}) must not tombstone, expire or re-key the item.
+SERVER_FIELDS = frozenset((
+    'id', 'recipeId', 'deleted', 'expiresAt', 'syncBucket', 'contentHash', 'parsedIngredients',
+    'createdAt', 'createdBySub', 'createdByName', 'updatedAt', 'updatedBySub', 'updatedByName',
+))
+
+
+def content_hash(item):
+    """Digest of the item's content, the validator behind recipe and list ETags.
+
+    updatedAt has one-second resolution, so two edits in the same second share it;
+    this changes with any edit. Derived arrays and the digest itself are left out.
+    """
+    content = {k: v for k, v in item.items() if k not in ('contentHash', 'parsedIngredients')}
+    text = json.dumps(content, default=json_default, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:32]
+
+
+def client_fields(body):
+    """`body` without the attributes only the server may set."""
+    return {k: v for k, v in body.items() if k not in SERVER_FIELDS}
+
+
+def new_item(recipe_id, body, ident, now):
+    """The item stored for a newly created recipe."""
+    item = {
+        'recipeId': recipe_id,
+        **client_fields(body),
+        'createdAt': now,
+        'createdBySub': ident.get('sub'),
+        'createdByName': ident.get('name'),
+        'updatedAt': now,
+        'updatedBySub': ident.get('sub'),
+        'updatedByName': ident.get('name'),
+        'syncBucket': SYNC_BUCKET,
+    }
+    # Parsed once here so shopping lists never parse on the read path
+    item['parsedIngredients'] = ingredient_parser.parse_all(item.get('ingredients'))
+    item['contentHash'] = content_hash(item)
+    return item
+
+
+def updated_item(recipe_id, existing, body, ident, now):
+    """The item stored when `body` replaces `existing` (an empty dict for a new id)."""
+    item = {
+        'recipeId': recipe_id,
+        **existing,
+        **client_fields(body),
+        # preserve original creation metadata
+        'createdAt': existing.get('createdAt') or now,
+        'createdBySub': existing.get('createdBySub'),
+        'createdByName': existing.get('createdByName'),
+        # update modification metadata
+        'updatedAt': now,
+        'updatedBySub': ident.get('sub'),
+        'updatedByName': ident.get('name'),
+        'syncBucket': SYNC_BUCKET,
+    }
+    item['parsedIngredients'] = ingredient_parser.parse_all(item.get('ingredients'))
+    item['contentHash'] = content_hash(item)
+    return item
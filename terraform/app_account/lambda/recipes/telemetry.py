@@ -0,0 +1,93 @@
+"""
+Request metrics and trace spans, shared by the recipes and images Lambdas.
+
+Each request's timings and counters go out as one CloudWatch Embedded Metric Format
+(EMF) log line, with its spans attached. Lives next to the recipes handler; the
+images Lambda's zip bundles a copy (see archive_file.images_zip in backend_api.tf).
+"""
+
+import os
+import secrets
+import time
+from contextlib import contextmanager
+
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'mbm/api')
+MAX_SPANS = 100
+
+
+def trace_context(event):
+    """(trace_id, parent_span_id) from W3C traceparent or X-Ray headers, else a new trace id."""
+    headers = {k.lower(): v for k, v in ((event or {}).get('headers') or {}).items()}
+    parts = (headers.get('traceparent') or '').strip().split('-')
+    if len(parts) >= 4 and len(parts[1]) == 32:
+        return parts[1], parts[2]
+    xray = headers.get('x-amzn-trace-id') or os.environ.get('_X_AMZN_TRACE_ID')
+    if xray:
+        fields = dict(p.split('=', 1) for p in xray.split(';') if '=' in p)
+        if fields.get('Root'):
+            return fields['Root'], fields.get('Parent')
+    return secrets.token_hex(16), None
+
+
+class Metrics:
+    """Timings, counters and trace spans for one request."""
+
+    def __init__(self, trace_id=None, parent_id=None):
+        self.route = ''
+        self.timings = {}  # metric name -> milliseconds, summed over repeated calls
+        self.counts = {}
+        self.trace_id = trace_id
+        self.parent_id = parent_id
+        self.spans = []
+        self._stack = []
+        self._origin = time.perf_counter()
+
+    @contextmanager
+    def timed(self, name, span=None, **attributes):
+        """Add the block's duration to metric `name` and record it as a span (named `span` if given)."""
+        start = time.perf_counter()
+        record = {
+            'name': span or name,
+            'spanId': secrets.token_hex(8),
+            'parentSpanId': self._stack[-1] if self._stack else self.parent_id,
+            'startMs': round((start - self._origin) * 1000, 3),
+        }
+        if attributes:
+            record['attributes'] = attributes
+        self._stack.append(record['spanId'])
+        try:
+            yield
+        except Exception as e:
+            record['error'] = type(e).__name__
+            raise
+        finally:
+            self._stack.pop()
+            ms = (time.perf_counter() - start) * 1000
+            self.timings[name] = self.timings.get(name, 0.0) + ms
+            record['durationMs'] = round(ms, 3)
+            if len(self.spans) < MAX_SPANS:
+                self.spans.append(record)
+
+    def count(self, name, value):
+        self.counts[name] = self.counts.get(name, 0) + value
+
+    def emf(self, status, cold_start):
+        metrics = [{'Name': k, 'Unit': 'Milliseconds'} for k in self.timings]
+        metrics += [{'Name': k, 'Unit': 'Count'} for k in self.counts]
+        return {
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': METRICS_NAMESPACE,
+                    'Dimensions': [['Route', 'Status', 'ColdStart']],
+                    'Metrics': metrics,
+                }],
+            },
+            'Route': self.route or 'unmatched',
+            'Status': str(status),
+            'ColdStart': 'true' if cold_start else 'false',
+            **{k: round(v, 3) for k, v in self.timings.items()},
+            **self.counts,
+            'traceId': self.trace_id,
+            'spans': sorted(self.spans, key=lambda sp: sp['startMs']),
+        }
@@ -0,0 +1,84 @@
+import os
+import json
+import gzip
+import hashlib
+import boto3
+from botocore.exceptions import ClientError
+from ddb_utils import RECIPE_FIELDS, json_default, projection, scan_all
+
+# Publishes the recipe list as a gzipped JSON snapshot in the static-site bucket.
+# Triggered by the recipes table's DynamoDB Stream; every batch of changes
+# triggers one rebuild, so record contents are only used for logging.
+RECIPES_TABLE = os.environ.get('RECIPES_TABLE')
+SNAPSHOT_BUCKET = os.environ.get('SNAPSHOT_BUCKET')
+SNAPSHOT_PREFIX = os.environ.get('SNAPSHOT_PREFIX', 'data/')
+LATEST_KEY = f'{SNAPSHOT_PREFIX}recipes-index.json'
+
+# The latest pointer is revalidated quickly; versioned copies never change
+LATEST_CACHE_CONTROL = 'public, max-age=15, stale-while-revalidate=60'
+VERSIONED_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+s3 = boto3.client('s3')
+
+
+def get_dynamodb():
+    region = os.environ.get('AWS_REGION', 'us-east-1')
+    return boto3.resource('dynamodb', region_name=region)
+
+
+def _scan_recipes(table):
+    # Projected, so the shopping-list parsedIngredients are never read
+    items = scan_all(table, **projection(RECIPE_FIELDS))
+    out = []
+    for item in items:
+        if item.get('deleted'):
+            continue
+        # Same shape as GET /recipes so clients can swap one for the other
+        item['id'] = item.get('recipeId')
+        item.pop('contentHash', None)
+        out.append(item)
+    # Stable order keeps the content hash stable across scans
+    out.sort(key=lambda i: (-int(i.get('updatedAt') or 0), i.get('recipeId') or ''))
+    return out
+
+
+def build_snapshot(items):
+    """Return (version, gzipped_body) for a list of recipes."""
+    body = json.dumps(items, default=json_default, separators=(',', ':'), sort_keys=True).encode('utf-8')
+    version = hashlib.sha256(body).hexdigest()[:16]
+    # mtime=0 so identical content gzips to identical bytes
+    return version, gzip.compress(body, mtime=0)
+
+
+def _current_version():
+    try:
+        head = s3.head_object(Bucket=SNAPSHOT_BUCKET, Key=LATEST_KEY)
+        return (head.get('Metadata') or {}).get('version')
+    except ClientError:
+        return None
+
+
+def publish(items):
+    version, payload = build_snapshot(items)
+    if version == _current_version():
+        return version, False
+    common = {
+        'Bucket': SNAPSHOT_BUCKET,
+        'Body': payload,
+        'ContentType': 'application/json',
+        'ContentEncoding': 'gzip',
+        'Metadata': {'version': version, 'count': str(len(items))},
+    }
+    # Write the immutable copy first so the latest pointer never references a missing object
+    s3.put_object(Key=f'{SNAPSHOT_PREFIX}recipes-index.{version}.json', CacheControl=VERSIONED_CACHE_CONTROL, **common)
+    s3.put_object(Key=LATEST_KEY, CacheControl=LATEST_CACHE_CONTROL, **common)
+    return version, True
+
+
+def handler(event, context):
+    records = (event or {}).get('Records') or []
+    table = get_dynamodb().Table(RECIPES_TABLE)
+    items = _scan_recipes(table)
+    version, written = publish(items)
+    print(f"snapshot lambda: records={len(records)} recipes={len(items)} version={version} written={written}")
+    return {'version': version, 'count': len(items), 'written': written}
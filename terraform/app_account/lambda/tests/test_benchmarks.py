@@ -0,0 +1,57 @@
+import json
+import os
+import importlib.util
+from moto import mock_aws
+
+
+def load_module(path):
+    spec = importlib.util.spec_from_file_location('bench_module', path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+@mock_aws()
+def test_load_test_smoke(monkeypatch):
+    # run() sets these on os.environ; registering them here restores them afterwards
+    for name in ('RECIPES_TABLE', 'RATINGS_TABLE', 'RECIPES_UPDATED_INDEX', 'IMAGES_BUCKET'):
+        monkeypatch.setenv(name, '')
+
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    load_test = load_module(os.path.join(repo_root, 'benchmarks', 'load_test.py'))
+
+    report = load_test.run(n_recipes=10, ratings_per_recipe=1, requests=60, concurrency=2, bedrock_latency_ms=1)
+
+    assert sum(r['count'] for r in report['routes'].values()) == 60
+    assert all(r['errors'] == 0 for r in report['routes'].values()), report['routes']
+    assert {'GET /recipes/{id}', 'GET /recipes/search', 'POST /recipes'} <= set(report['routes'])
+    assert 'p99 ms' in load_test.format_report(report, baseline=report)
+
+
+def test_extraction_regression_against_baseline(monkeypatch):
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    harness = load_module(os.path.join(repo_root, 'benchmarks', 'extraction_regression.py'))
+    with open(harness.BASELINE) as f:
+        baseline = json.load(f)
+
+    report = harness.run()
+    assert harness.compare(report, baseline) == []
+    # Pages with <meta charset> in the head must still reach the model, from the Lambda
+    # and from the local batch script alike
+    assert report['cases']['blog-soup']['coverage'] == 1.0
+    assert report['cases']['blog-soup']['localCoverage'] == 1.0
+
+    # Skipping a void tag again (the old <meta> bug) hides every page body and is caught
+    harness_load = harness.load_recipes_app
+
+    def with_meta_skipped():
+        app = harness_load()
+        # The extractor class is shared with the local script; monkeypatch restores it
+        monkeypatch.setattr(app._TextExtractor, 'SKIP_TAGS', app._TextExtractor.SKIP_TAGS | {'meta'})
+        return app
+
+    harness.load_recipes_app = with_meta_skipped
+    problems = harness.compare(harness.run(['blog-soup']), baseline)
+    assert any(p.startswith('blog-soup: coverage') for p in problems)
+    assert any(p.startswith('blog-soup: local script coverage') for p in problems)
+    assert 'fenced-cookies: missing from this run' in problems
@@ -1,4 +1,5 @@
 import os
+import sys
 import json
 import boto3
 import importlib.util
@@ -6,6 +7,10 @@ from moto import mock_aws
 
 
 def load_module(path):
+    # The images zip bundles recipes/telemetry.py next to app.py
+    recipes_dir = os.path.join(os.path.dirname(os.path.dirname(path)), 'recipes')
+    if recipes_dir not in sys.path:
+        sys.path.insert(0, recipes_dir)
     spec = importlib.util.spec_from_file_location('app_module', path)
     mod = importlib.util.module_from_spec(spec)
     spec.loader.exec_module(mod)
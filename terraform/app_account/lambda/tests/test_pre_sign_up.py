@@ -0,0 +1,76 @@
+import os
+import time
+import boto3
+import importlib.util
+import pytest
+from moto import mock_aws
+
+
+def load_module(path):
+    spec = importlib.util.spec_from_file_location('app_module', path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+def sign_up(module, code, email='a@example.com'):
+    return module.handler({'request': {'userAttributes': {'email': email, 'custom:invite': code}}}, None)
+
+
+@mock_aws()
+def test_invite_precheck_and_redeem(monkeypatch):
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    ddb = boto3.resource('dynamodb', region_name='us-east-1')
+    table = ddb.create_table(
+        TableName='mbm-invites',
+        KeySchema=[{'AttributeName': 'code', 'KeyType': 'HASH'}, {'AttributeName': 'sk', 'KeyType': 'RANGE'}],
+        AttributeDefinitions=[
+            {'AttributeName': 'code', 'AttributeType': 'S'},
+            {'AttributeName': 'sk', 'AttributeType': 'S'},
+        ],
+        BillingMode='PAY_PER_REQUEST',
+    )
+    now = int(time.time())
+    table.put_item(Item={'code': 'FNF-OK', 'sk': 'META', 'maxUses': 1, 'uses': 0, 'issuedAt': now})
+    table.put_item(Item={'code': 'FNF-REVOKED', 'sk': 'META', 'maxUses': 1, 'uses': 0, 'revoked': True})
+    table.put_item(Item={'code': 'FNF-EXPIRED', 'sk': 'META', 'maxUses': 1, 'uses': 0, 'expiresAt': now - 1})
+    table.put_item(Item={'code': 'FNF-MASTER', 'sk': 'META', 'unlimited': True, 'uses': 5})
+    monkeypatch.setenv('INVITES_TABLE', 'mbm-invites')
+
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    pre_sign_up = load_module(os.path.join(repo_root, 'auth', 'pre_sign_up.py'))
+
+    transactions = []
+    transact = pre_sign_up.ddb.transact_write_items
+    monkeypatch.setattr(pre_sign_up.ddb, 'transact_write_items', lambda **kw: transactions.append(kw) or transact(**kw))
+
+    # Unusable codes are rejected by the read alone
+    for code in ('FNF-NOPE', 'FNF-REVOKED', 'FNF-EXPIRED'):
+        with pytest.raises(Exception, match='Invalid, expired, revoked, or exhausted'):
+            sign_up(pre_sign_up, code)
+    assert transactions == []
+
+    sign_up(pre_sign_up, 'FNF-OK')
+    sign_up(pre_sign_up, 'FNF-MASTER', 'b@example.com')
+    assert len(transactions) == 2
+    assert table.get_item(Key={'code': 'FNF-OK', 'sk': 'META'})['Item']['uses'] == 1
+
+    # Exhausted after its single use: rejected without another transaction
+    with pytest.raises(Exception, match='exhausted'):
+        sign_up(pre_sign_up, 'FNF-OK', 'c@example.com')
+    assert len(transactions) == 2
+
+
+def test_usable_mirrors_transaction_condition(monkeypatch):
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    pre_sign_up = load_module(os.path.join(repo_root, 'auth', 'pre_sign_up.py'))
+    usable = pre_sign_up._usable
+
+    assert not usable(None, 100)
+    assert usable({'maxUses': {'N': '3'}, 'uses': {'N': '2'}}, 100)
+    assert not usable({'maxUses': {'N': '3'}, 'uses': {'N': '3'}}, 100)
+    assert usable({'unlimited': {'BOOL': True}, 'expiresAt': {'N': '101'}}, 100)
+    assert not usable({'unlimited': {'BOOL': True}, 'expiresAt': {'N': '100'}}, 100)
+    # Legacy codes without maxUses are single-use via the `used` flag
+    assert usable({'code': {'S': 'X'}}, 100) and not usable({'used': {'BOOL': True}}, 100)
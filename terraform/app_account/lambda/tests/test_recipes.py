@@ -1,12 +1,23 @@
 import os
+import sys
 import json
+import time
+import base64
+import gzip
+import hashlib
+import threading
+from decimal import Decimal
 import boto3
 import importlib.util
+from botocore.exceptions import ClientError, ReadTimeoutError
 import pytest
 from moto import mock_aws
 
 
 def load_module(path):
+    # The Lambda runtime puts the function directory on sys.path (for prompts.py)
+    if os.path.dirname(path) not in sys.path:
+        sys.path.insert(0, os.path.dirname(path))
     spec = importlib.util.spec_from_file_location('app_module', path)
     mod = importlib.util.module_from_spec(spec)
     spec.loader.exec_module(mod)
@@ -58,3 +69,975 @@ def test_create_and_get_recipe(tmp_path, monkeypatch):
     assert got['recipeId'] == recipe_id
     # End of test_create_and_get_recipe
 
+
+@mock_aws()
+def test_client_cannot_set_server_fields(monkeypatch):
+    dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+    table = dynamodb.create_table(
+        TableName='mbm-recipes',
+        KeySchema=[{'AttributeName': 'recipeId', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': 'recipeId', 'AttributeType': 'S'}],
+        BillingMode='PAY_PER_REQUEST'
+    )
+    table.wait_until_exists()
+    monkeypatch.setenv('RECIPES_TABLE', 'mbm-recipes')
+
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    recipes_app = load_module(os.path.join(repo_root, 'recipes', 'app.py'))
+
+    forged = {'deleted': True, 'expiresAt': 1, 'syncBucket': 'other', 'createdAt': 1, 'updatedAt': 1,
+              'createdBySub': 'someone-else', 'contentHash': 'x', 'parsedIngredients': {'keys': []},
+              'recipeId': 'hijacked'}
+    res = recipes_app.handler({'requestContext': {'http': {'method': 'POST'}}, 'rawPath': '/recipes',
+                               'body': json.dumps({'title': 'Soup', **forged})}, None)
+    assert res['statusCode'] == 201
+    rid = json.loads(res['body'])['recipeId']
+    assert rid != 'hijacked'
+
+    def stored_and_fetched():
+        # A fresh module instance has no warm cache, so GET reads the table
+        get = load_module(os.path.join(repo_root, 'recipes', 'app.py')).handler(
+            {'requestContext': {'http': {'method': 'GET'}}, 'rawPath': f'/recipes/{rid}'}, None)
+        return table.get_item(Key={'recipeId': rid})['Item'], get['statusCode']
+
+    item, status = stored_and_fetched()
+    assert status == 200
+    assert 'deleted' not in item and 'expiresAt' not in item
+    assert item['syncBucket'] == 'all' and item['createdAt'] > 1 and item['createdBySub'] != 'someone-else'
+    assert item['contentHash'] != 'x' and item['parsedIngredients'] != {'keys': []}
+
+    # A PUT can't tombstone the recipe or move it to another key either
+    res = recipes_app.handler({'requestContext': {'http': {'method': 'PUT'}}, 'rawPath': f'/recipes/{rid}',
+                               'pathParameters': {'id': rid},
+                               'body': json.dumps({'title': 'Better Soup', **forged})}, None)
+    assert res['statusCode'] == 200
+    item, status = stored_and_fetched()
+    assert status == 200 and item['title'] == 'Better Soup'
+    assert 'deleted' not in item and 'expiresAt' not in item
+    assert 'Item' not in table.get_item(Key={'recipeId': 'hijacked'})
+
+
+
+@mock_aws()
+def test_search_recipes(monkeypatch):
+    dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+    table = dynamodb.create_table(
+        TableName='mbm-recipes',
+        KeySchema=[{'AttributeName': 'recipeId', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[
+            {'AttributeName': 'recipeId', 'AttributeType': 'S'},
+            {'AttributeName': 'syncBucket', 'AttributeType': 'S'},
+            {'AttributeName': 'updatedAt', 'AttributeType': 'N'},
+        ],
+        GlobalSecondaryIndexes=[{
+            'IndexName': 'gsi_updated_at',
+            'KeySchema': [
+                {'AttributeName': 'syncBucket', 'KeyType': 'HASH'},
+                {'AttributeName': 'updatedAt', 'KeyType': 'RANGE'},
+            ],
+            'Projection': {'ProjectionType': 'ALL'},
+        }],
+        BillingMode='PAY_PER_REQUEST'
+    )
+    table.wait_until_exists()
+    monkeypatch.setenv('RECIPES_TABLE', 'mbm-recipes')
+    monkeypatch.setenv('RECIPES_UPDATED_INDEX', 'gsi_updated_at')
+
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    recipes_app = load_module(os.path.join(repo_root, 'recipes', 'app.py'))
+    clock = [1_700_000_000]
+    monkeypatch.setattr(recipes_app.time, 'time', lambda: clock[0])
+
+    def post(body):
+        res = recipes_app.handler({
+            'requestContext': {'http': {'method': 'POST'}},
+            'rawPath': '/recipes',
+            'body': json.dumps(body),
+        }, None)
+        return json.loads(res['body'])
+
+    def search(params, results=None):
+        res = recipes_app.handler({
+            'requestContext': {'http': {'method': 'GET'}},
+            'rawPath': '/recipes/search',
+            'queryStringParameters': params,
+        }, None)
+        assert res['statusCode'] == 200
+        if results is not None:
+            results.extend(json.loads(res['body']))
+        return [r['title'] for r in json.loads(res['body'])]
+
+    post({'title': 'Chicken Parmesan', 'tags': ['Italian'], 'ingredients': [{'name': 'chicken breast'}],
+          'instructions': ['Bread the chicken']})
+    lasagna = post({'title': 'Lasagna', 'description': 'Layered with chicken sausage', 'tags': ['italian', 'pasta'],
+                    'ingredients': [{'name': 'ricotta cheese', 'amount': '2 cups'}]})
+
+    # Title matches rank first; prefix matching on partial words
+    assert search({'q': 'chick'}) == ['Chicken Parmesan', 'Lasagna']
+    assert search({'tags': 'italian,pasta'}) == ['Lasagna']
+    assert search({'ingredient': 'ricot'}) == ['Lasagna']
+
+    # Index is patched in place by later writes
+    post({'title': 'Ricotta Pancakes', 'ingredients': [{'name': 'ricotta'}]})
+    assert sorted(search({'ingredient': 'ricotta'})) == ['Lasagna', 'Ricotta Pancakes']
+    recipes_app.handler({
+        'requestContext': {'http': {'method': 'DELETE'}, 'routeKey': 'DELETE /recipes/{id}'},
+        'rawPath': f"/recipes/{lasagna['recipeId']}",
+        'pathParameters': {'id': lasagna['recipeId']},
+    }, None)
+    assert search({'ingredient': 'ricotta'}) == ['Ricotta Pancakes']
+
+    # Results carry summary fields only; instructions and ingredients are never kept in memory
+    results = []
+    assert search({'q': 'parmesan'}, results) == ['Chicken Parmesan']
+    assert 'instructions' not in results[0] and 'ingredients' not in results[0]
+    assert results[0]['id'] == results[0]['recipeId']
+
+    # Writes from other containers arrive through the updatedAt index, without another scan
+    other = recipes_app.recipe_items.new_item('from-elsewhere', {'title': 'Ricotta Toast', 'ingredients': ['ricotta']},
+                                              {'sub': 'u2'}, clock[0])
+    table.put_item(Item=other)
+    table.put_item(Item={'recipeId': results[0]['recipeId'], 'deleted': True, 'syncBucket': 'all',
+                         'updatedAt': clock[0]})
+
+    def no_scan(*args, **kwargs):
+        raise AssertionError('search index rescanned the table')
+
+    monkeypatch.setattr(recipes_app, '_scan_all', no_scan)
+    assert search({'ingredient': 'ricotta'}) == ['Ricotta Pancakes']
+    clock[0] += recipes_app.SEARCH_INDEX_TTL + 1
+    assert sorted(search({'ingredient': 'ricotta'})) == ['Ricotta Pancakes', 'Ricotta Toast']
+    assert search({'q': 'parmesan'}) == []
+
+
+@mock_aws()
+def test_delta_sync_with_tombstones(monkeypatch):
+    dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+    dynamodb.create_table(
+        TableName='mbm-recipes',
+        KeySchema=[{'AttributeName': 'recipeId', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[
+            {'AttributeName': 'recipeId', 'AttributeType': 'S'},
+            {'AttributeName': 'syncBucket', 'AttributeType': 'S'},
+            {'AttributeName': 'updatedAt', 'AttributeType': 'N'},
+        ],
+        GlobalSecondaryIndexes=[{
+            'IndexName': 'gsi_updated_at',
+            'KeySchema': [
+                {'AttributeName': 'syncBucket', 'KeyType': 'HASH'},
+                {'AttributeName': 'updatedAt', 'KeyType': 'RANGE'},
+            ],
+            'Projection': {'ProjectionType': 'ALL'},
+        }],
+        BillingMode='PAY_PER_REQUEST'
+    ).wait_until_exists()
+    monkeypatch.setenv('RECIPES_TABLE', 'mbm-recipes')
+    monkeypatch.setenv('RECIPES_UPDATED_INDEX', 'gsi_updated_at')
+
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    recipes_app = load_module(os.path.join(repo_root, 'recipes', 'app.py'))
+
+    clock = [1_700_000_000]
+    monkeypatch.setattr(recipes_app.time, 'time', lambda: clock[0])
+
+    def call(method, path, **extra):
+        return recipes_app.handler({'requestContext': {'http': {'method': method}}, 'rawPath': path, **extra}, None)
+
+    old = json.loads(call('POST', '/recipes', body=json.dumps({'title': 'Old'}))['body'])
+    clock[0] += 100
+    json.loads(call('POST', '/recipes', body=json.dumps({'title': 'New'}))['body'])
+    assert call('DELETE', f"/recipes/{old['recipeId']}")['statusCode'] == 204
+    # Deleting twice, or an id that never existed, is a 404 and writes nothing
+    assert call('DELETE', f"/recipes/{old['recipeId']}")['statusCode'] == 404
+    assert call('DELETE', '/recipes/no-such-id')['statusCode'] == 404
+    assert 'Item' not in dynamodb.Table('mbm-recipes').get_item(Key={'recipeId': 'no-such-id'})
+
+    res = call('GET', '/recipes', queryStringParameters={'since': str(clock[0])})
+    assert res['statusCode'] == 200
+    delta = json.loads(res['body'])
+    assert [i['title'] for i in delta['items']] == ['New']
+    assert delta['deleted'] == [old['recipeId']]
+    assert delta['watermark'] == clock[0]
+
+    # Tombstones are hidden from full reads
+    assert [i['title'] for i in json.loads(call('GET', '/recipes')['body'])] == ['New']
+    assert call('GET', f"/recipes/{old['recipeId']}")['statusCode'] == 404
+
+    # Nothing changed since the watermark except what shares its second
+    clock[0] += 10
+    empty = json.loads(call('GET', '/recipes', queryStringParameters={'since': str(clock[0])})['body'])
+    assert empty == {'items': [], 'deleted': [], 'watermark': clock[0]}
+
+    # Watermarks older than the tombstone window force a full refresh
+    res = call('GET', '/recipes', queryStringParameters={'since': '0'})
+    assert res['statusCode'] == 410
+
+
+@mock_aws()
+def test_list_redirects_to_snapshot(monkeypatch):
+    monkeypatch.setenv('RECIPES_TABLE', 'mbm-recipes')
+    monkeypatch.setenv('RECIPES_SNAPSHOT_URL', 'https://cdn.example/data/recipes-index.json')
+
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    recipes_app = load_module(os.path.join(repo_root, 'recipes', 'app.py'))
+
+    res = recipes_app.handler({'requestContext': {'http': {'method': 'GET'}}, 'rawPath': '/recipes'}, None)
+    assert res['statusCode'] == 302
+    assert res['headers']['Location'] == 'https://cdn.example/data/recipes-index.json'
+
+
+@mock_aws()
+def test_list_waits_for_snapshot_to_exist(monkeypatch):
+    ddb = boto3.resource('dynamodb', region_name='us-east-1')
+    ddb.create_table(
+        TableName='mbm-recipes',
+        KeySchema=[{'AttributeName': 'recipeId', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': 'recipeId', 'AttributeType': 'S'}],
+        BillingMode='PAY_PER_REQUEST',
+    ).put_item(Item={'recipeId': 'r1', 'title': 'Soup'})
+    s3 = boto3.client('s3', region_name='us-east-1')
+    s3.create_bucket(Bucket='mbm-site')
+    monkeypatch.setenv('RECIPES_TABLE', 'mbm-recipes')
+    monkeypatch.setenv('RECIPES_SNAPSHOT_URL', 'https://cdn.example/data/recipes-index.json')
+    monkeypatch.setenv('RECIPES_SNAPSHOT_BUCKET', 'mbm-site')
+
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    recipes_app = load_module(os.path.join(repo_root, 'recipes', 'app.py'))
+
+    def list_recipes():
+        return recipes_app.handler({'requestContext': {'http': {'method': 'GET'}}, 'rawPath': '/recipes'}, None)
+
+    # Not published yet: answer from the table instead of redirecting to a missing object
+    res = list_recipes()
+    assert res['statusCode'] == 200 and json.loads(res['body'])[0]['id'] == 'r1'
+
+    s3.put_object(Bucket='mbm-site', Key='data/recipes-index.json', Body=b'[]')
+    recipes_app._snapshot_state['checkedAt'] -= recipes_app.SNAPSHOT_RECHECK_SECONDS
+    assert list_recipes()['statusCode'] == 302
+
+
+@mock_aws()
+def test_etag_not_modified(monkeypatch):
+    dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+    dynamodb.create_table(
+        TableName='mbm-recipes',
+        KeySchema=[{'AttributeName': 'recipeId', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': 'recipeId', 'AttributeType': 'S'}],
+        BillingMode='PAY_PER_REQUEST'
+    ).wait_until_exists()
+    monkeypatch.setenv('RECIPES_TABLE', 'mbm-recipes')
+
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    recipes_app = load_module(os.path.join(repo_root, 'recipes', 'app.py'))
+
+    def get(path, etag=None):
+        headers = {'if-none-match': etag} if etag else {}
+        return recipes_app.handler({'requestContext': {'http': {'method': 'GET'}}, 'rawPath': path, 'headers': headers}, None)
+
+    created = json.loads(recipes_app.handler({
+        'requestContext': {'http': {'method': 'POST'}},
+        'rawPath': '/recipes',
+        'body': json.dumps({'title': 'Stew'}),
+    }, None)['body'])
+
+    for path in ('/recipes', f"/recipes/{created['recipeId']}"):
+        first = get(path)
+        etag = first['headers']['ETag']
+        assert first['statusCode'] == 200 and first['headers']['Cache-Control'] == 'public, no-cache'
+        again = get(path, f'W/{etag}, "other"')
+        assert again['statusCode'] == 304 and again['body'] == ''
+        assert get(path, '"stale"')['statusCode'] == 200
+
+    # A new recipe changes the list validator
+    list_etag = get('/recipes')['headers']['ETag']
+    recipes_app.handler({
+        'requestContext': {'http': {'method': 'POST'}},
+        'rawPath': '/recipes',
+        'body': json.dumps({'title': 'Chili'}),
+    }, None)
+    assert get('/recipes', list_etag)['statusCode'] == 200
+
+    # Two edits inside the same second still change the recipe validator
+    monkeypatch.setattr(recipes_app.time, 'time', lambda: 4_000_000_000)
+    path = f"/recipes/{created['recipeId']}"
+    etags, list_etags = [], []
+    for title in ('Beef Stew', 'Lamb Stew'):
+        recipes_app.handler({
+            'requestContext': {'http': {'method': 'PUT'}},
+            'rawPath': path,
+            'pathParameters': {'id': created['recipeId']},
+            'body': json.dumps({'title': title}),
+        }, None)
+        etags.append(get(path)['headers']['ETag'])
+        list_etags.append(get('/recipes')['headers']['ETag'])
+    assert etags[0] != etags[1]
+    assert get(path, etags[0])['statusCode'] == 200
+    # ...and the list validator
+    assert list_etags[0] != list_etags[1]
+    assert get('/recipes', list_etags[0])['statusCode'] == 200
+    assert 'contentHash' not in json.loads(get(path)['body'])
+
+
+def test_response_serialization_and_gzip():
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    recipes_app = load_module(os.path.join(repo_root, 'recipes', 'app.py'))
+
+    body = [{'recipeId': str(i), 'updatedAt': Decimal(1700000000), 'rating': Decimal('4.5'),
+             'ingredients': [{'name': 'salt', 'qty': Decimal('0.25')}]} for i in range(50)]
+    res = recipes_app.response(200, body)
+    decoded = json.loads(res['body'])
+    assert decoded[0] == {'recipeId': '0', 'updatedAt': 1700000000, 'rating': 4.5,
+                          'ingredients': [{'name': 'salt', 'qty': 0.25}]}
+
+    compressed = recipes_app._maybe_compress({'headers': {'Accept-Encoding': 'br, gzip;q=0.8'}}, res)
+    assert compressed['isBase64Encoded'] and compressed['headers']['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(base64.b64decode(compressed['body'])).decode('utf-8') == res['body']
+
+    # An explicit gzip entry wins over the wildcard either way
+    assert recipes_app._accepts_gzip({'headers': {'accept-encoding': '*;q=0, gzip'}})
+    assert not recipes_app._accepts_gzip({'headers': {'accept-encoding': 'gzip;q=0, *'}})
+    assert recipes_app._accepts_gzip({'headers': {'accept-encoding': 'br, *'}})
+
+    # Each encoding has its own ETag, and either one revalidates
+    tagged = {**res, 'headers': {'ETag': '"abc"'}}
+    gz = recipes_app._maybe_compress({'headers': {'accept-encoding': 'gzip'}}, tagged)
+    assert gz['headers']['ETag'] == '"abc-gzip"'
+    assert recipes_app._etag_matches({'headers': {'if-none-match': '"abc-gzip"'}}, '"abc"')
+    not_modified = recipes_app._maybe_compress(
+        {'headers': {'accept-encoding': 'gzip', 'if-none-match': '"abc-gzip"'}},
+        {'statusCode': 304, 'body': '', 'headers': {'ETag': '"abc"'}})
+    assert not_modified['headers']['ETag'] == '"abc-gzip"'
+
+    # Not accepted, explicitly refused, or too small: left alone
+    assert recipes_app._maybe_compress({'headers': {}}, res) is res
+    assert recipes_app._maybe_compress({'headers': {'accept-encoding': 'gzip;q=0'}}, res) is res
+    small = recipes_app.response(200, {'ok': True})
+    assert recipes_app._maybe_compress({'headers': {'accept-encoding': 'gzip'}}, small) is small
+
+
+@mock_aws()
+def test_recipe_read_cache(monkeypatch):
+    dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+    table = dynamodb.create_table(
+        TableName='mbm-recipes',
+        KeySchema=[{'AttributeName': 'recipeId', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': 'recipeId', 'AttributeType': 'S'}],
+        BillingMode='PAY_PER_REQUEST'
+    )
+    table.wait_until_exists()
+    table.put_item(Item={'recipeId': 'r1', 'title': 'Soup', 'updatedAt': 1})
+    monkeypatch.setenv('RECIPES_TABLE', 'mbm-recipes')
+
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    recipes_app = load_module(os.path.join(repo_root, 'recipes', 'app.py'))
+
+    def call(method, body=None):
+        res = recipes_app.handler({
+            'requestContext': {'http': {'method': method}, 'routeKey': f'{method} /recipes/{{id}}'},
+            'rawPath': '/recipes/r1',
+            'pathParameters': {'id': 'r1'},
+            'body': json.dumps(body) if body else None,
+        }, None)
+        return res['statusCode'], (json.loads(res['body']) if res['body'] else None)
+
+    reads = []
+    monkeypatch.setattr(recipes_app._TimedTable, 'get_item', raising=False,
+                        value=lambda self, **kw: reads.append(kw.get('ConsistentRead')) or self._table.get_item(**kw))
+
+    assert call('GET')[1]['title'] == 'Soup'
+    # Misses are eventually consistent unless RECIPE_CACHE_MODE=strong
+    assert reads == [False]
+    # A write from another container is hidden until the entry expires
+    table.put_item(Item={'recipeId': 'r1', 'title': 'Other container', 'updatedAt': 2})
+    assert call('GET')[1]['title'] == 'Soup'
+    assert reads == [False]
+
+    # Local writes replace or drop the cached copy
+    call('PUT', {'title': 'Stew'})
+    assert call('GET')[1]['title'] == 'Stew'
+    call('DELETE')
+    assert call('GET')[0] == 404
+
+
+@mock_aws()
+def test_emits_emf_metrics(monkeypatch, capsys):
+    dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+    dynamodb.create_table(
+        TableName='mbm-recipes',
+        KeySchema=[{'AttributeName': 'recipeId', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': 'recipeId', 'AttributeType': 'S'}],
+        BillingMode='PAY_PER_REQUEST'
+    ).wait_until_exists()
+    monkeypatch.setenv('RECIPES_TABLE', 'mbm-recipes')
+
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    recipes_app = load_module(os.path.join(repo_root, 'recipes', 'app.py'))
+
+    def emf_lines():
+        lines = [json.loads(l) for l in capsys.readouterr().out.splitlines() if l.startswith('{"_aws"')]
+        assert len(lines) == 1
+        return lines[0]
+
+    recipes_app.handler({'requestContext': {'http': {'method': 'GET'}}, 'rawPath': '/recipes'}, None)
+    first = emf_lines()
+    assert (first['Route'], first['Status'], first['ColdStart']) == ('GET /recipes', '200', 'true')
+    assert first['ItemCount'] == 0
+    names = {m['Name'] for m in first['_aws']['CloudWatchMetrics'][0]['Metrics']}
+    assert {'Total', 'DynamoDB', 'Serialize', 'ItemCount'} <= names
+
+    recipes_app.handler({'requestContext': {'http': {'method': 'GET'}}, 'rawPath': '/recipes/missing'}, None)
+    second = emf_lines()
+    assert (second['Route'], second['Status'], second['ColdStart']) == ('GET /recipes/{id}', '404', 'false')
+
+
+@mock_aws()
+def test_trace_spans_and_profiling(monkeypatch, capsys):
+    dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+    dynamodb.create_table(
+        TableName='mbm-recipes',
+        KeySchema=[{'AttributeName': 'recipeId', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': 'recipeId', 'AttributeType': 'S'}],
+        BillingMode='PAY_PER_REQUEST'
+    ).wait_until_exists()
+    monkeypatch.setenv('RECIPES_TABLE', 'mbm-recipes')
+    monkeypatch.setenv('PROFILE_SLOWEST_N', '1')
+
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    recipes_app = load_module(os.path.join(repo_root, 'recipes', 'app.py'))
+
+    trace_id = '4bf92f3577b34da6a3ce929d0e0e4736'
+    recipes_app.handler({
+        'requestContext': {'http': {'method': 'GET'}},
+        'rawPath': '/recipes/r1',
+        'headers': {'traceparent': f'00-{trace_id}-00f067aa0ba902b7-01'},
+    }, None)
+    records = [json.loads(l) for l in capsys.readouterr().out.splitlines() if l.startswith('{')]
+    profile = next(r['profile'] for r in records if 'profile' in r)
+    emf = next(r for r in records if '_aws' in r)
+
+    assert profile['traceId'] == trace_id and 'cumulative' in profile['stats']
+    assert emf['traceId'] == trace_id
+    spans = {sp['name']: sp for sp in emf['spans']}
+    assert spans['handler']['parentSpanId'] == '00f067aa0ba902b7'
+    assert spans['DynamoDB.get_item']['parentSpanId'] == spans['handler']['spanId']
+    assert spans['DynamoDB.get_item']['attributes'] == {'table': 'mbm-recipes'}
+
+    # X-Ray header when no traceparent is present
+    recipes_app.handler({
+        'requestContext': {'http': {'method': 'GET'}},
+        'rawPath': '/recipes/r1',
+        'headers': {'X-Amzn-Trace-Id': 'Root=1-5759e988-bd862e3fe1be46a994272793;Sampled=1'},
+    }, None)
+    emf = next(json.loads(l) for l in capsys.readouterr().out.splitlines() if l.startswith('{"_aws"'))
+    assert emf['traceId'] == '1-5759e988-bd862e3fe1be46a994272793'
+
+
+@mock_aws()
+def test_bedrock_client_uses_refreshable_credentials(monkeypatch):
+    monkeypatch.setenv('BEDROCK_ROLE_ARN', 'arn:aws:iam::123456789012:role/mbm-bedrock-access')
+
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    recipes_app = load_module(os.path.join(repo_root, 'recipes', 'app.py'))
+
+    calls = []
+    assume = recipes_app._assume_bedrock_role
+    monkeypatch.setattr(recipes_app, '_assume_bedrock_role', lambda arn: calls.append(arn) or assume(arn))
+
+    clients = []
+    threads = [threading.Thread(target=lambda: clients.append(recipes_app.get_bedrock())) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # One client and one STS call for all concurrent callers
+    assert len({id(c) for c in clients}) == 1
+    assert len(calls) == 1
+
+    creds = clients[0]._request_signer._credentials
+    assert creds.method == 'sts-assume-role'
+    # Near expiry, botocore refreshes in place; the client object is reused
+    creds._expiry_time = creds._expiry_time.__class__.now(creds._expiry_time.tzinfo)
+    creds.get_frozen_credentials()
+    assert len(calls) == 2
+    assert recipes_app.get_bedrock() is clients[0]
+
+    # Shorter-timeout clients for attempts near the deadline share the same credentials
+    short = recipes_app.get_bedrock(3.0)
+    assert short is not clients[0] and recipes_app.get_bedrock(3.0) is short
+    assert short._request_signer._credentials is creds and len(calls) == 2
+
+
+def test_bedrock_attempts_end_before_deadline(monkeypatch):
+    monkeypatch.setenv('BEDROCK_READ_TIMEOUT', '2')
+    monkeypatch.setenv('BEDROCK_MIN_ATTEMPT_SECONDS', '0.25')
+
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    recipes_app = load_module(os.path.join(repo_root, 'recipes', 'app.py'))
+
+    timeouts = []
+
+    class SlowBedrock:
+        """Never answers in time; like botocore, gives up reading after its read timeout."""
+
+        def __init__(self, read_timeout):
+            self.read_timeout = read_timeout
+
+        def converse(self, modelId, **kwargs):
+            timeouts.append(self.read_timeout)
+            time.sleep(self.read_timeout)
+            raise ReadTimeoutError(endpoint_url='https://bedrock-runtime.us-east-1.amazonaws.com')
+
+    monkeypatch.setattr(recipes_app, '_new_bedrock_client', SlowBedrock)
+
+    class Context:
+        # 2.7 s left minus the 1.5 s safety margin: a 1.2 s budget for Bedrock
+        def get_remaining_time_in_millis(self):
+            return 2700
+
+    start = time.monotonic()
+    res = recipes_app.handler({
+        'requestContext': {'http': {'method': 'POST'}},
+        'rawPath': '/ai/extract-recipe',
+        'body': json.dumps({'type': 'image', 'images': [{'data': 'aGk=', 'mediaType': 'image/png'}]}),
+    }, Context())
+    elapsed = time.monotonic() - start
+
+    # The attempt was cut to the 1 s client instead of the 2 s default, so the request
+    # answers 504 inside its budget rather than running into the Lambda timeout
+    assert res['statusCode'] == 504 and 'Retry-After' in res['headers']
+    assert timeouts == [1.0]
+    assert elapsed < 1.2
+
+
+def test_bedrock_retries_breaker_and_deadline(monkeypatch):
+    monkeypatch.setenv('BEDROCK_FALLBACK_MODEL', 'us.anthropic.claude-haiku-4-5')
+    monkeypatch.setenv('BEDROCK_BREAKER_THRESHOLD', '2')
+
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    recipes_app = load_module(os.path.join(repo_root, 'recipes', 'app.py'))
+    monkeypatch.setattr(recipes_app.time, 'sleep', lambda s: None)
+
+    class StubBedrock:
+        def __init__(self, failures):
+            self.failures = failures
+            self.models = []
+
+        def converse(self, modelId, **kwargs):
+            self.models.append(modelId)
+            if self.failures:
+                self.failures -= 1
+                raise ClientError({'Error': {'Code': 'ThrottlingException', 'Message': 'slow down'}}, 'Converse')
+            return {'output': {'message': {'content': [{'text': '{"title": "Soup"}'}]}}}
+
+    def extract(context=None):
+        return recipes_app.handler({
+            'requestContext': {'http': {'method': 'POST'}},
+            'rawPath': '/ai/extract-recipe',
+            'body': json.dumps({'type': 'image', 'images': [{'data': 'aGk=', 'mediaType': 'image/png'}]}),
+        }, context)
+
+    # Transient throttles are retried within one request
+    recipes_app._bedrock = StubBedrock(failures=2)
+    res = extract()
+    assert res['statusCode'] == 200
+    assert json.loads(res['body'])['title'] == 'Soup'
+    assert len(recipes_app._bedrock.models) == 3
+
+    # Two exhausted requests open the breaker; the next goes to the fallback model
+    recipes_app._bedrock = StubBedrock(failures=6)
+    assert extract()['statusCode'] == 502
+    assert extract()['statusCode'] == 502
+    recipes_app._bedrock = StubBedrock(failures=0)
+    assert extract()['statusCode'] == 200
+    assert recipes_app._bedrock.models == ['us.anthropic.claude-haiku-4-5']
+
+    # Without a fallback an open breaker fails fast with Retry-After
+    monkeypatch.setattr(recipes_app, 'BEDROCK_FALLBACK_MODEL', None)
+    res = extract()
+    assert res['statusCode'] == 503 and int(res['headers']['Retry-After']) >= 1
+
+    # Too little Lambda time left to attempt a call
+    recipes_app._bedrock_breaker.record_success()
+
+    class Context:
+        def get_remaining_time_in_millis(self):
+            return 2000
+
+    res = extract(Context())
+    assert res['statusCode'] == 504
+    assert recipes_app._bedrock.models == ['us.anthropic.claude-haiku-4-5']
+
+
+def test_extraction_uses_shared_prompt(monkeypatch, capsys):
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    recipes_app = load_module(os.path.join(repo_root, 'recipes', 'app.py'))
+    prompts = recipes_app.prompts
+
+    calls = []
+
+    class StubBedrock:
+        def converse(self, modelId, **kwargs):
+            calls.append(kwargs)
+            return {
+                'output': {'message': {'content': [{'text': '{"title": "Soup"}'}]}},
+                'usage': {'inputTokens': 40, 'outputTokens': 12, 'cacheReadInputTokens': 1200},
+            }
+
+    recipes_app._bedrock = StubBedrock()
+    res = recipes_app.handler({
+        'requestContext': {'http': {'method': 'POST'}},
+        'rawPath': '/ai/extract-recipe',
+        'body': json.dumps({'type': 'image', 'images': [{'data': 'aGk=', 'mediaType': 'image/png'}]}),
+    }, None)
+    assert res['statusCode'] == 200
+
+    system = calls[0]['system']
+    assert system == prompts.system_blocks('image')
+    # The prefix is below Bedrock's caching minimum, so no cache point is sent
+    assert all('text' in block for block in system)
+    assert system[0]['text'] == prompts.INSTRUCTIONS and system[1]['text'] == prompts.SCHEMA
+
+    records = [json.loads(l) for l in capsys.readouterr().out.splitlines() if l.startswith('{')]
+    usage = next(r['bedrockUsage'] for r in records if 'bedrockUsage' in r)
+    assert usage['promptVersion'] == prompts.PROMPT_VERSION
+    assert usage['cacheReadInputTokens'] == 1200 and usage['cacheWriteInputTokens'] == 0
+    emf = next(r for r in records if '_aws' in r)
+    assert emf['InputTokens'] == 40 and emf['CacheReadInputTokens'] == 1200
+
+
+@mock_aws()
+def test_ai_extraction_rate_limit(monkeypatch):
+    ddb = boto3.resource('dynamodb', region_name='us-east-1')
+    ddb.create_table(
+        TableName='mbm-rate-limits',
+        KeySchema=[{'AttributeName': 'limitKey', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': 'limitKey', 'AttributeType': 'S'}],
+        BillingMode='PAY_PER_REQUEST',
+    )
+    monkeypatch.setenv('RATE_LIMIT_TABLE', 'mbm-rate-limits')
+    monkeypatch.setenv('AI_RATE_CAPACITY', '3')
+    monkeypatch.setenv('AI_RATE_REFILL_PER_MINUTE', '1')
+    monkeypatch.setenv('AI_MAX_IN_FLIGHT', '1')
+
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    recipes_app = load_module(os.path.join(repo_root, 'recipes', 'app.py'))
+
+    class StubBedrock:
+        def converse(self, modelId, **kwargs):
+            return {'output': {'message': {'content': [{'text': '{"title": "Soup"}'}]}}}
+
+    recipes_app._bedrock = StubBedrock()
+
+    def extract(sub, images=1):
+        return recipes_app.handler({
+            'requestContext': {'http': {'method': 'POST'}, 'authorizer': {'jwt': {'claims': {'sub': sub}}}},
+            'rawPath': '/ai/extract-recipe',
+            'body': json.dumps({'type': 'image', 'images': [{'data': 'aGk=', 'mediaType': 'image/png'}] * images}),
+        }, None)
+
+    # Another call from the same user is still running
+    assert recipes_app._ai_limiter.acquire('ai#u1', 1, 'held') == 0
+    res = extract('u1')
+    assert res['statusCode'] == 429 and res['headers']['Retry-After'] == '5'
+
+    # Once it finishes, a two-image call spends the remaining tokens and releases its lease
+    recipes_app._ai_limiter.release('ai#u1', 'held')
+    assert extract('u1', images=2)['statusCode'] == 200
+    bucket = ddb.Table('mbm-rate-limits').get_item(Key={'limitKey': 'ai#u1'})['Item']
+    assert bucket['inFlight'] == {} and float(bucket['tokens']) < 0.1
+
+    res = extract('u1')
+    assert res['statusCode'] == 429 and 1 <= int(res['headers']['Retry-After']) <= 60
+
+    # Other users have their own bucket
+    assert extract('u2')['statusCode'] == 200
+
+
+@mock_aws()
+def test_idempotency_key(monkeypatch):
+    ddb = boto3.resource('dynamodb', region_name='us-east-1')
+    ddb.create_table(
+        TableName='mbm-recipes',
+        KeySchema=[{'AttributeName': 'recipeId', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': 'recipeId', 'AttributeType': 'S'}],
+        BillingMode='PAY_PER_REQUEST',
+    )
+    ddb.create_table(
+        TableName='mbm-idempotency',
+        KeySchema=[{'AttributeName': 'idempotencyKey', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': 'idempotencyKey', 'AttributeType': 'S'}],
+        BillingMode='PAY_PER_REQUEST',
+    )
+    monkeypatch.setenv('RECIPES_TABLE', 'mbm-recipes')
+    monkeypatch.setenv('IDEMPOTENCY_TABLE', 'mbm-idempotency')
+
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    recipes_app = load_module(os.path.join(repo_root, 'recipes', 'app.py'))
+
+    def post(path, body, key):
+        return recipes_app.handler({
+            'requestContext': {'http': {'method': 'POST'}, 'authorizer': {'jwt': {'claims': {'sub': 'u1'}}}},
+            'rawPath': path,
+            'headers': {'Idempotency-Key': key},
+            'body': json.dumps(body),
+        }, None)
+
+    first = post('/recipes', {'title': 'Soup'}, 'k1')
+    replay = post('/recipes', {'title': 'Soup'}, 'k1')
+    assert first['statusCode'] == replay['statusCode'] == 201
+    assert replay['body'] == first['body'] and replay['headers']['Idempotent-Replayed'] == 'true'
+    assert ddb.Table('mbm-recipes').scan()['Count'] == 1
+
+    assert post('/recipes', {'title': 'Stew'}, 'k1')['statusCode'] == 422
+
+    # A retry that lands while the first attempt is still running
+    ddb.Table('mbm-idempotency').put_item(Item={
+        'idempotencyKey': 'u1#POST /recipes#k2',
+        'status': 'IN_PROGRESS',
+        'payloadHash': hashlib.sha256(json.dumps({'title': 'Pie'}).encode()).hexdigest(),
+        'lockedUntil': int(time.time()) + 60,
+    })
+    res = post('/recipes', {'title': 'Pie'}, 'k2')
+    assert res['statusCode'] == 409 and 'Retry-After' in res['headers']
+
+    # An expired record that TTL has not deleted yet is neither replayed nor held against the key
+    ddb.Table('mbm-idempotency').put_item(Item={
+        'idempotencyKey': 'u1#POST /recipes#k3',
+        'status': 'COMPLETED',
+        'payloadHash': hashlib.sha256(json.dumps({'title': 'Old'}).encode()).hexdigest(),
+        'response': {'statusCode': 201, 'body': '{"recipeId": "gone"}', 'headers': {}},
+        'expiresAt': int(time.time()) - 1,
+    })
+    res = post('/recipes', {'title': 'Cake'}, 'k3')
+    assert res['statusCode'] == 201 and 'Idempotent-Replayed' not in res['headers']
+    assert json.loads(res['body'])['title'] == 'Cake'
+
+    # Failed extractions are forgotten so the retry runs; successful ones are replayed
+    class StubBedrock:
+        calls = 0
+
+        def converse(self, modelId, **kwargs):
+            StubBedrock.calls += 1
+            if StubBedrock.calls == 1:
+                raise ClientError({'Error': {'Code': 'ValidationException', 'Message': 'bad'}}, 'Converse')
+            return {'output': {'message': {'content': [{'text': '{"title": "Soup"}'}]}}}
+
+    recipes_app._bedrock = StubBedrock()
+    body = {'type': 'image', 'images': [{'data': 'aGk=', 'mediaType': 'image/png'}]}
+    assert post('/ai/extract-recipe', body, 'x1')['statusCode'] == 502
+    assert post('/ai/extract-recipe', body, 'x1')['statusCode'] == 200
+    replay = post('/ai/extract-recipe', body, 'x1')
+    assert replay['statusCode'] == 200 and replay['headers']['Idempotent-Replayed'] == 'true'
+    assert StubBedrock.calls == 2
+
+
+@mock_aws()
+def test_bootstrap(monkeypatch):
+    ddb = boto3.resource('dynamodb', region_name='us-east-1')
+    recipes = ddb.create_table(
+        TableName='mbm-recipes',
+        KeySchema=[{'AttributeName': 'recipeId', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': 'recipeId', 'AttributeType': 'S'}],
+        BillingMode='PAY_PER_REQUEST',
+    )
+    ratings = ddb.create_table(
+        TableName='mbm-ratings',
+        KeySchema=[{'AttributeName': 'ratingId', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': 'ratingId', 'AttributeType': 'S'}],
+        BillingMode='PAY_PER_REQUEST',
+    )
+    recipes.put_item(Item={'recipeId': 'r1', 'title': 'Soup', 'image': 'uploads/a.jpg', 'instructions': ['Boil'], 'updatedAt': 10})
+    recipes.put_item(Item={'recipeId': 'r2', 'title': 'Bread', 'image': 'https://example.com/b.jpg', 'updatedAt': 20})
+    recipes.put_item(Item={'recipeId': 'r3', 'deleted': True, 'updatedAt': 30})
+    ratings.put_item(Item={'ratingId': 'a', 'recipeId': 'r1', 'rating': 5})
+    ratings.put_item(Item={'ratingId': 'b', 'recipeId': 'r1', 'rating': 4})
+    monkeypatch.setenv('RECIPES_TABLE', 'mbm-recipes')
+    monkeypatch.setenv('RATINGS_TABLE', 'mbm-ratings')
+    monkeypatch.setenv('IMAGES_BUCKET', 'mbm-images')
+
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    recipes_app = load_module(os.path.join(repo_root, 'recipes', 'app.py'))
+
+    claims = base64.urlsafe_b64encode(json.dumps({'sub': 'u1', 'nickname': 'Maggie'}).encode()).decode().rstrip('=')
+    headers = {'authorization': f'Bearer x.{claims}.y'}
+    res = recipes_app.handler({'requestContext': {'http': {'method': 'GET'}}, 'rawPath': '/bootstrap', 'headers': headers}, None)
+    assert res['statusCode'] == 200 and res['headers']['Cache-Control'].startswith('private')
+    body = json.loads(res['body'])
+
+    assert [r['id'] for r in body['recipes']] == ['r2', 'r1']
+    soup = body['recipes'][1]
+    assert 'instructions' not in soup
+    assert soup['rating'] == {'count': 2, 'average': 4.5}
+    assert soup['imageUrl'].startswith('https://mbm-images.s3') and 'Signature=' in soup['imageUrl']
+    assert body['recipes'][0]['imageUrl'] == 'https://example.com/b.jpg'
+    assert body['identity'] == {'sub': 'u1', 'email': None, 'name': 'Maggie'}
+    assert body['watermark'] == 30
+
+    again = recipes_app.handler({
+        'requestContext': {'http': {'method': 'GET'}},
+        'rawPath': '/bootstrap',
+        'headers': {**headers, 'If-None-Match': res['headers']['ETag']},
+    }, None)
+    assert again['statusCode'] == 304
+
+    # An edit that keeps updatedAt (same second) still invalidates the ETag
+    recipes.put_item(Item={'recipeId': 'r2', 'title': 'Rye Bread', 'image': 'https://example.com/b.jpg', 'updatedAt': 20})
+    edited = recipes_app.handler({
+        'requestContext': {'http': {'method': 'GET'}},
+        'rawPath': '/bootstrap',
+        'headers': {**headers, 'If-None-Match': res['headers']['ETag']},
+    }, None)
+    assert edited['statusCode'] == 200
+    assert [r['title'] for r in json.loads(edited['body'])['recipes']] == ['Rye Bread', 'Soup']
+
+    # Anonymous callers get no identity and a different ETag
+    anon = recipes_app.handler({'requestContext': {'http': {'method': 'GET'}}, 'rawPath': '/bootstrap'}, None)
+    assert json.loads(anon['body'])['identity'] is None
+    assert anon['headers']['ETag'] != res['headers']['ETag']
+
+    # A client-supplied ratingId never replaces an existing rating
+    posted = recipes_app.handler({
+        'requestContext': {'http': {'method': 'POST'}},
+        'rawPath': '/ratings',
+        'body': json.dumps({'ratingId': 'a', 'recipeId': 'r1', 'rating': 1}),
+    }, None)
+    assert posted['statusCode'] == 201 and json.loads(posted['body'])['ratingId'] != 'a'
+    assert ratings.get_item(Key={'ratingId': 'a'})['Item']['rating'] == 5
+
+
+@mock_aws()
+def test_duplicate_detection(monkeypatch):
+    ddb = boto3.resource('dynamodb', region_name='us-east-1')
+    ddb.create_table(
+        TableName='mbm-recipes',
+        KeySchema=[{'AttributeName': 'recipeId', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': 'recipeId', 'AttributeType': 'S'}],
+        BillingMode='PAY_PER_REQUEST',
+    )
+    ddb.create_table(
+        TableName='mbm-recipe-dedup',
+        KeySchema=[{'AttributeName': 'pk', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': 'pk', 'AttributeType': 'S'}],
+        BillingMode='PAY_PER_REQUEST',
+    )
+    monkeypatch.setenv('RECIPES_TABLE', 'mbm-recipes')
+    monkeypatch.setenv('DEDUP_TABLE', 'mbm-recipe-dedup')
+
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    recipes_app = load_module(os.path.join(repo_root, 'recipes', 'app.py'))
+
+    def call(method, path, body=None):
+        return recipes_app.handler({
+            'requestContext': {'http': {'method': method}, 'authorizer': {'jwt': {'claims': {'sub': 'u1'}}}},
+            'rawPath': path,
+            'body': json.dumps(body) if body is not None else None,
+        }, None)
+
+    def stream(*ids):
+        # What the KEYS_ONLY table stream delivers to the dedup consumer
+        records = [{'eventName': 'MODIFY', 'dynamodb': {'Keys': {'recipeId': {'S': rid}}}} for rid in ids]
+        return recipes_app.dedup_stream_handler({'Records': records}, None)
+
+    soup = {
+        'title': 'Tomato Basil Soup',
+        'sourceUrl': 'https://www.example.com/soup/?utm_source=feed',
+        'ingredients': [{'name': 'Tomatoes', 'amount': '2 lb'}, {'name': 'Basil'}, {'name': 'Onion'}, {'name': 'Garlic'}],
+        'instructions': ['Roast the tomatoes with the onion and garlic until soft', 'Blend with the basil and season to taste'],
+    }
+    created = json.loads(call('POST', '/recipes', soup)['body'])
+    bread = json.loads(call('POST', '/recipes', {'title': 'Banana Bread', 'ingredients': [{'name': 'Bananas'}, {'name': 'Flour'}]})['body'])
+    # Indexing happens off the request path
+    assert json.loads(call('POST', '/recipes/duplicates', soup)['body'])['duplicates'] == []
+    assert stream(created['id'], bread['id']) == {'indexed': 2}
+
+    # Same text with an extra ingredient and a reworded title is a near duplicate; bread is not
+    draft = dict(soup, title='Tomato Basil Soup (easy)', sourceUrl=None,
+                 ingredients=soup['ingredients'] + [{'name': 'Cream'}])
+    found = json.loads(call('POST', '/recipes/duplicates', draft)['body'])['duplicates']
+    assert [d['id'] for d in found] == [created['id']]
+    assert found[0]['match'] == 'similar' and 0.5 <= found[0]['similarity'] < 1
+    exact = json.loads(call('POST', '/recipes/duplicates', soup)['body'])['duplicates']
+    assert exact[0]['similarity'] == 1.0 and exact[0]['match'] == 'url'
+    assert recipes_app._normalise_url('http://example.com/soup') == recipes_app._normalise_url(soup['sourceUrl'])
+
+    # A page that was already imported is reported before any fetch or model call
+    res = call('POST', '/ai/extract-recipe', {'type': 'url', 'url': 'https://example.com/soup'})
+    assert res['statusCode'] == 409
+    assert json.loads(res['body'])['duplicates'][0]['title'] == 'Tomato Basil Soup'
+    monkeypatch.setattr(recipes_app, '_extract_from_url', lambda url, deadline=None: {'title': 'Soup again'})
+    forced = call('POST', '/ai/extract-recipe', {'type': 'url', 'url': 'https://example.com/soup', 'force': True})
+    assert forced['statusCode'] == 200 and json.loads(forced['body'])['title'] == 'Soup again'
+
+    # A copy older than the indexed one changes nothing
+    older = dict(soup, title='Something else entirely', sourceUrl=None, updatedAt=created['updatedAt'] - 10)
+    assert recipes_app._dedup_index(created['id'], older) is False
+    assert json.loads(call('POST', '/recipes/duplicates', soup)['body'])['duplicates'][0]['id'] == created['id']
+
+    # Deleting a recipe removes it from every bucket
+    assert call('DELETE', f"/recipes/{created['id']}")['statusCode'] == 204
+    assert stream(created['id']) == {'indexed': 1}
+    assert json.loads(call('POST', '/recipes/duplicates', soup)['body'])['duplicates'] == []
+    assert not ddb.Table('mbm-recipe-dedup').get_item(Key={'pk': f"sig#{created['id']}"}).get('Item')
+
+
+@mock_aws()
+def test_shopping_list(monkeypatch):
+    ddb = boto3.resource('dynamodb', region_name='us-east-1')
+    ddb.create_table(
+        TableName='mbm-recipes',
+        KeySchema=[{'AttributeName': 'recipeId', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': 'recipeId', 'AttributeType': 'S'}],
+        BillingMode='PAY_PER_REQUEST',
+    )
+    monkeypatch.setenv('RECIPES_TABLE', 'mbm-recipes')
+
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    recipes_app = load_module(os.path.join(repo_root, 'recipes', 'app.py'))
+
+    def call(method, path, body):
+        return recipes_app.handler({
+            'requestContext': {'http': {'method': method}, 'authorizer': {'jwt': {'claims': {'sub': 'u1'}}}},
+            'rawPath': path,
+            'body': json.dumps(body),
+        }, None)
+
+    soup = json.loads(call('POST', '/recipes', {
+        'title': 'Soup', 'servings': '4',
+        'ingredients': [{'name': 'Tomatoes, diced', 'amount': '1 lb'}, {'name': 'Olive oil', 'amount': '2 tbsp'},
+                        {'name': 'Garlic', 'amount': '2-3 cloves'}, {'name': 'Salt', 'amount': 'to taste'}],
+    })['body'])
+    assert 'parsedIngredients' not in soup
+    stored = ddb.Table('mbm-recipes').get_item(Key={'recipeId': soup['id']})['Item']['parsedIngredients']
+    assert stored['keys'] == ['tomato', 'olive oil', 'garlic', 'salt'] and stored['units'][0] == 'g'
+
+    # Written before parsing existed: parsed on read instead
+    ddb.Table('mbm-recipes').put_item(Item={
+        'recipeId': 'old', 'title': 'Salad',
+        'ingredients': [{'name': 'tomato', 'amount': '200g'}, {'name': 'olive oil', 'amount': '¼ cup'}, '1 cucumber'],
+    })
+
+    res = call('POST', '/shopping-list', {'recipes': [
+        {'id': soup['id'], 'servings': 8}, {'id': 'old'}, {'id': 'gone'},
+    ]})
+    assert res['statusCode'] == 200
+    body = json.loads(res['body'])
+    lines = {i['name'].lower(): i for i in body['items']}
+    assert lines['tomatoes']['unit'] == 'lb' and lines['tomatoes']['quantity'] == 2.44  # 2 lb + 200 g
+    assert lines['olive oil'] == {'name': 'Olive oil', 'quantity': 0.5, 'unit': 'cup', 'recipes': [soup['id'], 'old']}
+    assert lines['garlic']['quantity'] == 6 and lines['garlic']['unit'] == 'clove'
+    assert lines['salt']['quantity'] is None and lines['cucumber']['quantity'] == 1
+    assert body['missing'] == ['gone'] and body['recipes'][0]['multiplier'] == 2
+
+    # The re-parsed arrays are written back, so the next list reads them instead of parsing again
+    backfilled = ddb.Table('mbm-recipes').get_item(Key={'recipeId': 'old'})['Item']['parsedIngredients']
+    assert backfilled['v'] == recipes_app.ingredient_parser.PARSER_VERSION
+    assert backfilled['keys'] == ['tomato', 'olive oil', 'cucumber']
+
+    # Full scans leave the arrays out
+    index = recipes_app.get_search_index(ddb.Table('mbm-recipes'))
+    assert index.docs[soup['id']][0]['title'] == 'Soup'
+    assert all('parsedIngredients' not in doc[0] for doc in index.docs.values())
+
+    assert call('POST', '/shopping-list', {'recipes': []})['statusCode'] == 400
+    assert call('POST', '/shopping-list', {'recipes': [{'id': 'old', 'multiplier': 'x'}]})['statusCode'] == 400
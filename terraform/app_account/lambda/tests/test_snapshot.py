@@ -0,0 +1,57 @@
+import os
+import sys
+import json
+import gzip
+import boto3
+import importlib.util
+from moto import mock_aws
+
+
+def load_module(path):
+    # The snapshot zip bundles recipes/ddb_utils.py next to app.py
+    recipes_dir = os.path.join(os.path.dirname(os.path.dirname(path)), 'recipes')
+    if recipes_dir not in sys.path:
+        sys.path.insert(0, recipes_dir)
+    spec = importlib.util.spec_from_file_location('app_module', path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+@mock_aws()
+def test_publish_snapshot(monkeypatch):
+    dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
+    table = dynamodb.create_table(
+        TableName='mbm-recipes',
+        KeySchema=[{'AttributeName': 'recipeId', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': 'recipeId', 'AttributeType': 'S'}],
+        BillingMode='PAY_PER_REQUEST'
+    )
+    table.wait_until_exists()
+    table.put_item(Item={'recipeId': 'a', 'title': 'Soup', 'updatedAt': 2})
+    table.put_item(Item={'recipeId': 'b', 'title': 'Bread', 'updatedAt': 1})
+    table.put_item(Item={'recipeId': 'c', 'deleted': True, 'updatedAt': 3})
+
+    s3 = boto3.client('s3', region_name='us-east-1')
+    s3.create_bucket(Bucket='mbm-site')
+
+    monkeypatch.setenv('RECIPES_TABLE', 'mbm-recipes')
+    monkeypatch.setenv('SNAPSHOT_BUCKET', 'mbm-site')
+
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    snapshot_app = load_module(os.path.join(repo_root, 'snapshot', 'app.py'))
+
+    out = snapshot_app.handler({'Records': [{'eventName': 'MODIFY'}]}, None)
+    assert out['written'] and out['count'] == 2
+
+    obj = s3.get_object(Bucket='mbm-site', Key='data/recipes-index.json')
+    assert obj['ContentEncoding'] == 'gzip'
+    assert obj['Metadata']['version'] == out['version']
+    items = json.loads(gzip.decompress(obj['Body'].read()))
+    assert [(i['id'], i['title']) for i in items] == [('a', 'Soup'), ('b', 'Bread')]
+    versioned = s3.get_object(Bucket='mbm-site', Key=f"data/recipes-index.{out['version']}.json")
+    assert 'immutable' in versioned['CacheControl']
+
+    # Unchanged content is not republished
+    again = snapshot_app.handler({'Records': []}, None)
+    assert again == {'version': out['version'], 'count': 2, 'written': False}
@@ -22,7 +22,7 @@ data "aws_caller_identity" "current" {}
 resource "aws_cloudfront_distribution" "cdn" {
   enabled = true
 
-  aliases = ["mealsbymaggie.com", "www.mealsbymaggie.com"]
+  aliases = [var.site_domain, "www.${var.site_domain}"]
 
   default_root_object = "index.html"
 
@@ -54,20 +54,34 @@ resource "aws_cloudfront_distribution" "cdn" {
     }
   }
 
-  custom_error_response {
-    error_code            = 403
-    response_code         = 200
-    response_page_path    = "/index.html"
-    error_caching_min_ttl = 0
-  }
+  # Recipe list snapshot published by the snapshot Lambda. The API redirects GET /recipes here,
+  # so responses need CORS headers; objects are stored pre-gzipped with their own Cache-Control.
+  # No viewer-request function: a missing object must stay a 404, not become index.html.
+  ordered_cache_behavior {
+    path_pattern     = "/data/*"
+    allowed_methods  = ["GET", "HEAD", "OPTIONS"]
+    cached_methods   = ["GET", "HEAD"]
+    target_origin_id = "s3-site-origin"
 
-  custom_error_response {
-    error_code            = 404
-    response_code         = 200
-    response_page_path    = "/index.html"
-    error_caching_min_ttl = 0
+    viewer_protocol_policy     = "redirect-to-https"
+    response_headers_policy_id = "60669652-455b-4ae9-85a4-c4c02393f86c" # Managed-SimpleCORS
+
+    min_ttl     = 0
+    default_ttl = 15
+    max_ttl     = 31536000
+
+    forwarded_values {
+      query_string = false
+      cookies {
+        forward = "none"
+      }
+    }
   }
 
+  # SPA routes are rewritten to /index.html by the default behaviour's viewer-request function.
+  # custom_error_response applies to every behaviour, so it would turn a missing /data/ object
+  # into a 200 HTML page for API clients.
+
   restrictions {
     geo_restriction {
       restriction_type = "none"
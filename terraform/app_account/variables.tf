@@ -4,6 +4,12 @@ variable "bucket_name" {
   default     = "mqm-ui-infra-217354297026"
 }
 
+variable "site_domain" {
+  description = "Apex domain the CloudFront distribution serves (www. redirects to it)"
+  type        = string
+  default     = "mealsbymaggie.com"
+}
+
 variable "aws_region" {
   description = "AWS region to deploy resources in"
   type        = string